@@ -0,0 +1,310 @@
+"""
+benchmark.py
+
+Times the hot paths of the board and the solvers, and whole games, so that
+a change can be checked for speed as well as for how many games it wins.
+
+Every case is timed on seeded boards at each level: BEGINNER, INTERMEDIATE,
+EXPERT, and an OVERSIZED board to show how things scale. A case builds a
+fresh state for every operation (untimed), then times the operation alone.
+The same seeds give the same boards and positions, so two runs time the same
+work. Each case is run for a number of rounds, and reports the mean
+operations per second and the spread between rounds. A round times at least
+NUMBER operations (fewer for the slow cases), and more for cases quick
+enough that those would take less than MIN_ROUND_TIME: a few milliseconds
+of work is mostly timer and scheduling noise. The counts are kept with the
+results, so that a run can be repeated operation for operation.
+
+The board cases run on a simulate.HeadlessBoard, since board.Board needs a
+display. Both boards play by rules.Rules, so reveal, checkVictory and
+getNeighbors time the same code that runs in the window, without drawing
+the tiles. layMines times HeadlessBoard's own, which the games here use.
+
+Run it from the command line, e.g.
+    python benchmark.py --levels expert oversized --json before.json
+The JSON output is meant to be kept and compared between commits, which is
+what regression.py does.
+"""
+import argparse
+import json
+import logging
+import math
+import platform
+import random
+import subprocess
+import time
+
+import cache
+import simulate
+import solver
+
+OVERSIZED = (64, 64, 620)
+
+LEVELS = dict(simulate.LEVELS)
+LEVELS['oversized'] = OVERSIZED
+
+# how many times each case is run, and how many operations are timed in
+# each run.
+ROUNDS = 5
+NUMBER = 20
+# but time enough operations that a round takes at least this many
+# seconds, up to this many times as many.
+MIN_ROUND_TIME = 0.25
+MAX_SCALE = 50
+
+# the solver benchmarks start from a position where at least this much of
+# the board has been uncovered.
+MIDGAME = 0.25
+
+# try this many seeds to find a game that gets to the middle.
+MAX_TRIES = 50
+
+class Case(object):
+    """
+    Something to time.
+    -- setup(level, seed) builds the state for one operation (untimed)
+    -- run(state) is the operation
+    -- share: the fraction of NUMBER operations to time in a round, for
+        cases that are much slower than the rest
+    """
+    def __init__(self, name, setup, run, share = 1.0):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.share = share
+        return
+
+def middle(game):
+    """
+    The tile in the middle of the board, which is always clicked first.
+    """
+    return (game.rows // 2, game.cols // 2)
+
+def freshBoard(level, seed):
+    return simulate.HeadlessBoard(*level, seed = seed)
+
+def minedBoard(level, seed):
+    """
+    A board with its mines laid, but nothing uncovered yet.
+    """
+    game = freshBoard(level, seed)
+    game.layMines(*middle(game))
+    game.firstClick = False
+    return game
+
+def clearedBoard(level, seed):
+    """
+    A board with every tile without a mine uncovered, but the win not yet
+    noticed.
+    """
+    game = minedBoard(level, seed)
+    for i in range(game.rows):
+        for j in range(game.cols):
+            if not game.tiles[i][j].mine:
+                game.tiles[i][j].covered = False
+    game.safeLeft = 0
+    return game
+
+def sweepNeighbors(game):
+    """
+    Gets the neighbors of every tile on the board.
+    """
+    for i in range(game.rows):
+        for j in range(game.cols):
+            game.getNeighbors(i, j)
+    return
+
+def midgame(solverType):
+    """
+    Returns a setup function that plays a seeded game with solverType until
+    MIDGAME of the board is uncovered and the solver needs a new move. The
+    state is that solver, ready for its next guess(), the seed to guess
+    with, and the component cache it has built up over the game, so that
+    every round does the same work.
+    """
+    def setup(level, seed):
+        for attempt in range(MAX_TRIES):
+            componentCache = cache.ComponentCache()
+            cache.setDefaultCache(componentCache)
+            random.seed(seed)
+            game = freshBoard(level, seed)
+            player = solverType(game)
+            safe = game.tileCount - game.mines
+            while game.victory is None:
+                if len(player.queue) == 0:
+                    if game.safeLeft <= safe * (1 - MIDGAME):
+                        return (player, seed, componentCache)
+                    player.guess(time.time() + player.watchdog)
+                move = player.queue.popleft()
+                simulate.makeMove(game, player, move)
+                player.observe(move)
+            # the game was over too soon. Try another one.
+            seed += ROUNDS * NUMBER
+        raise RuntimeError("No game got to the midgame at {}".format(level))
+    return setup
+
+def seededGame(solverName):
+    """
+    Returns a setup function for timing a whole game with the named solver.
+    """
+    def setup(level, seed):
+        return (solverName, level, seed)
+    return setup
+
+def playGame(state):
+    """
+    Plays a whole game, with an empty component cache so that every round
+    does the same work.
+    """
+    cache.setDefaultCache(cache.ComponentCache())
+    simulate.playGame(*state)
+    return
+
+def guess(state):
+    (player, seed, componentCache) = state
+    cache.setDefaultCache(componentCache)
+    random.seed(seed)
+    player.guess(time.time() + player.watchdog)
+    return
+
+CASES = [
+    Case('layMines', freshBoard, lambda game: game.layMines(*middle(game))),
+    Case('reveal', minedBoard, lambda game: game.primaryClick(*middle(game))),
+    Case('checkVictory', clearedBoard, lambda game: game._checkVictory()),
+    Case('getNeighbors', freshBoard, sweepNeighbors),
+    Case('BasicSolver.guess', midgame(solver.BasicSolver), guess, 0.5),
+    Case('AdvancedSolver.guess', midgame(solver.AdvancedSolver), guess, 0.25),
+    Case('BasicSolver.game', seededGame('basic'), playGame, 0.25),
+    Case('AdvancedSolver.game', seededGame('advanced'), playGame, 0.1),
+]
+
+def timeCase(case, level, seed = 0, rounds = ROUNDS, number = NUMBER,
+        count = None):
+    """
+    Times a case at a level. Every round times the same count operations, on
+    the states for seeds seed, seed + 1, ... If count isn't given, it's
+    number * case.share, or as many as take MIN_ROUND_TIME if that's more
+    (but no more than MAX_SCALE times as many).
+    Returns a dictionary with the operations per second in each round, their
+    mean and standard deviation, and how they were measured.
+    """
+    # one round that isn't kept first, so that nothing is timed cold. It
+    # also shows how many operations fit in MIN_ROUND_TIME. A single
+    # operation wouldn't: the solvers' guesses can differ a hundredfold.
+    least = max(1, int(number * case.share))
+    elapsed = timeRound(case, level, seed, least)
+    if count is None:
+        count = least * min(MAX_SCALE,
+            max(1, math.ceil(MIN_ROUND_TIME / max(elapsed, 1e-6))))
+    rates = []
+    for _ in range(rounds):
+        rates.append(count / timeRound(case, level, seed, count))
+    mean = sum(rates) / rounds
+    if rounds > 1:
+        stdev = math.sqrt(sum((r - mean) ** 2 for r in rates) / (rounds - 1))
+    else:
+        stdev = 0.0
+    return {
+        'case': case.name,
+        'level': list(level),
+        'opsPerSec': mean,
+        'stdev': stdev,
+        'rates': rates,
+        'rounds': rounds,
+        'number': count,
+        'seed': seed,
+    }
+
+def timeRound(case, level, seed, count):
+    """
+    Times count operations of a case, on the states for seeds seed,
+    seed + 1, ... Returns the seconds they took, not counting their setup.
+    """
+    states = [case.setup(level, seed + n) for n in range(count)]
+    elapsed = 0.0
+    for state in states:
+        start = time.perf_counter()
+        case.run(state)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+def commit():
+    """
+    Returns the hash of the commit being benchmarked, or None if it can't be
+    found out.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True,
+            text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(caseNames = None, levelNames = None, seed = 0, rounds = ROUNDS,
+        number = NUMBER, counts = None):
+    """
+    Times every case (or the named ones) at every level (or the named ones).
+    counts can give how many operations to time in a round, by (case name,
+    level name), e.g. to repeat an earlier run's; other cases work it out.
+    Returns the results, along with what they were measured on, as a
+    dictionary that can be saved as JSON.
+    """
+    if counts is None:
+        counts = {}
+    cases = [case for case in CASES if caseNames is None or case.name in caseNames]
+    if levelNames is None:
+        levelNames = list(LEVELS)
+    results = []
+    # the solvers log every random guess, which would swamp the results.
+    logger = logging.getLogger()
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        for case in cases:
+            for levelName in levelNames:
+                result = timeCase(case, LEVELS[levelName], seed, rounds, number,
+                    counts.get((case.name, levelName)))
+                result['levelName'] = levelName
+                results.append(result)
+    finally:
+        logger.setLevel(level)
+    return {
+        'settings': {
+            'cases': [case.name for case in cases],
+            'levels': levelNames,
+            'seed': seed,
+            'rounds': rounds,
+            'number': number,
+        },
+        'commit': commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[1])
+    parser.add_argument('--cases', nargs = '+',
+        choices = [case.name for case in CASES], help = "default: all of them")
+    parser.add_argument('--levels', nargs = '+', choices = LEVELS,
+        help = "default: all of them")
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--rounds', type = int, default = ROUNDS)
+    parser.add_argument('--number', type = int, default = NUMBER,
+        help = "how many operations to time in each round, at least")
+    parser.add_argument('--json', help = "save the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
+    report = run(args.cases, args.levels, args.seed, args.rounds, args.number)
+    for result in report['results']:
+        logging.info("{:<22}{:<14}{:>12.1f} ops/s +- {:.1%}".format(
+            result['case'], result['levelName'], result['opsPerSec'],
+            result['stdev'] / result['opsPerSec']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent = 1)
+    return
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ from tkinter import font
 
 import random
 
+import rules
+
 IMAGE_GRAPHICS = True
 if IMAGE_GRAPHICS:
     from PIL import ImageTk, Image
@@ -31,11 +33,12 @@ EXPERT = (16, 40, 99)
 root = Tk()
 
 
-class Board(object):
+class Board(rules.Rules):
     """
     The board of a minesweeper game.
     Consists of a rows and columns of tiles (tkinter buttons)
     Plus an info box and a restart button
+    The rules of the game are in rules.Rules; this adds the window.
     """
     def __init__(self, rows, cols = None, mines = None):
         """
@@ -47,12 +50,7 @@ class Board(object):
         self._parseArgs(rows, cols, mines)
         self.tileCount = self.rows * self.cols
         self.tiles = None # will be initialized in self.initGUI()
-        # some implementations of minesweeper decide the mine positions
-        # when the board is first generated. But the original Microsoft
-        # implementation has it so that the first tile will always have no
-        # mines in neighboring tiles. So a flag for the first tile to click.
-        self.firstClick = True
-        self.victory = None
+        self._newGame()
 
         # set up the GUI elements
         # create a window
@@ -113,89 +111,6 @@ class Board(object):
         self.tileWindow.grid()
         return
 
-    def primaryClick(self, i, j):
-        """
-        The actions you take when a tile has a left-click.
-        """
-        # if all the tiles are covered, set the positions for all the mines
-        if self.firstClick:
-            self.layMines(i, j)
-            self.firstClick = False
-        # if the tile has a flag, or if the tile is already uncovered,
-        # the primary click does nothing.
-        elif (self.tiles[i][j].flag) or (self.tiles[i][j].covered is False):
-            return
-        # if the tile is unflagged and has a mine, then you lose.
-        # Call the game over function.
-        if self._checkGameOver(i, j):
-            return
-        # if none of the above conditions is satisfied, then uncover the tile
-        self.tiles[i][j].covered = False
-        # we will already have computed the number for the tile in the
-        # laymines() method. We only need to check it here.
-        if self.tiles[i][j].number == 0:
-            # if there are no mines nearby, automatically uncover all the
-            # nearby tiles.
-            zeroNeighbors = [(i, j)]
-            while len(zeroNeighbors) > 0:
-                currentZero = zeroNeighbors.pop(0)
-                # get the neighbors for the first element in the queue
-                newNeighbors = self.getNeighbors(*currentZero)
-                for n in newNeighbors:
-                    # if the neighbor is covered, uncovrer it
-                    if self.tiles[n].covered:
-                        self.tiles[n].covered = False
-                        self.tiles[n].updateGUI()
-                        # if the number is zero, add it to the queue so we can
-                        # uncover all of its neighbors later.
-                        if self.tiles[n].number == 0:
-                            zeroNeighbors.append(n)
-
-        # check for victory
-        self._checkVictory()
-        # at the end of the routine, update the tile's graphics
-        self.tiles[i][j].updateGUI()
-        return
-
-    def secondaryClick(self, i, j):
-        """
-        the actions when a tile has a right-click
-        """
-        # if a tile is uncovered, don't flag it
-        if self.tiles[i][j].covered is False:
-            # shouldn't be possible to get into a state where tile.flag is
-            # True, but just in case
-            self.tiles[i][j].flag = False
-        # otherwise, toggle the flag
-        else:
-            self.tiles[i][j].flag = not self.tiles[i][j].flag
-        self.tiles[i][j].updateGUI()
-
-        self._checkVictory()
-
-        return
-
-    def doubleClick(self, i, j):
-        """
-        The actions taken when a tile is double-clicked
-        """
-        # if a tile is covered, a double click will count the same as single
-        if self.tiles[i][j].covered:
-            self.primaryClick(i, j)
-            return
-        if self.tiles[i][j].number > 0:
-            # get the indices of all the neighbors of the double-clicked cell.
-            neighbors = self.getNeighbors(i, j)
-            # count the flags near the tile in question.
-            flags = sum([self.tiles[n].flag for n in neighbors])
-            # check if the number of flags is equal to the number of mines
-            if flags == self.tiles[i][j].number:
-                # if it is, then primary click on every neighbor.
-                # go ahead and click on flagged and uncovered tiles. It's fine.
-                for n in neighbors:
-                    self.primaryClick(*n)
-        return
-
     def layMines(self, clickRow, clickCol):
         """
         Decides which tiles should be mines and lays them there.
@@ -231,55 +146,6 @@ class Board(object):
                         self.tiles[n].number += 1
         return
 
-    def _checkGameOver(self, row, col):
-        """
-        When we trip a mine, the game is over. Put all the logic that happens
-        here.
-        """
-        # if we have a mine
-        if self.tiles[row, col].mine is False:
-            return False
-        else:
-            # put a game over message in the infoBox
-            self.infoBox.configure(text = LOSE_MESSAGE)
-
-            # show the mine as exploded
-            self.tiles[row, col].exploded = True
-
-            # disable all the tiles
-            # show the mines
-            for i in range(self.rows):
-                for j in range(self.cols):
-                    # uncover the mines
-                    if self.tiles[i][j].mine:
-                        self.tiles[i][j].covered = False
-                        self.tiles[i][j].updateGUI()
-                    elif self.tiles[i][j].flag:
-                        self.tiles[i][j].exploded = True
-                        self.tiles[i][j].updateGUI()
-            self.victory= False
-            return True
-
-    def _checkVictory(self):
-        # if there is any tile on the board that is covered and has a mine,
-        # there's no victory yet.
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if (self.tiles[i][j].mine is False) and (self.tiles[i][j].covered is True):
-                    return False
-
-        # Put a Victory message in the info box
-        self.victory= True
-        self.infoBox.configure(text = WIN_MESSAGE)
-        # flag all the mines and disable all the tiles
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.tiles[i][j].mine is True:
-                    self.tiles[i][j].flag = True
-                # update the GUI for every tile.
-                self.tiles[i][j].updateGUI()
-        return True
-
     def restart(self):
         """
         if the restart button is pressed, then, well, restart.
@@ -291,26 +157,25 @@ class Board(object):
                 self.tiles[i][j].updateGUI()
 
         self.infoBox.configure(text = GAME_MESSAGE)
-        self.firstClick = True
-        self.victory = None
+        self._newGame()
         return
 
-    def getNeighbors(self, i, j):
+    def _showTile(self, i, j):
         """
-        returns all the tiles adjacent to tiles[i, j]
+        Updates a tile's button after it changes.
         """
-        neighbors = set()
-        for row in range(i-1, i+2):
-            if row < 0 or row >= self.rows:
-                continue
-            for col in range(j-1, j+2):
-                if row == i and col == j:
-                    continue
-                elif col < 0 or col >= self.cols:
-                    continue
-                else:
-                    neighbors.add((row, col))
-        return neighbors
+        self.tiles[i][j].updateGUI()
+        return
+
+    def _showEnd(self):
+        """
+        Puts a victory or game over message in the info box.
+        """
+        if self.victory:
+            self.infoBox.configure(text = WIN_MESSAGE)
+        else:
+            self.infoBox.configure(text = LOSE_MESSAGE)
+        return
 
     def show(self):
         self.window.grid()
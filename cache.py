@@ -0,0 +1,258 @@
+"""
+cache.py
+
+Remembers the counts for frontier components the engine has already solved.
+
+The same small shapes turn up on the frontier over and over, within a game
+and from one game to the next: a lone 1 against a wall, a 1-2-1 along a
+straight edge, and so on. Counting one is cheap, but counting it again every
+move adds up, and the bigger ones aren't cheap at all.
+
+A component is turned into a signature that doesn't depend on where it is on
+the board or which way round it is: its cells are moved to the corner and
+tried under all 8 rotations and reflections, and the smallest version wins.
+The counts are kept in that canonical order, and put back into the
+component's own order when they're looked up.
+
+The cache can also be kept in a file (see SQLiteCache), so that solved
+components carry over between runs and between processes.
+"""
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+import frontier
+
+# keep the counts for at most this many components in memory.
+CACHE_SIZE = 4096
+
+# and at most this many in a cache file.
+DISK_CACHE_SIZE = 1000000
+
+# check whether the cache file is too big once every this many stores.
+EVICT_INTERVAL = 1000
+
+# how long to wait, in seconds, for another process to finish writing.
+BUSY_TIMEOUT = 1.0
+
+def signature(component):
+    """
+    Returns (key, order) for a frontier.Component. The key is the same for
+    any two components that are rotations, reflections or shifts of each
+    other with the same numbers. order[n] is the position of the
+    component's cell n in the canonical order.
+    """
+    best = None
+    for transform in frontier.TRANSFORMS:
+        moved = [transform(*cell) for cell in component.cells]
+        top = min(row for (row, _) in moved)
+        left = min(col for (_, col) in moved)
+        moved = [(row - top, col - left) for (row, col) in moved]
+        # sort the cells, and remember where each one went.
+        ranked = sorted(range(len(moved)), key = moved.__getitem__)
+        order = [0] * len(moved)
+        for (position, n) in enumerate(ranked):
+            order[n] = position
+        constraints = tuple(sorted(
+            (tuple(sorted(order[n] for n in indices)), mines)
+            for (indices, mines) in component.constraints))
+        key = (tuple(moved[n] for n in ranked), constraints)
+        if best is None or key < best[0]:
+            best = (key, order)
+    return best
+
+class ComponentCache(object):
+    """
+    A bounded table of component signature -> counts, which throws out the
+    least recently used entry when it's full.
+    -- hits, misses: how many lookups found and didn't find their component
+    """
+    def __init__(self, size = CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        return
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, component, table):
+        """
+        Fills in a fresh probability.ComponentTable for the component from
+        the cache. Returns True if the component was there and False if not.
+        """
+        (key, order) = signature(component)
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return False
+        self.hits += 1
+        (counts, cellCounts) = entry
+        for (mines, count) in counts.items():
+            table.counts[mines] = count
+            canonical = cellCounts[mines]
+            table.cellCounts[mines] = [canonical[order[n]]
+                for n in range(len(order))]
+        return True
+
+    def put(self, component, table):
+        """
+        Stores the counts from an exactly counted ComponentTable.
+        """
+        (key, order) = signature(component)
+        cellCounts = {}
+        for (mines, counts) in table.cellCounts.items():
+            canonical = [0] * len(order)
+            for (n, count) in enumerate(counts):
+                canonical[order[n]] = count
+            cellCounts[mines] = tuple(canonical)
+        self._store(key, (dict(table.counts), cellCounts))
+        return
+
+    def hitRate(self):
+        """
+        Returns the fraction of lookups that were found, or None if there
+        haven't been any.
+        """
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return None
+        return self.hits / lookups
+
+    def _lookup(self, key):
+        """
+        Returns the (counts, cellCounts) stored under a signature, or None.
+        """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+        return
+
+class SQLiteCache(ComponentCache):
+    """
+    A ComponentCache that also keeps every component it solves in an SQLite
+    file, so that the counts outlive the process and can be shared between
+    processes running at the same time.
+
+    Recently used components are kept in memory too, as in a ComponentCache.
+    The file is opened in write-ahead-log mode, so any number of processes
+    can read it while one writes. Each row records when it was last read
+    from or written to the file, and once the file holds more than size
+    components the least recently used ones are deleted.
+    -- diskHits: how many of the hits came from the file
+    If the file is busy for too long, lookups miss and stores are skipped
+    rather than holding up the solver.
+    """
+    def __init__(self, path, size = DISK_CACHE_SIZE, memorySize = CACHE_SIZE):
+        super().__init__(memorySize)
+        self.path = path
+        self.diskSize = size
+        self.diskHits = 0
+        self.stores = 0
+        # the solver runs in its own thread, which isn't necessarily the one
+        # that made the cache.
+        self.connection = sqlite3.connect(path, timeout = BUSY_TIMEOUT,
+            isolation_level = None, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS components "
+            "(key TEXT PRIMARY KEY, entry TEXT NOT NULL, used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS components_used "
+            "ON components (used)")
+        return
+
+    def close(self):
+        self.connection.close()
+        return
+
+    def _lookup(self, key):
+        entry = super()._lookup(key)
+        if entry is not None:
+            return entry
+        text = repr(key)
+        try:
+            row = self.connection.execute(
+                "SELECT entry FROM components WHERE key = ?", (text,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE components SET used = ? WHERE key = ?",
+                (time.time(), text))
+        except sqlite3.OperationalError as e:
+            logging.debug("Component cache unavailable: {}".format(e))
+            return None
+        self.diskHits += 1
+        entry = _decode(row[0])
+        super()._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        super()._store(key, entry)
+        try:
+            self.connection.execute("INSERT OR REPLACE INTO components "
+                "(key, entry, used) VALUES (?, ?, ?)",
+                (repr(key), _encode(entry), time.time()))
+            self.stores += 1
+            if self.stores % EVICT_INTERVAL == 0:
+                self._evict()
+        except sqlite3.OperationalError as e:
+            logging.debug("Component cache unavailable: {}".format(e))
+        return
+
+    def _evict(self):
+        """
+        Deletes the least recently used components once there are too many.
+        """
+        (count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM components").fetchone()
+        if count > self.diskSize:
+            self.connection.execute("DELETE FROM components WHERE key IN "
+                "(SELECT key FROM components ORDER BY used LIMIT ?)",
+                (count - self.diskSize,))
+        return
+
+def _encode(entry):
+    """
+    Turns (counts, cellCounts) into text for the database. The counts can be
+    bigger than any float, so they're kept as JSON ints.
+    """
+    (counts, cellCounts) = entry
+    return json.dumps([[mines, count, list(cellCounts[mines])]
+        for (mines, count) in sorted(counts.items())])
+
+def _decode(text):
+    counts = {}
+    cellCounts = {}
+    for (mines, count, cells) in json.loads(text):
+        counts[mines] = count
+        cellCounts[mines] = tuple(cells)
+    return (counts, cellCounts)
+
+_defaultCache = ComponentCache()
+
+def defaultCache():
+    """
+    Returns the cache the probability engine uses unless it's given another.
+    It's shared by every engine, so that the counts carry over from move to
+    move and from game to game.
+    """
+    return _defaultCache
+
+def setDefaultCache(componentCache):
+    """
+    Replaces the shared cache, e.g. with an SQLiteCache so that the counts
+    are kept on disk. Returns the old one.
+    """
+    global _defaultCache
+    old = _defaultCache
+    _defaultCache = componentCache
+    return old
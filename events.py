@@ -0,0 +1,117 @@
+"""
+events.py
+
+Structured events from the solver: every move it makes and the rule that
+came up with it, every risk it takes and how big it thought the risk was,
+and how long each phase of a guess took.
+
+An event is a dictionary of its time, its name and its fields, handed to
+every attached sink: a JSONLinesSink writes them to a file, a BufferSink
+keeps them for someone else to write (simulate.py's workers send theirs
+back with each game). Events don't go through the logging module, which
+costs too much per record for something that happens on every move.
+
+Nothing about an event is built unless it's going to be kept: the solver
+asks sample() first, which is a single check when no sink is attached, and
+keeps only a random share of events (see setRate()) when one is. The share
+is drawn from a generator of its own, so sampling doesn't change what a
+seeded game does.
+"""
+import json
+import random
+import time
+
+_sinks = []
+
+# the share of events that are kept.
+_rate = 1.0
+_random = random.Random()
+
+def sample():
+    """
+    Returns True if the next event should be kept. Check it before building
+    an event, since an event that isn't kept shouldn't cost anything.
+    """
+    if not _sinks:
+        return False
+    return _rate >= 1.0 or _random.random() < _rate
+
+def emit(event, **fields):
+    """
+    Sends an event, with its fields, to every sink.
+    """
+    entry = {'time': time.time(), 'event': event}
+    entry.update(fields)
+    for sink in _sinks:
+        sink.write(entry)
+    return
+
+def setRate(rate):
+    """
+    Keeps only this share of the events, at random.
+    """
+    global _rate
+    _rate = rate
+    return
+
+def attach(sink, rate = 1.0):
+    """
+    Starts sending events to a sink, keeping rate of them. Returns the sink.
+    """
+    setRate(rate)
+    _sinks.append(sink)
+    return sink
+
+def detach(sink):
+    """
+    Stops sending events to a sink, and closes it.
+    """
+    _sinks.remove(sink)
+    sink.close()
+    return
+
+def record(path, rate = 1.0):
+    """
+    Starts writing events to a JSON lines file. Returns the sink, to be
+    detached with detach().
+    """
+    return attach(JSONLinesSink(path), rate)
+
+class JSONLinesSink(object):
+    """
+    Writes every event to a file as a line of JSON.
+    """
+    def __init__(self, path, mode = 'w'):
+        self.file = open(path, mode)
+        return
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        return
+
+    def close(self):
+        self.file.close()
+        return
+
+class BufferSink(object):
+    """
+    Keeps every event until it's drained. Turning them into JSON is left to
+    whoever drains them.
+    """
+    def __init__(self):
+        self.entries = []
+        return
+
+    def write(self, entry):
+        self.entries.append(entry)
+        return
+
+    def drain(self):
+        """
+        Returns the events kept so far, and starts again.
+        """
+        (entries, self.entries) = (self.entries, [])
+        return entries
+
+    def close(self):
+        return
@@ -149,14 +149,14 @@ def generatePossibilities():
         p = possibilityGenerator(L)
         for __ in range(8):
             p.next()
-    print("First method completed in {} s".format(startTime - time.time()))
+    print("First method completed in {} s".format(time.time() - startTime))
 
     startTime = time.time()
     for _ in range(int(1e6)):
         p = possibilityGenerator(L)
         for __ in range(8):
             p.hacky_next()
-    print("Second method completed in {} s".format(startTime - time.time()))
+    print("Second method completed in {} s".format(time.time() - startTime))
 
 def stringFormat():
     print("Number: {:.2%}".format(5.0))
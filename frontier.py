@@ -0,0 +1,474 @@
+"""
+frontier.py
+
+The solver only ever learns anything from the numbers on the edge of the
+uncovered region. This module turns that edge into a set of constraints --
+"exactly n of these covered tiles are mines" -- that the probability engines
+can work with, and splits it into independent pieces.
+"""
+import math
+
+try:
+    import numpy
+except ImportError:
+    # numpy is optional. Without it, a ConstraintMatrix counts mines with
+    # integer operations instead.
+    numpy = None
+
+try:
+    popcount = int.bit_count
+except AttributeError: # int.bit_count is new in python 3.10
+    def popcount(n):
+        return bin(n).count('1')
+
+# a ConstraintMatrix packs the mines each arrangement puts under every
+# constraint into one int, this many bits apiece, which is enough for blocks
+# of up to 15 cells.
+PACK_BITS = 4
+
+# count at least this many arrangements with numpy. Fewer aren't worth the
+# cost of building the arrays.
+NUMPY_THRESHOLD = 256
+
+# numpy can only hold this many bits of packed counts in an int64.
+NUMPY_MAX_BITS = 62
+
+# the eight neighbors of a tile, in the order of their bits in a local mask.
+# A set of tiles around a tile fits in 8 bits: bit n is the tile at
+# NEIGHBOR_OFFSETS[n] from it.
+NEIGHBOR_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1),
+    (0, 1), (1, -1), (1, 0), (1, 1))
+NEIGHBOR_BITS = {offset: 1 << n for (n, offset) in enumerate(NEIGHBOR_OFFSETS)}
+
+# the 8 symmetries of the board (rotations and reflections), as functions of
+# an offset or a position.
+TRANSFORMS = (
+    lambda r, c: (r, c),
+    lambda r, c: (c, -r),
+    lambda r, c: (-r, -c),
+    lambda r, c: (-c, r),
+    lambda r, c: (r, -c),
+    lambda r, c: (-r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (-c, -r),
+)
+
+class Frontier(object):
+    """
+    The boundary between what the solver knows and what it doesn't.
+
+    -- cells: the covered, unflagged tiles next to at least one number
+    -- constraints: a list of (cells, mines) pairs, one per useful number
+    -- interior: how many covered, unflagged tiles touch no number at all
+    -- minesLeft: how many mines haven't been flagged yet
+    """
+    def __init__(self, constraints, interior, minesLeft):
+        """
+        Takes a list of (cells, mines) pairs, where cells is any iterable of
+        (row, col) tuples, plus the interior tile count and the number of
+        unflagged mines.
+        """
+        self.constraints = [(frozenset(cells), mines)
+            for (cells, mines) in constraints]
+        self.interior = interior
+        self.minesLeft = minesLeft
+
+        # give every frontier cell an index so the engines can work with
+        # lists instead of dictionaries.
+        cells = set()
+        for (constraintCells, _) in self.constraints:
+            cells.update(constraintCells)
+        self.cells = sorted(cells)
+        self.index = {cell: n for (n, cell) in enumerate(self.cells)}
+        return
+
+    def __len__(self):
+        return len(self.cells)
+
+    def components(self):
+        """
+        Splits the frontier into groups of cells that share no constraints.
+        The mines in one group tell us nothing about the mines in another
+        (other than through the total mine count), so each can be counted
+        separately.
+
+        Returns a list of Component objects.
+        """
+        # union-find over the cell indices
+        parent = list(range(len(self.cells)))
+
+        def find(n):
+            while parent[n] != n:
+                parent[n] = parent[parent[n]]
+                n = parent[n]
+            return n
+
+        for (cells, _) in self.constraints:
+            indices = [self.index[cell] for cell in cells]
+            root = find(indices[0])
+            for n in indices[1:]:
+                parent[find(n)] = root
+
+        # gather the cells and constraints belonging to each root.
+        groups = {}
+        for n in range(len(self.cells)):
+            groups.setdefault(find(n), ([], []))[0].append(self.cells[n])
+        for (cells, mines) in self.constraints:
+            root = find(self.index[next(iter(cells))])
+            groups[root][1].append((cells, mines))
+
+        return [Component(cells, constraints)
+            for (cells, constraints) in groups.values()]
+
+    def compareConstraints(self):
+        """
+        Finds mines and safe cells by comparing overlapping constraints.
+        For constraints A and B, if B needs as many more mines than A as it
+        has cells that A doesn't, then those cells are all mines, and A's
+        cells that B doesn't have are all safe. When A is a subset of B this
+        also catches the case where B needs no more mines than A, and its
+        extra cells are safe (a 1-1 pattern).
+
+        Only constraints that share a cell are compared, found through an
+        index from each cell to the constraints it is in.
+
+        Returns a (mines, safe) pair of sets of cells.
+        """
+        index = {}
+        for (c, (cells, _)) in enumerate(self.constraints):
+            for cell in cells:
+                index.setdefault(cell, []).append(c)
+
+        mines = set()
+        safe = set()
+        for (a, (cellsA, minesA)) in enumerate(self.constraints):
+            overlapping = set()
+            for cell in cellsA:
+                overlapping.update(index[cell])
+            for b in overlapping:
+                if b == a:
+                    continue
+                (cellsB, minesB) = self.constraints[b]
+                onlyB = cellsB - cellsA
+                if not onlyB:
+                    continue
+                extra = minesB - minesA
+                if extra == len(onlyB):
+                    mines.update(onlyB)
+                    safe.update(cellsA - cellsB)
+                elif extra == 0 and cellsA <= cellsB:
+                    safe.update(onlyB)
+        return (mines, safe)
+
+    def reduceConstraints(self):
+        """
+        Finds mines and safe cells by treating the constraints as a system of
+        linear equations (the cells around a number add up to the mines it
+        still needs) and row-reducing it.
+
+        Every reduced row is then checked against the fact that each cell is
+        0 or 1: if a row's total can only be reached by setting every cell
+        with a positive coefficient to 1 and every cell with a negative one
+        to 0 (or the other way around), those cells are decided. Decided
+        cells are substituted back in and the rows checked again, until
+        nothing new turns up.
+
+        If there are no interior tiles, every remaining mine is on the
+        frontier, which gives one more equation.
+
+        Returns a (mines, safe) pair of sets of cells.
+        """
+        rows = []
+        for (cells, mines) in self.constraints:
+            rows.append(LinearRow({self.index[cell]: 1 for cell in cells}, mines))
+        if self.interior == 0 and self.cells:
+            rows.append(LinearRow({n: 1 for n in range(len(self.cells))},
+                self.minesLeft))
+
+        # Gauss-Jordan elimination, one column at a time. A row's support
+        # bitset tells us at a glance whether it has the column at all.
+        pivots = set()
+        for column in range(len(self.cells)):
+            bit = 1 << column
+            pivot = None
+            for row in rows:
+                if row.support & bit and row not in pivots:
+                    pivot = row
+                    break
+            if pivot is None:
+                continue
+            pivots.add(pivot)
+            for row in rows:
+                if row is not pivot and row.support & bit:
+                    row.eliminate(pivot, column)
+
+        values = {}
+        changed = True
+        while changed:
+            changed = False
+            for row in rows:
+                for (column, value) in row.decide().items():
+                    if column not in values:
+                        values[column] = value
+                        changed = True
+            if changed:
+                for row in rows:
+                    row.substitute(values)
+
+        mines = {self.cells[n] for (n, value) in values.items() if value == 1}
+        safe = {self.cells[n] for (n, value) in values.items() if value == 0}
+        return (mines, safe)
+
+class LinearRow(object):
+    """
+    One equation, sum(coefficients[n] * cell n) == total, for
+    Frontier.reduceConstraints(). Coefficients are ints, kept small by
+    dividing the row through by the gcd after every elimination. The support
+    is a bitset of the cells with a non-zero coefficient.
+    """
+    def __init__(self, coefficients, total):
+        self.coefficients = coefficients
+        self.total = total
+        self._updateSupport()
+        return
+
+    def _updateSupport(self):
+        self.support = 0
+        for column in self.coefficients:
+            self.support |= 1 << column
+        return
+
+    def eliminate(self, pivot, column):
+        """
+        Subtracts a multiple of the pivot row so that this row's coefficient
+        on column becomes zero, without ever leaving the integers.
+        """
+        a = pivot.coefficients[column]
+        b = self.coefficients[column]
+        coefficients = {n: a * c for (n, c) in self.coefficients.items()}
+        for (n, c) in pivot.coefficients.items():
+            coefficients[n] = coefficients.get(n, 0) - b * c
+        self.coefficients = {n: c for (n, c) in coefficients.items() if c != 0}
+        self.total = a * self.total - b * pivot.total
+        self._normalize()
+        return
+
+    def substitute(self, values):
+        """
+        Replaces any cells whose values are known.
+        """
+        if not any((self.support >> n) & 1 for n in values):
+            return
+        for (n, value) in values.items():
+            if n in self.coefficients:
+                self.total -= self.coefficients.pop(n) * value
+        self._normalize()
+        return
+
+    def decide(self):
+        """
+        Returns a dictionary of the cells whose values this row forces.
+        """
+        highest = sum(c for c in self.coefficients.values() if c > 0)
+        lowest = sum(c for c in self.coefficients.values() if c < 0)
+        if self.total == highest:
+            return {n: int(c > 0) for (n, c) in self.coefficients.items()}
+        elif self.total == lowest:
+            return {n: int(c < 0) for (n, c) in self.coefficients.items()}
+        return {}
+
+    def _normalize(self):
+        divisor = abs(self.total)
+        for c in self.coefficients.values():
+            divisor = math.gcd(divisor, c)
+        if divisor > 1:
+            self.coefficients = {n: c // divisor for (n, c) in self.coefficients.items()}
+            self.total //= divisor
+        self._updateSupport()
+        return
+
+class Component(object):
+    """
+    A connected piece of the frontier.
+
+    Cells are stored in an order where neighboring cells tend to share
+    constraints, which lets the search notice a contradiction early.
+    Constraints are stored as (indices, mines) pairs, where the indices
+    refer to positions in self.cells.
+    """
+    def __init__(self, cells, constraints):
+        self.cells = self._order(cells, constraints)
+        self.index = {cell: n for (n, cell) in enumerate(self.cells)}
+        self.constraints = [(tuple(sorted(self.index[cell] for cell in cells)),
+            mines) for (cells, mines) in constraints]
+        # for every cell, the constraints it takes part in.
+        self.cellConstraints = [[] for _ in self.cells]
+        for (c, (indices, _)) in enumerate(self.constraints):
+            for n in indices:
+                self.cellConstraints[n].append(c)
+        return
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _order(self, cells, constraints):
+        """
+        Orders the cells with a breadth-first walk over shared constraints.
+        """
+        cellConstraints = {cell: [] for cell in cells}
+        for (constraintCells, _) in constraints:
+            for cell in constraintCells:
+                cellConstraints[cell].append(constraintCells)
+
+        ordered = []
+        seen = set()
+        for start in sorted(cells):
+            if start in seen:
+                continue
+            seen.add(start)
+            queue = [start]
+            while queue:
+                cell = queue.pop(0)
+                ordered.append(cell)
+                for constraintCells in cellConstraints[cell]:
+                    for other in sorted(constraintCells):
+                        if other not in seen:
+                            seen.add(other)
+                            queue.append(other)
+        return ordered
+
+def mergeComponents(components):
+    """
+    Joins several components into one, so that they can be handled together.
+    """
+    cells = []
+    constraints = []
+    for component in components:
+        cells.extend(component.cells)
+        for (indices, mines) in component.constraints:
+            constraints.append((frozenset(component.cells[n] for n in indices), mines))
+    return Component(cells, constraints)
+
+class ConstraintMatrix(object):
+    """
+    Checks every arrangement of mines on a few cells against a set of
+    constraints at once.
+
+    An arrangement is an int, with bit n set if cells[n] is a mine, and each
+    constraint is a bitmask of the cells it covers. The mines that every
+    arrangement puts under all the constraints are counted once, up front,
+    packed into one int, PACK_BITS bits per constraint: cell n adds a packed
+    column with a 1 for every constraint it's in, so the counts for all the
+    arrangements come from adding columns to the counts for the arrangements
+    without them. With numpy, the same counts are one product of a matrix of
+    the arrangements' bits with the packed columns. After that, finding the
+    arrangements that put given numbers of mines under the constraints is one
+    dictionary lookup.
+    """
+    def __init__(self, cells, constraints):
+        """
+        Takes a list of cells and a list of constraints, each an iterable of
+        cells. Any constraint cells not in the list are ignored.
+        """
+        self.cells = list(cells)
+        index = {cell: n for (n, cell) in enumerate(self.cells)}
+        self.masks = []
+        for constraintCells in constraints:
+            mask = 0
+            for cell in constraintCells:
+                if cell in index:
+                    mask |= 1 << index[cell]
+            self.masks.append(mask)
+        self.columns = [sum(((mask >> n) & 1) << (PACK_BITS * c)
+            for (c, mask) in enumerate(self.masks))
+            for n in range(len(self.cells))]
+
+        # the arrangements by their packed counts, each with its own number
+        # of mines.
+        self.arrangements = {}
+        mines = [0]
+        for _ in self.cells:
+            mines += [m + 1 for m in mines]
+        for (arrangement, packed) in enumerate(self._packAll()):
+            self.arrangements.setdefault(packed, []).append(
+                (arrangement, mines[arrangement]))
+        return
+
+    def matching(self, mines):
+        """
+        Returns every arrangement that puts exactly mines[c] mines under each
+        constraint c, as a list of (arrangement, mines in it) pairs. The list
+        is shared, so don't change it.
+        """
+        packed = 0
+        for (c, count) in enumerate(mines):
+            if not 0 <= count <= len(self.cells):
+                return []
+            packed |= count << (PACK_BITS * c)
+        return self.arrangements.get(packed, [])
+
+    def _packAll(self):
+        """
+        Returns a list of the packed counts of every arrangement, in order.
+        """
+        count = 2 ** len(self.cells)
+        if (numpy is not None and count >= NUMPY_THRESHOLD
+                and PACK_BITS * len(self.masks) <= NUMPY_MAX_BITS):
+            shifts = numpy.arange(len(self.cells), dtype = numpy.int64)
+            bits = (numpy.arange(count, dtype = numpy.int64)[:, None] >> shifts) & 1
+            return (bits @ numpy.array(self.columns, dtype = numpy.int64)).tolist()
+        packed = [0]
+        for column in self.columns:
+            packed += [p + column for p in packed]
+        return packed
+
+def localCells(row, col, mask):
+    """
+    Returns a list of the cells in a local mask around (row, col) (see
+    NEIGHBOR_OFFSETS).
+    """
+    return [(row + dRow, col + dCol)
+        for (n, (dRow, dCol)) in enumerate(NEIGHBOR_OFFSETS) if (mask >> n) & 1]
+
+def _maskShifts():
+    """
+    Builds MASK_SHIFTS: for a tile at (dRow, dCol) from another, and a local
+    mask around it, the same tiles as a local mask around the other. Tiles
+    that aren't next to the other are left out.
+    """
+    shifts = {}
+    for dRow in range(-2, 3):
+        for dCol in range(-2, 3):
+            table = []
+            for mask in range(256):
+                moved = 0
+                for (n, (row, col)) in enumerate(NEIGHBOR_OFFSETS):
+                    if (mask >> n) & 1:
+                        moved |= NEIGHBOR_BITS.get((row + dRow, col + dCol), 0)
+                table.append(moved)
+            shifts[(dRow, dCol)] = table
+    return shifts
+
+# MASK_SHIFTS[(dRow, dCol)][mask] moves a local mask from around a tile to
+# around the tile (-dRow, -dCol) away from it.
+MASK_SHIFTS = _maskShifts()
+
+def _localCombos():
+    """
+    Builds LOCAL_COMBOS: for every 8-bit mask and every count, a list of all
+    the ways to choose that many bits out of the mask.
+    """
+    table = [[[] for _ in range(9)] for _ in range(256)]
+    for mask in range(256):
+        # walk through the submasks of mask.
+        combo = mask
+        while True:
+            table[mask][popcount(combo)].append(combo)
+            if combo == 0:
+                break
+            combo = (combo - 1) & mask
+    return table
+
+# LOCAL_COMBOS[mask][count] is every way to place count mines on the tiles in
+# a local mask.
+LOCAL_COMBOS = _localCombos()
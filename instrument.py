@@ -0,0 +1,149 @@
+"""
+instrument.py
+
+Keeps count of where a solver's time goes.
+
+Every solver has a SolverStats. The solver runs each phase of a guess (and
+the propagation after each move) inside stats.phase(name), which adds up the
+calls, the wall-clock and CPU time, and the moves the phase queued. Each of
+those moves is tagged with the phase as its source, so it's always known
+which rule came up with a move. The phases also add to named counters (how
+many combos were checked, how big the frontier was, ...), and send a 'phase'
+event with their timing (see events.py).
+
+That costs a couple of microseconds a phase, which is nothing next to the
+phases themselves, so it's always on. After a game the numbers can be read
+off solver.stats, and asDict() turns them into plain dictionaries that can be
+added up over many games with merge(), which is what simulate.py does.
+"""
+import time
+
+import events
+
+class PhaseStats(object):
+    """
+    What one phase has cost so far. Also the context manager that times it.
+    -- calls: how many times the phase has run
+    -- wall, cpu: the seconds of wall-clock and CPU time it's taken
+    -- moves: how many moves it queued
+    """
+    __slots__ = ('name', 'solver', 'calls', 'wall', 'cpu', 'moves',
+        '_wall', '_cpu', '_queued')
+
+    def __init__(self, name, solver):
+        self.name = name
+        self.solver = solver
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.moves = 0
+        return
+
+    def __enter__(self):
+        self._queued = len(self.solver.queue)
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        wall = time.perf_counter() - self._wall
+        self.wall += wall
+        self.cpu += time.process_time() - self._cpu
+        self.calls += 1
+        queue = self.solver.queue
+        for n in range(self._queued, len(queue)):
+            queue[n].source = self.name
+        moves = max(len(queue) - self._queued, 0)
+        self.moves += moves
+        if events.sample():
+            events.emit('phase', phase = self.name, wall = wall, moves = moves)
+        return False
+
+class SolverStats(object):
+    """
+    The instrumentation for one solver.
+    -- phases: a dictionary of phase name -> PhaseStats, in the order the
+        phases first ran
+    -- counters: a dictionary of name -> running total
+    -- peaks: a dictionary of name -> the biggest value seen
+    """
+    def __init__(self, solver):
+        self.solver = solver
+        self.phases = {}
+        self.counters = {}
+        self.peaks = {}
+        return
+
+    def phase(self, name):
+        """
+        Returns the context manager for a phase: everything inside the with
+        block counts towards it.
+        """
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name, self.solver)
+        return stats
+
+    def count(self, name, amount = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+        return
+
+    def peak(self, name, value):
+        if name not in self.peaks or value > self.peaks[name]:
+            self.peaks[name] = value
+        return
+
+    def asDict(self):
+        """
+        Returns everything as plain dictionaries and numbers, e.g. to be
+        saved as JSON or passed between processes.
+        """
+        return {
+            'phases': {name: {'calls': p.calls, 'wall': p.wall, 'cpu': p.cpu,
+                'moves': p.moves} for (name, p) in self.phases.items()},
+            'counters': dict(self.counters),
+            'peaks': dict(self.peaks),
+        }
+
+    def summary(self):
+        """
+        Returns a table of the phases, the slowest first, and the counters,
+        as a list of lines.
+        """
+        return summarize(self.asDict())
+
+def merge(total, stats):
+    """
+    Adds one asDict() into another (a running total across games, starting
+    from an empty dictionary). Returns the total.
+    """
+    phases = total.setdefault('phases', {})
+    for (name, phase) in stats['phases'].items():
+        into = phases.setdefault(name, dict.fromkeys(phase, 0))
+        for (key, value) in phase.items():
+            into[key] += value
+    counters = total.setdefault('counters', {})
+    for (name, value) in stats['counters'].items():
+        counters[name] = counters.get(name, 0) + value
+    peaks = total.setdefault('peaks', {})
+    for (name, value) in stats['peaks'].items():
+        peaks[name] = max(peaks.get(name, value), value)
+    return total
+
+def summarize(stats):
+    """
+    Returns a table of an asDict() (or a merge() of them) as a list of lines.
+    """
+    lines = ["{:<26}{:>8}{:>11}{:>11}{:>8}".format('Phase', 'Calls',
+        'Wall ms', 'CPU ms', 'Moves')]
+    phases = sorted(stats.get('phases', {}).items(),
+        key = lambda item: -item[1]['wall'])
+    for (name, phase) in phases:
+        lines.append("{:<26}{:>8}{:>11.1f}{:>11.1f}{:>8}".format(name,
+            phase['calls'], 1000 * phase['wall'], 1000 * phase['cpu'],
+            phase['moves']))
+    for (name, value) in sorted(stats.get('counters', {}).items()):
+        lines.append("{:<26}{:>8}".format(name, value))
+    for (name, value) in sorted(stats.get('peaks', {}).items()):
+        lines.append("{:<26}{:>8}".format('most ' + name, value))
+    return lines
@@ -0,0 +1,221 @@
+"""
+metrics.py
+
+Live numbers from a long run, to watch while it's still going.
+
+A Registry holds counters, gauges and histograms, and renders them in the
+Prometheus text format. Anything that runs for a long time (simulate.py, or
+a game service) keeps its numbers in one, and makes them visible in either
+of two ways:
+-- a MetricsServer answers HTTP requests on localhost with them, for
+    Prometheus (or curl) to scrape
+-- a MetricsFile rewrites a file with them every few seconds, for
+    node_exporter's textfile collector, or just for reading
+
+Both run in a daemon thread of their own, so the run doesn't have to do
+anything but update its numbers.
+"""
+import http.server
+import os
+import threading
+
+# the buckets for a histogram of seconds, from half a millisecond up.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5)
+
+# the buckets for a histogram of counts of things, doubling.
+DEPTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class Registry(object):
+    """
+    The metrics of one process, by name, in the order they were added.
+    Everything is guarded by one lock, so the numbers can be read from
+    another thread while they're being updated.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        return
+
+    def counter(self, name, help):
+        return self._add(Counter(name, help, self.lock))
+
+    def gauge(self, name, help):
+        return self._add(Gauge(name, help, self.lock))
+
+    def histogram(self, name, help, buckets = LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, self.lock, buckets))
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text format.
+        """
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append("# HELP {} {}".format(metric.name, metric.help))
+                lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+                lines.extend(metric.lines())
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metric):
+        with self.lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+class Counter(object):
+    """
+    A number that only goes up, with a value for every set of labels.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help, lock):
+        self.name = name
+        self.help = help
+        self.lock = lock
+        self.values = {}
+        return
+
+    def inc(self, amount = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        return
+
+    def lines(self):
+        return ['{}{} {}'.format(self.name, formatLabels(key), formatValue(value))
+            for (key, value) in self.values.items()]
+
+class Gauge(Counter):
+    """
+    A number that can go up and down.
+    """
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = value
+        return
+
+class Histogram(object):
+    """
+    Counts how many observations fell at or below each of the buckets, and
+    their total.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help, lock, buckets):
+        self.name = name
+        self.help = help
+        self.lock = lock
+        self.buckets = tuple(buckets)
+        # counts[n] is the observations in (buckets[n - 1], buckets[n]]; the
+        # last is everything above the biggest bucket.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        return
+
+    def observe(self, value):
+        n = 0
+        while n < len(self.buckets) and value > self.buckets[n]:
+            n += 1
+        with self.lock:
+            self.counts[n] += 1
+            self.sum += value
+        return
+
+    def lines(self):
+        lines = []
+        total = 0
+        for (bound, count) in zip(self.buckets, self.counts):
+            total += count
+            lines.append('{}_bucket{{le="{}"}} {}'.format(self.name,
+                formatValue(bound), total))
+        total += self.counts[-1]
+        lines.append('{}_bucket{{le="+Inf"}} {}'.format(self.name, total))
+        lines.append('{}_sum {}'.format(self.name, formatValue(self.sum)))
+        lines.append('{}_count {}'.format(self.name, total))
+        return lines
+
+def formatLabels(key):
+    if not key:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for (name, value) in key) + '}'
+
+def formatValue(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsServer(object):
+    """
+    Serves a registry's metrics over HTTP, at any path, from a daemon
+    thread. Only listens on localhost.
+    """
+    def __init__(self, registry, port, host = '127.0.0.1'):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                    'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            def log_message(self, *args):
+                # don't write a line to stderr for every scrape.
+                return
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target = self.server.serve_forever,
+            name = 'metrics')
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        return
+
+class MetricsFile(object):
+    """
+    Rewrites a file with a registry's metrics every interval seconds, from a
+    daemon thread, and once more when it's closed. The file is replaced in
+    one go, so a reader never sees half of it.
+    """
+    def __init__(self, registry, path, interval = 5.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.done = threading.Event()
+        self.thread = threading.Thread(target = self._run, name = 'metrics')
+        self.thread.daemon = True
+        self.thread.start()
+        return
+
+    def write(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(self.registry.render())
+        os.replace(temporary, self.path)
+        return
+
+    def close(self):
+        self.done.set()
+        self.thread.join()
+        self.write()
+        return
+
+    def _run(self):
+        while not self.done.wait(self.interval):
+            self.write()
+        return
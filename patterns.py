@@ -0,0 +1,248 @@
+"""
+patterns.py
+
+A lookup table for the small patterns that keep coming up around a number.
+
+The advanced solver decides the tiles around a number by looking at every way
+of placing its missing mines, and throwing out the ones that some number
+within two tiles won't accept. Everything that goes into that is the window
+around the number: which of its neighbors are suspicious, how many mines are
+missing, and for each nearby number, which suspicious tiles the two share and
+how many mines it will take on them. The same windows turn up all the time,
+so the answers are worked out ahead of time and kept in a table.
+
+The table is built offline by playing games with the advanced solver on a
+simulate.HeadlessBoard and keeping the windows that come up often (see
+generate()). Only one of the 8
+rotations and reflections of a window is stored in the file, and the table
+fills in the rest when it's loaded, so that looking up a window is a single
+dictionary lookup. Windows that aren't in the table are worked out on the
+spot, exactly as before.
+
+Windows are written in terms of local masks (see frontier.NEIGHBOR_OFFSETS).
+"""
+import os
+
+import frontier
+
+# where the table is kept.
+PATTERN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'patterns.txt')
+
+# when generating, keep the windows that came up at least this many times.
+MIN_COUNT = 3
+
+def _symmetries():
+    """
+    Builds a list of 8 tables, one for each rotation and reflection of the
+    square. table[mask] is where the tiles in a local mask end up.
+    """
+    tables = []
+    for transform in frontier.TRANSFORMS:
+        table = []
+        for mask in range(256):
+            moved = 0
+            for (n, offset) in enumerate(frontier.NEIGHBOR_OFFSETS):
+                if (mask >> n) & 1:
+                    moved |= frontier.NEIGHBOR_BITS[transform(*offset)]
+            table.append(moved)
+        tables.append(table)
+    return tables
+
+# SYMMETRIES[s][mask] is the local mask moved by the s-th symmetry.
+SYMMETRIES = _symmetries()
+
+def windowKey(mask, missing, limits):
+    """
+    Takes the suspicious mask of a number, its missing mines, and a list of
+    (shared mask, fewest, most) for every number nearby. Returns a hashable
+    key for the window. Numbers nearby can come in any order.
+
+    Limits that can't rule anything out, and repeats, are left out of the
+    key, since they don't change the answer and would only make windows that
+    are really the same look different.
+    """
+    kept = set()
+    for (shared, fewest, most) in limits:
+        fewest = max(fewest, 0)
+        most = min(most, frontier.popcount(shared))
+        if fewest == 0 and most == frontier.popcount(shared):
+            continue
+        kept.add((shared, fewest, most))
+    return (mask, missing, tuple(sorted(kept)))
+
+def transformKey(key, table):
+    """
+    Moves every mask in a window key by one of the SYMMETRIES.
+    """
+    (mask, missing, limits) = key
+    return (table[mask], missing, tuple(sorted((table[shared], fewest, most)
+        for (shared, fewest, most) in limits)))
+
+def canonicalKey(key):
+    """
+    Returns the smallest of the 8 symmetric versions of a window key, so that
+    windows that are rotations or reflections of each other share a key.
+    """
+    return min(transformKey(key, table) for table in SYMMETRIES)
+
+def solveWindow(mask, missing, limits):
+    """
+    Works a window out from scratch. Looks up every way of placing the missing
+    mines, keeps the ones every nearby number is happy with, and returns
+    (mines, clear): the local masks of the tiles that are a mine in all of the
+    good combinations, and of the tiles that are a mine in none of them.
+    """
+    definitelyMines = mask
+    definitelyClear = mask
+    found = False
+    for combo in frontier.LOCAL_COMBOS[mask][missing]:
+        for (shared, fewest, most) in limits:
+            mines = frontier.popcount(combo & shared)
+            if mines < fewest or mines > most:
+                break
+        else:
+            found = True
+            definitelyMines &= combo
+            definitelyClear &= ~combo
+    if not found:
+        # the numbers contradict each other, so don't conclude anything.
+        return (0, 0)
+    return (definitelyMines, definitelyClear)
+
+class PatternTable(object):
+    """
+    A table of window key -> (mines, clear) masks, with every symmetric
+    version of each window filled in.
+    -- hits, misses: how many windows were and weren't found in the table
+    -- combos: how many combinations have been checked for the misses
+    -- counts: while recording, how many times each canonical window was seen
+    """
+    def __init__(self):
+        self.moves = {}
+        self.hits = 0
+        self.misses = 0
+        self.combos = 0
+        self.recording = False
+        self.counts = {}
+        return
+
+    def __len__(self):
+        return len(self.moves)
+
+    def solve(self, mask, missing, limits):
+        """
+        Returns (mines, clear) for a window, from the table if it's there and
+        worked out from scratch if it isn't.
+        """
+        key = windowKey(mask, missing, limits)
+        if self.recording:
+            canonical = canonicalKey(key)
+            self.counts[canonical] = self.counts.get(canonical, 0) + 1
+        if key in self.moves:
+            self.hits += 1
+            return self.moves[key]
+        self.misses += 1
+        self.combos += len(frontier.LOCAL_COMBOS[mask][missing])
+        return solveWindow(mask, missing, limits)
+
+    def add(self, key, moves):
+        """
+        Adds a window and every rotation and reflection of it.
+        """
+        (mines, clear) = moves
+        for table in SYMMETRIES:
+            self.moves[transformKey(key, table)] = (table[mines], table[clear])
+        return
+
+    def load(self, path = PATTERN_FILE):
+        """
+        Reads a table written by save(). Each line is
+            mask missing mines clear shared/fewest/most ...
+        with the masks in hex.
+        """
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                (mask, missing, mines, clear) = fields[:4]
+                limits = []
+                for field in fields[4:]:
+                    (shared, fewest, most) = field.split('/')
+                    limits.append((int(shared, 16), int(fewest), int(most)))
+                key = windowKey(int(mask, 16), int(missing), limits)
+                self.add(key, (int(mines, 16), int(clear, 16)))
+        return self
+
+    def save(self, path = PATTERN_FILE, minCount = MIN_COUNT):
+        """
+        Writes every recorded window seen at least minCount times, most
+        common first, along with its answer.
+        """
+        keys = [key for (key, count) in self.counts.items() if count >= minCount]
+        keys.sort(key = lambda key: (-self.counts[key], key))
+        with open(path, 'w') as f:
+            f.write("# mask missing mines clear shared/fewest/most ...\n")
+            for key in keys:
+                (mask, missing, limits) = key
+                (mines, clear) = solveWindow(*key)
+                fields = ["{:02x}".format(mask), str(missing),
+                    "{:02x}".format(mines), "{:02x}".format(clear)]
+                for (shared, fewest, most) in limits:
+                    fields.append("{:02x}/{}/{}".format(shared, fewest, most))
+                f.write(" ".join(fields) + "\n")
+        return len(keys)
+
+_defaultTable = None
+
+def defaultTable():
+    """
+    Returns the table in PATTERN_FILE, loading it the first time. If there's
+    no file, returns an empty table, which works everything out on the spot.
+    """
+    global _defaultTable
+    if _defaultTable is None:
+        _defaultTable = PatternTable()
+        if os.path.exists(PATTERN_FILE):
+            _defaultTable.load()
+    return _defaultTable
+
+def generate(games, level, path = PATTERN_FILE, minCount = MIN_COUNT, seed = 0):
+    """
+    Builds the table offline: plays the given number of seeded games at a
+    level (e.g. simulate.LEVELS['expert']) with the advanced solver, records
+    every window on the board whenever it has to guess, and saves the common
+    ones to path.
+    """
+    import random
+
+    import simulate
+    import solver
+
+    table = PatternTable()
+    table.recording = True
+    for n in range(games):
+        random.seed(seed + n)
+        game = simulate.HeadlessBoard(*level, seed = seed + n)
+        player = solver.AdvancedSolver(game)
+        player.patterns = table
+        while game.victory is None:
+            if len(player.queue) == 0:
+                # the solver only gets to the windows once the simpler rules
+                # have run out, and they take every move a window forces
+                # first. So record every window on the board before each
+                # guess, not just the ones the guess looks at.
+                if not game.firstClick:
+                    player.gatherNeighborInfo()
+                    player.gatherSecondNeighborInfo()
+                player.guess()
+            move = player.queue.popleft()
+            simulate.makeMove(game, player, move)
+            player.observe(move)
+    return table.save(path, minCount)
+
+if __name__ == "__main__":
+    import simulate
+    count = generate(200, simulate.LEVELS['expert'])
+    print("Saved {} patterns to {}".format(count, PATTERN_FILE))
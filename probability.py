@@ -0,0 +1,746 @@
+"""
+probability.py
+
+Works out how likely every frontier tile is to be a mine.
+
+Each component of the frontier is counted on its own: for every number of
+mines k the component could hold, how many arrangements are consistent with
+the numbers, and how many of those put a mine on each cell. The components
+are then stitched back together, weighting every total by the number of ways
+the remaining mines could be spread over the interior tiles.
+
+Small components are counted with a backtracking search, and bigger ones
+with dynamic programming along the component (see PathCounter), which stays
+fast on long, thin frontiers. Counting is still exponential in the worst
+case, so the engine works to a deadline.
+Components that can't be counted in time are estimated by sampling instead
+(see sampler.py).
+"""
+import math
+import random
+import time
+
+import cache
+import frontier
+import sampler
+
+# share of the time budget given to the exact counter. The rest is kept in
+# reserve for sampling whatever the exact counter didn't get to.
+EXACT_FRACTION = 0.75
+
+# check the clock once every this many search nodes.
+CLOCK_INTERVAL = 256
+
+# count components with at least this many cells with the PathCounter. The
+# backtracking search is quicker on anything smaller.
+PATH_MIN_CELLS = 16
+
+# take at least this many samples of a component, even if the deadline has
+# already passed, so that there is always something to go on.
+MIN_SAMPLES = 16
+
+# stands in for cache.defaultCache() as the engine's default cache, so that
+# None can still mean no cache at all.
+DEFAULT_CACHE = object()
+
+class ProbabilityEngine(object):
+    """
+    Computes a mine probability for every frontier cell and for the interior.
+
+    After solve() has been called:
+    -- probabilities: a dictionary of (row, col) -> probability of a mine
+    -- interiorProbability: the probability for any tile off the frontier
+    -- completeness: the fraction of frontier cells that were counted exactly
+        (1.0 means every probability is exact)
+    -- samples: how many sampled arrangements went into the estimates
+    -- nodes: how many search nodes (or steps of the PathCounter) the exact
+        counting took, including for components it didn't finish
+    -- intervals: a dictionary of (row, col) -> half-width of the 95%
+        confidence interval, for every cell that was estimated by sampling
+    -- certainMines, certainSafe: the cells that are a mine (or safe) in every
+        possible arrangement. Only filled in when every component was counted
+        exactly, and worked out from the exact counts, so they don't depend
+        on a probability rounding to exactly 0 or 1.
+    Exact counts are kept in a cache.ComponentCache (the shared one from
+    cache.defaultCache() unless another is given), so a component that has
+    been counted before is only looked up. Pass componentCache = None to
+    count everything from scratch.
+    """
+    exactFraction = EXACT_FRACTION
+
+    def __init__(self, frontier, componentCache = DEFAULT_CACHE):
+        self.frontier = frontier
+        if componentCache is DEFAULT_CACHE:
+            componentCache = cache.defaultCache()
+        self.cache = componentCache
+        self.probabilities = {}
+        self.interiorProbability = None
+        self.completeness = 0.0
+        self.samples = 0
+        self.nodes = 0
+        self.intervals = {}
+        self.certainMines = set()
+        self.certainSafe = set()
+        return
+
+    def solve(self, deadline = None):
+        """
+        Counts every component exactly until the exact share of the time
+        budget runs out, then samples the rest until the deadline.
+        With no deadline, everything is counted exactly.
+
+        Returns self so the results can be read straight off the call.
+        """
+        components = self.frontier.components()
+        if deadline is None:
+            exactDeadline = None
+        else:
+            now = time.time()
+            exactDeadline = now + max(deadline - now, 0) * self.exactFraction
+
+        # count the components smallest-first, so that if we do run out of
+        # time, as much of the frontier as possible is exact.
+        components.sort(key = len)
+        solved = []
+        tables = []
+        unsolved = []
+        for component in components:
+            table = ComponentTable(component)
+            if self.cache is not None and self.cache.get(component, table):
+                tables.append(table)
+                solved.append(component)
+                continue
+            if len(component) >= PATH_MIN_CELLS:
+                counter = PathCounter(component)
+            else:
+                counter = ExactCounter(component)
+            try:
+                table = counter.count(exactDeadline)
+            except DeadlineExceeded:
+                unsolved.append(component)
+                continue
+            finally:
+                self.nodes += counter.nodes
+            if self.cache is not None:
+                self.cache.put(component, table)
+            tables.append(table)
+            solved.append(component)
+
+        exactCells = sum(len(c) for c in solved)
+        if len(self.frontier):
+            self.completeness = exactCells / len(self.frontier)
+        else:
+            self.completeness = 1.0
+
+        # sample everything the exact counter didn't get to in one go. The
+        # unsolved components are competing for whatever mines the solved
+        # ones and the interior leave them, so they can't be sampled apart.
+        if unsolved:
+            merged = frontier.mergeComponents(unsolved)
+            chain = sampler.GibbsSampler(merged, self._sampleWeights(tables, len(merged)))
+            table = chain.count(deadline)
+            self.samples = table.samples
+            for (cell, interval) in zip(merged.cells, chain.intervals):
+                if interval is not None:
+                    self.intervals[cell] = interval
+            solved.append(merged)
+            tables.append(table)
+
+        self._combine(solved, tables)
+        return self
+
+    def _sampleWeights(self, tables, size):
+        """
+        Works out how much weight the sampler should give an arrangement with
+        m mines in the unsolved part of the frontier: the number of ways to
+        fill the solved components and the interior with the rest.
+        Returns a list indexed by m, scaled so the largest weight is 1.
+        """
+        length = 1 + size + sum(table.mostMines() for table in tables)
+        logWeights = interiorLogWeights(length,
+            self.frontier.interior, self.frontier.minesLeft)
+        slope = tilt(logWeights)
+        weights = exponentiate(tilted(logWeights, -slope))
+
+        solvedPoly = [1.0]
+        for table in tables:
+            solvedPoly = normalize(convolve(solvedPoly, table.polynomial(slope)))
+
+        logs = []
+        for m in range(size + 1):
+            ways = sum(ways * weights[m + K] for (K, ways) in enumerate(solvedPoly))
+            logs.append(math.log(ways) if ways > 0 else None)
+        # take the tilt back off, since the unsolved mines weren't tilted.
+        return exponentiate(tilted(logs, slope))
+
+    def _combine(self, components, tables):
+        """
+        Stitches the per-component tables together into probabilities.
+
+        For a total of K mines on the frontier, there are
+        comb(interior, minesLeft - K) ways to place the rest in the interior.
+        A cell's probability is then the weighted count of arrangements with
+        a mine on it over the weighted count of all arrangements.
+
+        On a big board none of those numbers fit in a float (the number of
+        ways to fill the interior can run to hundreds of thousands of
+        digits). So the weights are worked out as logs, every list of numbers
+        is scaled down so its biggest entry is 1 as soon as it's made, and
+        only ratios of numbers that were scaled the same way are ever taken.
+        The weights and counts are also tilted (see tilt()), so that the
+        numbers that matter don't get lost off the bottom of a float.
+        """
+        interior = self.frontier.interior
+        minesLeft = self.frontier.minesLeft
+
+        if any(len(table.counts) == 0 for table in tables):
+            self._contradiction()
+            return
+
+        length = 1 + sum(table.mostMines() for table in tables)
+        logWeights = interiorLogWeights(length, interior, minesLeft)
+        slope = tilt(logWeights)
+        weights = exponentiate(tilted(logWeights, -slope))
+
+        # for each component, a list indexed by k of the (scaled, tilted)
+        # number of arrangements with k mines.
+        polynomials = [table.polynomial(slope) for table in tables]
+
+        # prefixes[n][P]: the number of ways to put P mines in the components
+        # before component n.
+        prefixes = [[1.0]]
+        for poly in polynomials:
+            prefixes.append(normalize(convolve(prefixes[-1], poly)))
+        # rests[n][P]: the weight of every way of filling component n onwards
+        # and the interior, given P mines in the components before n.
+        rests = [weights]
+        for poly in reversed(polynomials):
+            rests.append(normalize(correlate(rests[-1], poly)))
+        rests.reverse()
+
+        everything = [ways * weight
+            for (ways, weight) in zip(prefixes[-1], weights)]
+        total = sum(everything)
+        if total == 0:
+            self._contradiction()
+            return
+
+        for (n, (component, table)) in enumerate(zip(components, tables)):
+            prefix = prefixes[n]
+            rest = rests[n + 1]
+            poly = polynomials[n]
+            hits = [0.0] * len(component)
+            componentTotal = 0.0
+            for (k, count) in table.counts.items():
+                # the weight of every arrangement with k mines in this
+                # component.
+                weight = poly[k] * sum(ways * rest[P + k]
+                    for (P, ways) in enumerate(prefix))
+                if weight == 0:
+                    continue
+                componentTotal += weight
+                for (cell, cellCount) in enumerate(table.cellCounts[k]):
+                    # an int over an int is correctly rounded, however big.
+                    hits[cell] += weight * (cellCount / count)
+            for (cell, hit) in zip(component.cells, hits):
+                self.probabilities[cell] = min(hit / componentTotal, 1.0)
+
+        if interior > 0:
+            expectedMines = sum(weight * (minesLeft - K)
+                for (K, weight) in enumerate(everything))
+            self.interiorProbability = expectedMines / total / interior
+
+        if all(table.samples == 0 for table in tables):
+            self._findCertain(components, tables)
+        return
+
+    def _contradiction(self):
+        """
+        The numbers on the board contradict each other, or the sampler didn't
+        find a single arrangement. Either way, we know nothing.
+        """
+        self.probabilities = {}
+        self.interiorProbability = None
+        self.completeness = 0.0
+        return
+
+    def _findCertain(self, components, tables):
+        """
+        Finds the cells that are a mine, or safe, in every arrangement that
+        is actually possible, using nothing but the exact counts: which mine
+        totals each component can have, and which of those leave a number of
+        mines the interior can hold. Sets those cells' probabilities to
+        exactly 1 and 0.
+        """
+        interior = self.frontier.interior
+        minesLeft = self.frontier.minesLeft
+
+        # the mine totals the components before (and after) each one can
+        # have between them.
+        supports = [set(table.counts) for table in tables]
+        prefixes = [{0}]
+        for support in supports:
+            prefixes.append({a + b for a in prefixes[-1] for b in support})
+        suffixes = [{0}]
+        for support in reversed(supports):
+            suffixes.append({a + b for a in suffixes[-1] for b in support})
+        suffixes.reverse()
+
+        for (n, (component, table)) in enumerate(zip(components, tables)):
+            others = {a + b for a in prefixes[n] for b in suffixes[n + 1]}
+            possible = [k for k in table.counts
+                if any(0 <= minesLeft - k - K <= interior for K in others)]
+            if not possible:
+                continue
+            for (position, cell) in enumerate(component.cells):
+                if all(table.cellCounts[k][position] == table.counts[k]
+                        for k in possible):
+                    self.certainMines.add(cell)
+                    self.probabilities[cell] = 1.0
+                elif all(table.cellCounts[k][position] == 0 for k in possible):
+                    self.certainSafe.add(cell)
+                    self.probabilities[cell] = 0.0
+        return
+
+class ComponentTable(object):
+    """
+    The result of counting (or sampling) one component.
+    -- counts[k]: how many arrangements put k mines in the component
+    -- cellCounts[k][n]: how many of those put a mine on cell n
+    For a sampled component the numbers are only proportional to the true
+    counts, which is all the engine needs.
+    """
+    def __init__(self, component):
+        self.size = len(component)
+        self.counts = {}
+        self.cellCounts = {}
+        self.samples = 0
+        return
+
+    def record(self, mines, assignment):
+        """
+        Records one arrangement, given as a list of 0/1 values per cell.
+        """
+        if mines not in self.counts:
+            self.counts[mines] = 0
+            self.cellCounts[mines] = [0] * self.size
+        self.counts[mines] += 1
+        cellCounts = self.cellCounts[mines]
+        for (n, value) in enumerate(assignment):
+            if value:
+                cellCounts[n] += 1
+        return
+
+    def mostMines(self):
+        """
+        Returns the most mines any arrangement puts in the component.
+        """
+        return max(self.counts, default = 0)
+
+    def polynomial(self, slope = 0.0):
+        """
+        Returns the counts as a list of floats indexed by number of mines k,
+        each multiplied by exp(slope * k) (see tilt()), and scaled so the
+        biggest is 1. The counts themselves can be far too big to be floats,
+        so they're scaled as logs.
+        """
+        logs = [None] * (max(self.counts, default = -1) + 1)
+        for (k, count) in self.counts.items():
+            if count > 0:
+                logs[k] = math.log(count) + slope * k
+        return exponentiate(logs)
+
+class ExactCounter(object):
+    """
+    Counts every arrangement of mines in a component with a backtracking
+    search, ruling out a partial arrangement as soon as any constraint can no
+    longer be satisfied.
+    """
+    def __init__(self, component, maxMines = None):
+        self.component = component
+        self.maxMines = len(component) if maxMines is None else maxMines
+        return
+
+    def count(self, deadline = None):
+        """
+        Returns a ComponentTable. Raises DeadlineExceeded if the deadline
+        passes before the search is over.
+        """
+        component = self.component
+        self.deadline = deadline
+        self.nodes = 0
+        self.table = ComponentTable(component)
+        self.assignment = [0] * len(component)
+        # for every constraint, the mines placed so far and the cells that
+        # haven't been decided yet.
+        self.placed = [0] * len(component.constraints)
+        self.open = [len(indices) for (indices, _) in component.constraints]
+        self._search(0, 0)
+        return self.table
+
+    def _search(self, position, mines):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CLOCK_INTERVAL == 0:
+            if time.time() > self.deadline:
+                raise DeadlineExceeded()
+
+        if position == len(self.assignment):
+            self.table.record(mines, self.assignment)
+            return
+
+        constraints = self.component.constraints
+        touched = self.component.cellConstraints[position]
+        for value in (0, 1):
+            if mines + value > self.maxMines:
+                break
+            feasible = True
+            for c in touched:
+                self.placed[c] += value
+                self.open[c] -= 1
+                needed = constraints[c][1]
+                if self.placed[c] > needed or self.placed[c] + self.open[c] < needed:
+                    feasible = False
+            if feasible:
+                self.assignment[position] = value
+                self._search(position + 1, mines + value)
+                self.assignment[position] = 0
+            for c in touched:
+                self.placed[c] -= value
+                self.open[c] += 1
+        return
+
+class PathCounter(ExactCounter):
+    """
+    Counts a component exactly with dynamic programming along the cells'
+    order, which works as a path decomposition of the component.
+
+    Walking through the cells in order, a constraint is open from its first
+    cell to its last. All that matters about the cells decided so far is how
+    many mines each open constraint has (the separator), so arrangements
+    that agree on that are counted together, as a polynomial in the number
+    of mines. A forward pass counts the ways to reach every separator, a
+    backward pass counts the ways to finish from it, and a cell's count is
+    the product of the two around it being a mine.
+
+    The cost is linear in the length of the component and exponential only
+    in how many constraints are open at once, where the backtracking search
+    is exponential in the number of arrangements. Same results as the
+    ExactCounter.
+    """
+    def count(self, deadline = None):
+        """
+        Returns a ComponentTable. Raises DeadlineExceeded if the deadline
+        passes before the counting is over.
+        """
+        component = self.component
+        size = len(component)
+        constraints = component.constraints
+
+        # the constraints each cell starts, is in, and finishes, and for
+        # every constraint and cell, how many of its cells are still to come.
+        first = [min(indices) for (indices, _) in constraints]
+        last = [max(indices) for (indices, _) in constraints]
+        self.layout = []
+        openNow = []
+        for position in range(size):
+            starting = [c for c in component.cellConstraints[position]
+                if first[c] == position]
+            # the open constraints while this cell is decided, in the order
+            # their counts are kept in the separator.
+            before = openNow
+            during = before + starting
+            finishing = [slot for (slot, c) in enumerate(during)
+                if last[c] == position]
+            kept = [slot for (slot, c) in enumerate(during)
+                if last[c] != position]
+            openNow = [during[slot] for slot in kept]
+            inCell = set(component.cellConstraints[position])
+            touched = [slot for (slot, c) in enumerate(during) if c in inCell]
+            remaining = [sum(1 for n in constraints[c][0] if n > position)
+                for c in during]
+            needed = [constraints[c][1] for c in during]
+            self.layout.append((len(starting), touched, finishing, kept,
+                remaining, needed))
+
+        # forward[t] maps every separator reachable after deciding cells
+        # 0..t-1 to a polynomial (list of counts indexed by mines).
+        self.deadline = deadline
+        self.nodes = 0
+        forward = [{(): [1]}]
+        for position in range(size):
+            layer = {}
+            for (separator, poly) in forward[-1].items():
+                for value in (0, 1):
+                    after = self._advance(position, separator, value)
+                    if after is None:
+                        continue
+                    _addInto(layer, after, _shift(poly, value, self.maxMines))
+            forward.append(layer)
+
+        # backward[t] maps the same separators to the polynomial of ways to
+        # decide cells t..size-1 from there.
+        backward = [None] * (size + 1)
+        backward[size] = {(): [1]}
+        for position in range(size - 1, -1, -1):
+            layer = {}
+            later = backward[position + 1]
+            for separator in forward[position]:
+                for value in (0, 1):
+                    after = self._advance(position, separator, value)
+                    if after is None or after not in later:
+                        continue
+                    _addInto(layer, separator,
+                        _shift(later[after], value, self.maxMines))
+            backward[position] = layer
+
+        # the counts for each cell being a mine.
+        hits = []
+        for position in range(size):
+            cellHits = []
+            later = backward[position + 1]
+            for (separator, poly) in forward[position].items():
+                after = self._advance(position, separator, 1)
+                if after is None or after not in later:
+                    continue
+                _addPoly(cellHits, _shift(_multiply(poly, later[after],
+                    self.maxMines - 1), 1, self.maxMines))
+            hits.append(cellHits)
+
+        table = ComponentTable(component)
+        for (mines, count) in enumerate(backward[0].get((), [])):
+            if count == 0:
+                continue
+            table.counts[mines] = count
+            table.cellCounts[mines] = [cellHits[mines] if mines < len(cellHits) else 0
+                for cellHits in hits]
+        self.table = table
+        return table
+
+    def _advance(self, position, separator, value):
+        """
+        Decides cell position given the separator before it. Returns the
+        separator after it, or None if that breaks a constraint.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CLOCK_INTERVAL == 0:
+            if time.time() > self.deadline:
+                raise DeadlineExceeded()
+
+        (starting, touched, finishing, kept, remaining, needed) = self.layout[position]
+        placed = list(separator) + [0] * starting
+        for slot in touched:
+            placed[slot] += value
+        for (slot, count) in enumerate(placed):
+            # too many already, or not enough cells left to make it up.
+            if count > needed[slot] or count + remaining[slot] < needed[slot]:
+                return None
+        return tuple(placed[slot] for slot in kept)
+
+def _shift(poly, value, maxMines):
+    """
+    Multiplies a polynomial by x**value, dropping anything over maxMines.
+    """
+    if value == 0:
+        return poly
+    return ([0] + poly)[:maxMines + 1]
+
+def _multiply(a, b, maxMines):
+    """
+    Multiplies two polynomials of exact counts, dropping anything over
+    maxMines.
+    """
+    result = [0] * min(len(a) + len(b) - 1, maxMines + 1)
+    for (i, x) in enumerate(a):
+        if x == 0:
+            continue
+        for (j, y) in enumerate(b):
+            if i + j >= len(result):
+                break
+            result[i + j] += x * y
+    return result
+
+def _addInto(layer, key, poly):
+    """
+    Adds a polynomial into layer[key].
+    """
+    if key not in layer:
+        layer[key] = list(poly)
+    else:
+        _addPoly(layer[key], poly)
+    return
+
+def _addPoly(total, poly):
+    """
+    Adds a polynomial into another, in place.
+    """
+    if len(total) < len(poly):
+        total.extend([0] * (len(poly) - len(total)))
+    for (k, count) in enumerate(poly):
+        total[k] += count
+    return
+
+class RandomSampler(ExactCounter):
+    """
+    Finds random arrangements of a component. Each sample is a dive through
+    the same search as the exact counter, trying the two values for each cell
+    in a random order and stopping at the first arrangement found.
+    The arrangements aren't equally likely to come up, so this is only good
+    for finding somewhere for the GibbsSampler to start.
+    """
+    def count(self, deadline = None, maxSamples = 1000):
+        component = self.component
+        self.deadline = None
+        self.nodes = 0
+        self.table = ComponentTable(component)
+        while self.table.samples < maxSamples:
+            if self.table.samples >= MIN_SAMPLES and deadline is not None:
+                if time.time() > deadline:
+                    break
+            self.assignment = [0] * len(component)
+            self.placed = [0] * len(component.constraints)
+            self.open = [len(indices) for (indices, _) in component.constraints]
+            if not self._search(0, 0):
+                # no arrangement at all, no point in trying again.
+                break
+            self.table.samples += 1
+        return self.table
+
+    def _search(self, position, mines):
+        if position == len(self.assignment):
+            self.table.record(mines, self.assignment)
+            return True
+
+        constraints = self.component.constraints
+        touched = self.component.cellConstraints[position]
+        values = [0, 1]
+        random.shuffle(values)
+        for value in values:
+            if mines + value > self.maxMines:
+                continue
+            feasible = True
+            for c in touched:
+                self.placed[c] += value
+                self.open[c] -= 1
+                needed = constraints[c][1]
+                if self.placed[c] > needed or self.placed[c] + self.open[c] < needed:
+                    feasible = False
+            found = False
+            if feasible:
+                self.assignment[position] = value
+                found = self._search(position + 1, mines + value)
+                self.assignment[position] = 0
+            for c in touched:
+                self.placed[c] -= value
+                self.open[c] += 1
+            if found:
+                return True
+        return False
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by the exact counter when it runs out of time.
+    """
+    pass
+
+def convolve(a, b):
+    """
+    Multiplies two polynomials given as lists of coefficients.
+    """
+    result = [0.0] * (len(a) + len(b) - 1)
+    for (i, x) in enumerate(a):
+        if x == 0:
+            continue
+        for (j, y) in enumerate(b):
+            result[i + j] += x * y
+    return result
+
+def correlate(weights, poly):
+    """
+    The other half of convolve(): returns the list whose entry j is the sum
+    over k of poly[k] * weights[j + k].
+    """
+    result = []
+    for j in range(len(weights) - len(poly) + 1):
+        result.append(sum(x * weights[j + k] for (k, x) in enumerate(poly) if x))
+    return result
+
+def normalize(poly):
+    """
+    Scales a list of non-negative numbers so the biggest is 1. A list of
+    zeros is left alone.
+    """
+    biggest = max(poly, default = 0)
+    if biggest == 0:
+        return poly
+    return [x / biggest for x in poly]
+
+def exponentiate(logs):
+    """
+    Turns a list of logs into numbers scaled so the biggest is 1. An entry of
+    None stands for 0, and so does anything too small to be a float next to
+    the biggest.
+    """
+    biggest = max((l for l in logs if l is not None), default = None)
+    if biggest is None:
+        return [0.0] * len(logs)
+    return [0.0 if l is None else math.exp(l - biggest) for l in logs]
+
+def tilted(logs, slope):
+    """
+    Adds slope * k to the k-th of a list of logs.
+    """
+    return [None if l is None else l + slope * k for (k, l) in enumerate(logs)]
+
+def tilt(logWeights):
+    """
+    Picks the slope to tilt the counts and weights by.
+
+    On a big board the interior weights change by a nearly constant factor
+    from one K to the next -- about (minesLeft - K) / (interior - minesLeft)
+    -- so they can span thousands of orders of magnitude across the
+    frontier, peaking at one end while the component counts peak somewhere
+    else. The products that matter would then be far too small for a float.
+    Multiplying the counts for k mines by exp(slope * k) and the weights for
+    K mines by exp(-slope * K) changes no product of a weight with its
+    counts, but with the slope matched to the weights' own, it makes the
+    weights nearly flat, and moves the counts' peak to where the mines
+    really are.
+    """
+    feasible = [K for (K, l) in enumerate(logWeights) if l is not None]
+    if len(feasible) < 2:
+        return 0.0
+    # the slope of the weights in the middle of the possible mine counts.
+    middle = min(max((len(logWeights) - 1) // 2, feasible[0]), feasible[-1] - 1)
+    return logWeights[middle + 1] - logWeights[middle]
+
+# LOG_FACTORIALS[n] is log(n!), filled in as far as it's been needed.
+LOG_FACTORIALS = [0.0]
+
+def logFactorial(n):
+    """
+    Returns log(n!).
+    """
+    while len(LOG_FACTORIALS) <= n:
+        LOG_FACTORIALS.append(math.lgamma(len(LOG_FACTORIALS) + 1))
+    return LOG_FACTORIALS[n]
+
+def logComb(n, k):
+    """
+    Returns log(comb(n, k)), for 0 <= k <= n.
+    """
+    return logFactorial(n) - logFactorial(k) - logFactorial(n - k)
+
+def interiorLogWeights(length, interior, minesLeft):
+    """
+    Returns a list where entry K is the log of the number of ways to put the
+    remaining minesLeft - K mines in the interior, or None if there aren't
+    any.
+    """
+    logs = []
+    for K in range(length):
+        rest = minesLeft - K
+        if 0 <= rest <= interior:
+            logs.append(logComb(interior, rest))
+        else:
+            logs.append(None)
+    return logs
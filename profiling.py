@@ -0,0 +1,128 @@
+"""
+profiling.py
+
+Profiles single calls, such as one guess() that was slow on one board.
+
+A SamplingProfiler runs a call while a second thread looks at the call's
+stack every INTERVAL seconds and counts how often each stack comes up.
+Unlike cProfile, that keeps whole stacks (so the output can be drawn as a
+flame graph) and hardly slows the call down, so the time the call took is
+still the time it really takes. That means the profiler can be told to only
+keep the calls that took longer than a threshold, and throw the rest away.
+
+The output is in the "collapsed stack" format that flamegraph.pl, inferno
+and speedscope all read: one line per stack, the frames from the outside in,
+separated by semicolons, then a space and the number of samples.
+"""
+import os
+import sys
+import threading
+import time
+
+# how often to look at the stack, in seconds.
+INTERVAL = 0.0005
+
+class SamplingProfiler(object):
+    """
+    Samples the stacks of the calls given to profile(), and adds up the ones
+    that took at least threshold seconds.
+    -- stacks: a dictionary of collapsed stack -> samples
+    -- calls: how many calls have been profiled
+    -- captured: how many of them took long enough to keep
+    """
+    def __init__(self, threshold = 0.0, interval = INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.stacks = {}
+        self.calls = 0
+        self.captured = 0
+        return
+
+    def profile(self, label, function, *args, **kwargs):
+        """
+        Calls function(*args, **kwargs), sampling its stack, and returns what
+        it returns. Every stack starts with label, e.g. the name of the call
+        or the board it was made on.
+        """
+        target = threading.get_ident()
+        outside = sys._getframe()
+        samples = {}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                # the call may have returned while we waited, and then the
+                # stack is the profiler's own, not the call's.
+                if frame is None or done.is_set():
+                    continue
+                stack = collapse(frame, outside)
+                if stack:
+                    samples[stack] = samples.get(stack, 0) + 1
+            return
+
+        # the sampler can only look at the stack when the call lets go of
+        # the GIL, so make it let go at least as often as we sample.
+        switchInterval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switchInterval, self.interval / 2))
+        sampler = threading.Thread(target = sample, name = 'profiler')
+        sampler.daemon = True
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            done.set()
+            sampler.join()
+            sys.setswitchinterval(switchInterval)
+            self.calls += 1
+            if elapsed >= self.threshold:
+                self.captured += 1
+                for (stack, count) in samples.items():
+                    key = label + ';' + stack
+                    self.stacks[key] = self.stacks.get(key, 0) + count
+
+    def write(self, path):
+        """
+        Writes the stacks to path in the collapsed stack format.
+        """
+        with open(path, 'w') as f:
+            for line in collapsedLines(self.stacks):
+                f.write(line + '\n')
+        return
+
+def frameName(frame):
+    """
+    Names a frame as file:function, e.g. solver.py:AdvancedSolver.guess.
+    """
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return '{}:{}'.format(os.path.basename(code.co_filename), name)
+
+def collapse(frame, outside):
+    """
+    Returns the stack from just inside the frame outside down to frame, as
+    names separated by semicolons.
+    """
+    names = []
+    while frame is not None and frame is not outside:
+        names.append(frameName(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+def merge(total, stacks):
+    """
+    Adds one dictionary of stacks into another. Returns the total.
+    """
+    for (stack, count) in stacks.items():
+        total[stack] = total.get(stack, 0) + count
+    return total
+
+def collapsedLines(stacks):
+    """
+    Returns the stacks as lines in the collapsed stack format, sorted.
+    """
+    return ['{} {}'.format(stack, count)
+        for (stack, count) in sorted(stacks.items())]
@@ -0,0 +1,122 @@
+"""
+propagation.py
+
+Keeps the solver's easy moves coming without rescanning the board.
+
+Every time the solver clicks or flags a tile, the propagator works out which
+tiles actually changed (a click can uncover a whole region of zeros), and
+puts the numbers next to them on a worklist. Each number on the worklist is
+checked against the two basic rules. Any move that comes out of that goes on
+the solver's queue, and when it's made, its own changes go back on the
+worklist. So the work done is proportional to the tiles that change, rather
+than the size of the board times the number of moves.
+"""
+from collections import deque
+
+class Propagator(object):
+    """
+    A worklist of numbered tiles to check, fed by the moves the solver makes.
+    """
+    def __init__(self, solver):
+        """
+        Takes the solver whose queue the forced moves should go on. All the
+        information about the board goes through the solver's helper
+        functions, same as the solver itself, and whether each tile has been
+        seen uncovered yet is kept in the solver's grid.
+        """
+        self.solver = solver
+        self.grid = solver.grid
+        self.worklist = deque()
+        self.waiting = set()
+        return
+
+    def reset(self):
+        """
+        Forgets the worklist, for a new game. The grid is reset by the solver.
+        """
+        self.worklist.clear()
+        self.waiting.clear()
+        return
+
+    def reveal(self, row, col):
+        """
+        Called after a click or double-click on (row, col). Finds all the
+        tiles the move uncovered, and puts them and their uncovered
+        neighbors on the worklist. Returns the list of uncovered tiles.
+        """
+        solver = self.solver
+        grid = self.grid
+        seen = grid.seen
+        revealed = []
+        # a double-click can uncover any of the neighbors, and a click can
+        # only uncover more than one tile through a zero, so starting from
+        # the tile and its neighbors and following zeros finds everything.
+        search = [(row, col)]
+        search.extend(solver.getNeighbors(row, col))
+        while search:
+            (i, j) = search.pop()
+            if seen[grid.index(i, j)] or solver.isCovered(i, j):
+                continue
+            seen[grid.index(i, j)] = True
+            revealed.append((i, j))
+            self._enqueue(i, j)
+            for neighbor in solver.getNeighbors(i, j):
+                if solver.isCovered(*neighbor):
+                    continue
+                if seen[grid.index(*neighbor)]:
+                    # an old number that just lost a covered neighbor
+                    self._enqueue(*neighbor)
+                elif solver.getNumber(i, j) == 0:
+                    search.append(neighbor)
+        return revealed
+
+    def flag(self, row, col):
+        """
+        Called after a flag is placed on (row, col). Puts the numbers around
+        it on the worklist.
+        """
+        grid = self.grid
+        for neighbor in self.solver.getNeighbors(row, col):
+            if grid.seen[grid.index(*neighbor)]:
+                self._enqueue(*neighbor)
+        return
+
+    def propagate(self):
+        """
+        Checks every number on the worklist, and adds the moves they force to
+        the solver's queue.
+        -- If a number has as many flags as its number, double-click it.
+        -- If a number has as many covered tiles as its number, flag them.
+        Returns the number of moves added.
+        """
+        solver = self.solver
+        added = 0
+        while self.worklist:
+            (i, j) = self.worklist.popleft()
+            self.waiting.discard((i, j))
+            number = solver.getNumber(i, j)
+            if number == 0:
+                continue
+
+            flags = 0
+            suspicious = []
+            for neighbor in solver.getNeighbors(i, j):
+                if solver.isFlag(*neighbor):
+                    flags += 1
+                elif solver.isCovered(*neighbor):
+                    suspicious.append(neighbor)
+            if not suspicious:
+                continue
+
+            if flags == number:
+                added += solver.queue.add(i, j, 'double')
+            elif number - flags == len(suspicious):
+                for neighbor in sorted(suspicious):
+                    added += solver.queue.add(*neighbor, 'flag')
+        return added
+
+    def _enqueue(self, i, j):
+        if (i, j) not in self.waiting:
+            self.waiting.add((i, j))
+            self.worklist.append((i, j))
+        return
@@ -0,0 +1,366 @@
+"""
+recording.py
+
+Records games, and plays them back.
+
+A game record is a header, then (if the game wasn't played from a seed) the
+mine layout, then every move the solver made:
+-- the header is HEADER: a tag, the format version, the outcome, flags, the
+    solver, the size of the board and its mines, the seed and the number of
+    moves, in 26 bytes
+-- the layout is a bitmap, one bit per tile, set where there's a mine
+-- every move is a 4-byte little-endian integer: the tile's index
+    (row * cols + col) in the low 29 bits, the action in the next two, and in
+    the top bit whether it was the first move of a call to guess(), i.e. the
+    point the solver was asked for more moves
+So an expert game played from a seed takes about 1.2 kilobytes.
+
+A record file starts with FILE_HEADER, and games are only ever appended to
+it, each in a single write. If a run dies half way through writing a game,
+the game is ignored when the file is read back.
+
+A game played from a seed is laid out again by simulate.HeadlessBoard with
+the same seed and the same first click, so those records are only good for
+as long as HeadlessBoard.layMines() lays mines the same way; change it, and
+RECORD_VERSION should change with it.
+
+Run it from the command line, e.g.
+    python recording.py games.rec --list
+    python recording.py games.rec --outcome loss --gui --move-time 0.2
+With neither --list nor --gui, every game is replayed headlessly, as fast as
+it can be, and checked to end the way it did when it was recorded.
+"""
+import argparse
+import array
+import logging
+import struct
+import sys
+import time
+
+# the tag at the start of a record file and of every game.
+FILE_TAG = b'MSGR'
+GAME_TAG = b'MG'
+
+# the version of the record format.
+RECORD_VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sB3x')
+# tag, version, outcome, flags, solver, rows, cols, mines, seed, moves.
+HEADER = struct.Struct('<2sBBBBHHIqI')
+
+# what the flags in a header mean.
+HAS_SEED = 1
+HAS_LAYOUT = 2
+
+# the outcomes a game can have, by their code. The same as in simulate.py.
+OUTCOMES = ('unfinished', 'win', 'loss', 'error')
+
+# the solvers a game can be played by, by their code.
+SOLVERS = (None, 'basic', 'advanced')
+
+# the actions a move can have, by their code. The same as in a QueueItem.
+ACTIONS = ('click', 'flag', 'double')
+
+# where things go in a packed move.
+TILE_BITS = 29
+TILE_MASK = (1 << TILE_BITS) - 1
+ACTION_SHIFT = TILE_BITS
+GUESSED = 1 << 31
+
+# how long to wait between moves when replaying in a window, in seconds.
+MOVE_TIME = 0.5
+
+class GameRecord(object):
+    """
+    One game: the board it was played on and the moves made on it.
+    -- rows, cols, mines: the size of the board
+    -- seed: the seed the board was laid out with, or None
+    -- layout: if there's no seed, the indices of the tiles with mines
+    -- solver: the name of the solver that played it, one of SOLVERS
+    -- outcome: one of OUTCOMES
+    -- moves: an array of packed moves
+    """
+    def __init__(self, rows, cols, mines, seed = None, solver = None):
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.seed = seed
+        self.layout = None
+        self.solver = solver
+        self.outcome = OUTCOMES[0]
+        self.moves = array.array('I')
+        return
+
+    def addMove(self, action, i, j, guessed = False):
+        """
+        Adds a move. guessed says whether it was the first move of a call to
+        guess().
+        """
+        move = (ACTIONS.index(action) << ACTION_SHIFT) | (i * self.cols + j)
+        if guessed:
+            move |= GUESSED
+        self.moves.append(move)
+        return
+
+    def iterMoves(self):
+        """
+        Yields every move as (action, (row, col), guessed).
+        """
+        for move in self.moves:
+            (i, j) = divmod(move & TILE_MASK, self.cols)
+            yield (ACTIONS[(move >> ACTION_SHIFT) & 3], (i, j),
+                bool(move & GUESSED))
+
+    def finish(self, game, outcome = None):
+        """
+        Notes how the game on a board ended, and its layout if it wasn't
+        played from a seed.
+        """
+        if outcome is None:
+            outcome = {True: 'win', False: 'loss'}.get(game.victory, 'unfinished')
+        self.outcome = outcome
+        if self.seed is None:
+            self.layout = mineLayout(game)
+        return
+
+    def pack(self):
+        """
+        Returns the game as bytes, in the record format.
+        """
+        flags = 0
+        if self.seed is not None:
+            flags |= HAS_SEED
+        if self.layout is not None:
+            flags |= HAS_LAYOUT
+        parts = [HEADER.pack(GAME_TAG, RECORD_VERSION,
+            OUTCOMES.index(self.outcome), flags, SOLVERS.index(self.solver),
+            self.rows, self.cols, self.mines, self.seed or 0, len(self.moves))]
+        if self.layout is not None:
+            bitmap = bytearray(layoutSize(self.rows, self.cols))
+            for k in self.layout:
+                bitmap[k >> 3] |= 1 << (k & 7)
+            parts.append(bytes(bitmap))
+        moves = self.moves
+        if sys.byteorder != 'little':
+            moves = array.array('I', moves)
+            moves.byteswap()
+        parts.append(moves.tobytes())
+        return b''.join(parts)
+
+def layoutSize(rows, cols):
+    return (rows * cols + 7) // 8
+
+def mineLayout(game):
+    """
+    Returns the indices of the tiles with mines on a board.
+    """
+    return [i * game.cols + j for i in range(game.rows)
+        for j in range(game.cols) if game.tiles[i][j].mine]
+
+def solverName(player):
+    """
+    Returns the name a solver goes by in SOLVERS, e.g. 'advanced' for an
+    AdvancedSolver, or None.
+    """
+    name = type(player).__name__
+    if name.endswith('Solver') and name[:-6].lower() in SOLVERS:
+        return name[:-6].lower()
+    return None
+
+class RecordWriter(object):
+    """
+    Appends games to a record file, starting it if it's new.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(FILE_TAG, RECORD_VERSION))
+        return
+
+    def write(self, record):
+        self.file.write(record.pack())
+        self.file.flush()
+        return
+
+    def close(self):
+        self.file.close()
+        return
+
+def read(path):
+    """
+    Yields every game in a record file as a GameRecord.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            return
+        (tag, version) = FILE_HEADER.unpack(header)
+        if tag != FILE_TAG:
+            raise ValueError("{} isn't a record file".format(path))
+        if version != RECORD_VERSION:
+            raise ValueError("{} is in format {}, not {}".format(path, version,
+                RECORD_VERSION))
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                # the end of the file, or a game that was never finished.
+                return
+            (tag, version, outcome, flags, solver, rows, cols, mines, seed,
+                moveCount) = HEADER.unpack(header)
+            if tag != GAME_TAG or version != RECORD_VERSION:
+                raise ValueError("Bad game record at byte {} of {}".format(
+                    f.tell() - HEADER.size, path))
+            record = GameRecord(rows, cols, mines,
+                seed if flags & HAS_SEED else None, SOLVERS[solver])
+            record.outcome = OUTCOMES[outcome]
+            if flags & HAS_LAYOUT:
+                bitmap = f.read(layoutSize(rows, cols))
+                if len(bitmap) < layoutSize(rows, cols):
+                    return
+                record.layout = [k for k in range(rows * cols)
+                    if bitmap[k >> 3] >> (k & 7) & 1]
+            data = f.read(4 * moveCount)
+            if len(data) < 4 * moveCount:
+                return
+            record.moves.frombytes(data)
+            if sys.byteorder != 'little':
+                record.moves.byteswap()
+            yield record
+
+def layOut(game, layout):
+    """
+    Lays the mines at the tile indices in layout on a board that hasn't been
+    clicked yet, instead of letting it lay them at random.
+    """
+    for k in layout:
+        (i, j) = divmod(k, game.cols)
+        game.tiles[i][j].mine = True
+        for n in game.getNeighbors(i, j):
+            game.tiles[n].number += 1
+    game.firstClick = False
+    return
+
+def layoutOf(record):
+    """
+    Returns the indices of the tiles with mines in a recorded game, laying
+    the board out from its seed if it has one.
+    """
+    if record.layout is not None:
+        return record.layout
+    import simulate
+    game = simulate.HeadlessBoard(record.rows, record.cols, record.mines,
+        record.seed)
+    for (action, tile, guessed) in record.iterMoves():
+        applyMove(game, action, *tile)
+        break
+    return mineLayout(game)
+
+def applyMove(game, action, i, j):
+    """
+    Makes a recorded move on a board, the way simulate.makeMove() does.
+    """
+    if action == 'click':
+        game.primaryClick(i, j)
+    elif action == 'flag':
+        tile = game.tiles[i][j]
+        if not (tile.covered and tile.flag):
+            game.secondaryClick(i, j)
+    elif action == 'double':
+        game.doubleClick(i, j)
+    return
+
+def newBoard(record):
+    """
+    Returns a simulate.HeadlessBoard laid out the way a recorded game's was.
+    """
+    import simulate
+    game = simulate.HeadlessBoard(record.rows, record.cols, record.mines,
+        record.seed)
+    if record.layout is not None:
+        layOut(game, record.layout)
+    return game
+
+def replay(record):
+    """
+    Replays a recorded game on a headless board, as fast as it can be, and
+    returns the board.
+    """
+    game = newBoard(record)
+    for (action, tile, guessed) in record.iterMoves():
+        applyMove(game, action, *tile)
+    return game
+
+def replayInWindow(record, moveTime = MOVE_TIME):
+    """
+    Replays a recorded game in a board.Board window, a move every moveTime
+    seconds. Returns once the window is closed.
+    """
+    import board
+    game = board.Board(record.rows, record.cols, record.mines)
+    layOut(game, layoutOf(record))
+    moves = list(record.iterMoves())
+
+    def step(n):
+        if n >= len(moves) or game.victory is not None:
+            return
+        (action, tile, guessed) = moves[n]
+        applyMove(game, action, *tile)
+        board.root.after(int(1000 * moveTime), step, n + 1)
+        return
+
+    board.root.after(int(1000 * moveTime), step, 0)
+    game.show()
+    return
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[1])
+    parser.add_argument('path', help = "the record file")
+    parser.add_argument('--outcome', choices = OUTCOMES,
+        help = "only the games that ended this way")
+    parser.add_argument('--game', type = int, metavar = 'N',
+        help = "only the Nth game in the file, counting from 0")
+    parser.add_argument('--list', action = 'store_true',
+        help = "list the games instead of replaying them")
+    parser.add_argument('--gui', action = 'store_true',
+        help = "replay the games in a window, one after another")
+    parser.add_argument('--move-time', type = float, default = MOVE_TIME,
+        metavar = 'SECONDS', help = "how long to wait between moves in the "
+            "window (default: {})".format(MOVE_TIME))
+    args = parser.parse_args()
+
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
+    games = 0
+    moves = 0
+    mismatches = 0
+    start = time.perf_counter()
+    for (n, record) in enumerate(read(args.path)):
+        if args.game is not None and n != args.game:
+            continue
+        if args.outcome is not None and record.outcome != args.outcome:
+            continue
+        games += 1
+        if args.list:
+            logging.info("{}\t{}x{}, {} mines\t{}\t{}\t{} moves\t{}".format(n,
+                record.rows, record.cols, record.mines,
+                'seed {}'.format(record.seed) if record.seed is not None
+                    else 'laid out', record.solver, len(record.moves),
+                record.outcome))
+        elif args.gui:
+            replayInWindow(record, args.move_time)
+        else:
+            game = replay(record)
+            moves += len(record.moves)
+            outcome = {True: 'win', False: 'loss'}.get(game.victory, 'unfinished')
+            if outcome != record.outcome and record.outcome != 'error':
+                mismatches += 1
+                logging.warning("Game {} was a {} when it was recorded, but "
+                    "replays as a {}".format(n, record.outcome, outcome))
+    if not (args.list or args.gui):
+        elapsed = time.perf_counter() - start
+        logging.info("Replayed {} games, {} moves, in {:.2f} s; {} didn't "
+            "end the same way".format(games, moves, elapsed, mismatches))
+        return 1 if mismatches else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
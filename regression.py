@@ -0,0 +1,264 @@
+"""
+regression.py
+
+Catches changes that make the board or the solvers slower.
+
+A baseline is a saved run of benchmark.py, kept as JSON in BASELINE_DIR so
+that it's checked in with the code it was measured on. Checking runs the same
+benchmarks again, with the same settings, and compares every case with the
+baseline. A case has regressed if it got slower by more than the threshold
+and the slowdown is statistically significant: a one-sided permutation test
+on the per-round rates, which needs no assumptions about how they're
+distributed and is exact for the handful of rounds a benchmark has.
+
+Saving a baseline also calibrates it: the benchmarks are run
+CALIBRATION_RUNS more times, unchanged, and the biggest slowdown of a case
+from any of those runs (or the baseline) to any other is kept as its noise.
+The threshold is never raised to fit the noise, since that would let a
+noisy case slow down by any amount. Instead, a case whose noise is more
+than the threshold is warned about, when the baseline is saved and
+whenever it's checked: its slowdowns can't be told from noise, so it needs
+more rounds (--rounds) or a quieter machine.
+
+Baselines are only comparable on the machine they were made on, so keep one
+per machine (see --name). baselines/reference.json is the one the checked-in
+code was measured on, to show what to expect.
+
+Run it from the command line, e.g.
+    python regression.py save
+    python regression.py check --threshold 0.1
+check exits with status 1 if anything regressed.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+
+import benchmark
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# the version of the baseline format. Baselines in another format are
+# refused rather than misread.
+BASELINE_VERSION = 1
+
+# flag a case that got slower by more than this fraction...
+THRESHOLD = 0.10
+# ... if there's less than this chance of a slowdown that big by luck alone.
+ALPHA = 0.05
+
+# how many unchanged runs to measure a new baseline's noise with.
+CALIBRATION_RUNS = 3
+
+# enumerate every way of splitting the rounds when there are at most this
+# many; otherwise draw this many splits at random.
+PERMUTATIONS = 20000
+
+def baselinePath(name):
+    return os.path.join(BASELINE_DIR, name + '.json')
+
+def defaultName():
+    """
+    Names a baseline after the machine it's made on.
+    """
+    return '{}-{}'.format(platform.node() or 'machine', platform.machine())
+
+def save(report, name):
+    """
+    Saves a benchmark.run() report as the named baseline. Returns its path.
+    """
+    os.makedirs(BASELINE_DIR, exist_ok = True)
+    path = baselinePath(name)
+    baseline = dict(report, version = BASELINE_VERSION)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent = 1)
+    return path
+
+def load(name):
+    """
+    Loads the named baseline.
+    """
+    with open(baselinePath(name)) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError("Baseline {} is in format {}, not {}".format(name,
+            baseline.get('version'), BASELINE_VERSION))
+    return baseline
+
+def noiseKey(case, levelName):
+    return '{}/{}'.format(case, levelName)
+
+def rerun(baseline):
+    """
+    Runs the benchmarks the baseline was made with again, and returns the
+    report.
+    """
+    settings = baseline['settings']
+    cases = [c for c in settings['cases']
+        if c in [case.name for case in benchmark.CASES]]
+    counts = {(r['case'], r['levelName']): r['number']
+        for r in baseline['results']}
+    return benchmark.run(cases, settings['levels'], settings['seed'],
+        settings['rounds'], settings['number'], counts)
+
+def calibrate(baseline, runs = CALIBRATION_RUNS):
+    """
+    Runs the benchmarks runs more times with nothing changed, and notes in
+    the baseline the biggest slowdown of each case between any two of the
+    runs and the baseline, as a fraction. Returns the baseline.
+    """
+    rates = {}
+    for report in [baseline] + [rerun(baseline) for _ in range(runs)]:
+        for result in report['results']:
+            key = noiseKey(result['case'], result['levelName'])
+            rates.setdefault(key, []).append(result['opsPerSec'])
+    baseline['noise'] = {key: 1 - min(caseRates) / max(caseRates)
+        for (key, caseRates) in rates.items()}
+    baseline['calibrationRuns'] = runs
+    return baseline
+
+def noisyCases(baseline, threshold = THRESHOLD):
+    """
+    Returns the keys of the cases whose noise in a calibrated baseline is
+    more than the threshold, in order.
+    """
+    return sorted(key for (key, noise) in baseline.get('noise', {}).items()
+        if noise > threshold)
+
+def warnNoisy(baseline, threshold = THRESHOLD):
+    """
+    Logs a warning for every case too noisy to check against the threshold.
+    Returns how many there were.
+    """
+    noisy = noisyCases(baseline, threshold)
+    for key in noisy:
+        logging.warning("{} varies by {:.1%} between unchanged runs, more "
+            "than the {:.0%} threshold".format(key, baseline['noise'][key],
+            threshold))
+    if noisy:
+        logging.warning("Slowdowns in those cases can't be told from noise. "
+            "Save the baseline again with more --rounds, on a quieter machine.")
+    return len(noisy)
+
+def slowdownPValue(old, new, permutations = PERMUTATIONS):
+    """
+    Returns the chance that the mean of new would be at least as far below
+    the mean of old as it is, if the two came from the same distribution:
+    the fraction of ways of splitting all the rates into two groups of the
+    same sizes that give a drop at least as big.
+    """
+    rates = list(old) + list(new)
+    size = len(old)
+    total = sum(rates)
+    observed = sum(old) / size - sum(new) / len(new)
+
+    def drop(oldIndices):
+        oldSum = sum(rates[n] for n in oldIndices)
+        return oldSum / size - (total - oldSum) / len(new)
+
+    splits = 1
+    for n in range(size):
+        splits = splits * (len(rates) - n) // (n + 1)
+    if splits <= permutations:
+        drops = [drop(indices)
+            for indices in itertools.combinations(range(len(rates)), size)]
+    else:
+        generator = random.Random(0)
+        drops = [drop(generator.sample(range(len(rates)), size))
+            for _ in range(permutations)]
+    # allow for rounding, so the observed split always counts itself.
+    tolerance = 1e-9 * abs(observed)
+    return sum(d >= observed - tolerance for d in drops) / len(drops)
+
+def compare(baseline, report, threshold = THRESHOLD, alpha = ALPHA):
+    """
+    Compares a report with a baseline, case by case. Returns a list of
+    (case, level name, change, p-value, regressed) tuples, where change is
+    the new rate over the old one, less 1. A case has regressed if it got
+    slower than the threshold, significantly; its noise doesn't change that.
+    """
+    old = {(r['case'], r['levelName']): r for r in baseline['results']}
+    comparisons = []
+    for result in report['results']:
+        key = (result['case'], result['levelName'])
+        if key not in old:
+            continue
+        before = old[key]
+        change = result['opsPerSec'] / before['opsPerSec'] - 1
+        pValue = slowdownPValue(before['rates'], result['rates'])
+        regressed = change < -threshold and pValue < alpha
+        comparisons.append(key + (change, pValue, regressed))
+    return comparisons
+
+def check(name, threshold = THRESHOLD, alpha = ALPHA, report = None):
+    """
+    Runs the benchmarks the named baseline was made with (unless a report is
+    given) and compares them with it. Logs the comparison and returns True
+    if nothing regressed.
+    """
+    baseline = load(name)
+    if baseline.get('machine') != platform.machine():
+        logging.warning("Baseline {} was made on a {}, not a {}".format(name,
+            baseline.get('machine'), platform.machine()))
+    warnNoisy(baseline, threshold)
+    if report is None:
+        report = rerun(baseline)
+
+    passed = True
+    for (case, level, change, pValue, regressed) in compare(baseline, report,
+            threshold, alpha):
+        logging.info("{:<22}{:<14}{:>+8.1%}  p = {:.3f}{}".format(case, level,
+            change, pValue, "  REGRESSED" if regressed else ""))
+        passed = passed and not regressed
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[1])
+    parser.add_argument('command', choices = ('save', 'check'))
+    parser.add_argument('--name', default = defaultName(),
+        help = "the baseline to save or check against (default: {})".format(
+            defaultName()))
+    parser.add_argument('--results',
+        help = "a saved benchmark.py --json report to use instead of running "
+            "the benchmarks")
+    parser.add_argument('--threshold', type = float, default = THRESHOLD,
+        help = "the slowdown to fail on, as a fraction")
+    parser.add_argument('--alpha', type = float, default = ALPHA,
+        help = "the significance level for a slowdown")
+    parser.add_argument('--cases', nargs = '+',
+        choices = [case.name for case in benchmark.CASES],
+        help = "what to save in the baseline (default: everything)")
+    parser.add_argument('--levels', nargs = '+', choices = benchmark.LEVELS)
+    parser.add_argument('--rounds', type = int, default = benchmark.ROUNDS)
+    parser.add_argument('--calibration-runs', type = int,
+        default = CALIBRATION_RUNS,
+        help = "how many unchanged runs to measure a new baseline's noise "
+            "with, or 0 not to (default: {})".format(CALIBRATION_RUNS))
+    args = parser.parse_args()
+
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
+    report = None
+    if args.results:
+        with open(args.results) as f:
+            report = json.load(f)
+
+    if args.command == 'save':
+        if report is None:
+            report = benchmark.run(args.cases, args.levels, rounds = args.rounds)
+        if args.calibration_runs:
+            report = calibrate(report, args.calibration_runs)
+            for (key, noise) in sorted(report['noise'].items()):
+                logging.info("{:<36}noise {:>6.1%}".format(key, noise))
+            warnNoisy(report, args.threshold)
+        logging.info("Saved {}".format(save(report, args.name)))
+        return 0
+
+    passed = check(args.name, args.threshold, args.alpha, report)
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
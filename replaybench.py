@@ -0,0 +1,335 @@
+"""
+replaybench.py
+
+Times the solver's guess() on real positions, from recorded games, and
+checks that later code is no slower on them and still makes the same moves.
+
+benchmark.py times guess() on a few seeded positions, which are mostly easy
+and vary from run to run. Here the positions come from a corpus of recorded
+games (see recording.py): every point in a game where the solver was asked
+for more moves. A game is walked through move by move with a fresh solver,
+which observes every recorded move and is asked to guess at every one of
+those points, so guess() sees exactly the inputs it saw when the game was
+played, including whatever it worked out in its earlier guesses. Its own
+moves are then thrown away and the recorded ones made instead, so the walk
+never leaves the recorded game, whatever the new code would have done.
+
+Every game is walked REPEATS times, each time from an empty component cache
+and the game's own seed, which gives each position a distribution of
+latencies. Saving a baseline keeps the KEEP slowest positions; checking
+walks their games again and flags every position that
+-- got slower by more than the threshold, with a permutation test (the same
+    as regression.py's) saying the slowdown isn't luck, or
+-- chose different moves, where the guess finished its analysis before the
+    deadline both times and chose the same moves on every walk (otherwise
+    the moves depend on timing, and a change means nothing)
+
+Positions are named file:game:move: the record file's place in the corpus,
+the game's place in the file and the move's place in the game. Record files
+are only appended to, so the names stay good as the corpus grows.
+
+Run it from the command line, e.g.
+    python simulate.py --games 1000 --record corpus.rec
+    python replaybench.py save corpus.rec
+    python replaybench.py check
+check exits with status 1 if any position got slower or changed its moves.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+
+import benchmark
+import cache
+import recording
+import regression
+import solver
+
+# the version of the baseline format.
+BASELINE_VERSION = 1
+
+# how many times to walk every game.
+REPEATS = 5
+
+# how many of the slowest positions to keep in a baseline.
+KEEP = 100
+
+# how long guess() gets at each position, as when it plays.
+WATCHDOG = solver.WATCHDOG_TIME
+
+SOLVER_TYPES = {'basic': solver.BasicSolver, 'advanced': solver.AdvancedSolver}
+
+def defaultName():
+    return regression.defaultName() + '-replay'
+
+def positionName(file, game, move):
+    return '{}:{}:{}'.format(file, game, move)
+
+def walk(record, watchdog = WATCHDOG):
+    """
+    Walks through a recorded game with a fresh solver, asking it to guess
+    wherever it was asked in the game. Returns a dictionary of move index ->
+    (seconds, moves, completeness) for every guess, where moves are the
+    moves it queued, as [action, row, col] lists.
+    """
+    cache.setDefaultCache(cache.ComponentCache())
+    random.seed(record.seed if record.seed is not None else 0)
+    game = recording.newBoard(record)
+    player = SOLVER_TYPES[record.solver or 'advanced'](game)
+    guesses = {}
+    for (n, (action, tile, guessed)) in enumerate(record.iterMoves()):
+        # the first click is a random pick, with nothing to time.
+        if guessed and n > 0:
+            # anything still queued was queued by propagation, and has been
+            # made already (or the game would have made it before guessing).
+            player.queue.clear()
+            start = time.perf_counter()
+            player.guess(time.time() + watchdog)
+            elapsed = time.perf_counter() - start
+            guesses[n] = (elapsed, [[item.action, item.row, item.col]
+                for item in player.queue], player.completeness)
+        move = takeMove(player.queue, action, tile)
+        recording.applyMove(game, action, *tile)
+        player.observe(move)
+    return guesses
+
+def takeMove(queue, action, tile):
+    """
+    Returns the QueueItem for a recorded move, taking it out of the solver's
+    queue if it's there.
+    """
+    for item in queue:
+        if item.getTile() == tile:
+            queue.remove(item)
+            return item
+    return solver.QueueItem(*tile, action)
+
+def percentile(values, fraction):
+    """
+    The value that fraction of the values are at or below (nearest rank).
+    """
+    if not values:
+        raise ValueError("No values to take a percentile of")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(fraction * len(ordered)
+        + 0.5) - 1))]
+
+def measure(records, repeats = REPEATS, watchdog = WATCHDOG, only = None):
+    """
+    Times every position in records, a list of (file index, game index,
+    GameRecord) tuples, walking each game repeats times. If only is given,
+    only the positions named in it are kept. Returns a list of dictionaries,
+    one per position.
+    """
+    # walk every game once before walking any of them again, so that a
+    # position's latencies are spread over the run, and whatever else the
+    # machine is doing shows up in their spread rather than in one of them.
+    allWalks = [[] for _ in records]
+    for _ in range(repeats):
+        for (walks, (file, gameIndex, record)) in zip(allWalks, records):
+            walks.append(walk(record, watchdog))
+    positions = []
+    for (walks, (file, gameIndex, record)) in zip(allWalks, records):
+        recorded = [[action, i, j]
+            for (action, (i, j), guessed) in record.iterMoves()]
+        for n in sorted(walks[0]):
+            name = positionName(file, gameIndex, n)
+            if only is not None and name not in only:
+                continue
+            latencies = [w[n][0] for w in walks]
+            moves = walks[0][n][1]
+            positions.append({
+                'position': name,
+                'latencies': latencies,
+                'median': percentile(latencies, 0.5),
+                'p90': percentile(latencies, 0.9),
+                'moves': moves,
+                'recorded': recorded[n],
+                'complete': all(w[n][2] >= 1.0 for w in walks),
+                'stable': all(w[n][1] == moves for w in walks),
+            })
+    return positions
+
+def loadCorpus(paths, outcome = None, games = None):
+    """
+    Reads the games in the record files at paths, as a list of (file index,
+    game index, GameRecord) tuples. outcome keeps only the games that ended
+    that way; games, a set of (file index, game index), keeps only those.
+    """
+    records = []
+    for (file, path) in enumerate(paths):
+        for (gameIndex, record) in enumerate(recording.read(path)):
+            if outcome is not None and record.outcome != outcome:
+                continue
+            if games is not None and (file, gameIndex) not in games:
+                continue
+            records.append((file, gameIndex, record))
+    return records
+
+def run(paths, outcome = None, repeats = REPEATS, watchdog = WATCHDOG,
+        keep = KEEP, only = None):
+    """
+    Times the positions in the corpus at paths, and keeps the keep slowest
+    by their median (or all of them if keep is 0), or the ones named in only.
+    Returns them, along with what they were measured on, as a dictionary
+    that can be saved as JSON.
+    """
+    games = None
+    if only is not None:
+        games = set()
+        for name in only:
+            (file, gameIndex, n) = name.split(':')
+            games.add((int(file), int(gameIndex)))
+    # the solvers log every random guess, which would swamp the results.
+    logger = logging.getLogger()
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        positions = measure(loadCorpus(paths, outcome, games), repeats,
+            watchdog, only)
+    finally:
+        logger.setLevel(level)
+    if only is None and keep:
+        positions.sort(key = lambda p: -p['median'])
+        positions = positions[:keep]
+    return {
+        'version': BASELINE_VERSION,
+        'settings': {
+            'corpus': list(paths),
+            'outcome': outcome,
+            'repeats': repeats,
+            'watchdog': watchdog,
+        },
+        'commit': benchmark.commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'positions': positions,
+    }
+
+def save(report, name):
+    """
+    Saves a run() report as the named baseline. Returns its path.
+    """
+    os.makedirs(regression.BASELINE_DIR, exist_ok = True)
+    path = regression.baselinePath(name)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent = 1)
+    return path
+
+def load(name):
+    with open(regression.baselinePath(name)) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError("Baseline {} is in format {}, not {}".format(name,
+            baseline.get('version'), BASELINE_VERSION))
+    return baseline
+
+def compare(baseline, report, threshold = regression.THRESHOLD,
+        alpha = regression.ALPHA):
+    """
+    Compares a report with a baseline, position by position. Returns a list
+    of (position, old median, new median, change, p-value, slower,
+    moved) tuples, where change is the new median over the old one, less 1,
+    and moved says whether the position's moves changed.
+    """
+    old = {p['position']: p for p in baseline['positions']}
+    comparisons = []
+    for position in report['positions']:
+        before = old.get(position['position'])
+        if before is None:
+            continue
+        change = position['median'] / before['median'] - 1
+        # a slowdown in latency is a drop from the new latencies to the old.
+        pValue = regression.slowdownPValue(position['latencies'],
+            before['latencies'])
+        slower = change > threshold and pValue < alpha
+        comparable = (before['complete'] and before['stable']
+            and position['complete'] and position['stable'])
+        moved = comparable and position['moves'] != before['moves']
+        comparisons.append((position['position'], before['median'],
+            position['median'], change, pValue, slower, moved))
+    return comparisons
+
+def check(name, threshold = regression.THRESHOLD, alpha = regression.ALPHA,
+        corpus = None):
+    """
+    Times the named baseline's positions again, from its corpus (or the
+    record files in corpus, in the same order) and compares them with it.
+    Logs the comparison and returns True if nothing got slower or moved.
+    """
+    baseline = load(name)
+    if baseline.get('machine') != platform.machine():
+        logging.warning("Baseline {} was made on a {}, not a {}".format(name,
+            baseline.get('machine'), platform.machine()))
+    settings = baseline['settings']
+    report = run(corpus or settings['corpus'], settings['outcome'],
+        settings['repeats'], settings['watchdog'],
+        only = {p['position'] for p in baseline['positions']})
+
+    passed = True
+    comparisons = compare(baseline, report, threshold, alpha)
+    if not comparisons:
+        logging.warning("None of the positions in baseline {} were found "
+            "again; is it the right corpus?".format(name))
+        return passed
+    for (position, before, after, change, pValue, slower, moved) in comparisons:
+        if not (slower or moved):
+            continue
+        logging.info("{:<16}{:>9.2f} ms{:>9.2f} ms{:>+8.1%}  p = {:.3f}{}{}".format(
+            position, 1000 * before, 1000 * after, change, pValue,
+            "  SLOWER" if slower else "", "  MOVED" if moved else ""))
+        passed = False
+    for (label, fraction) in (('median', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        logging.info("{:<8}{:>9.2f} ms -> {:.2f} ms".format(label,
+            1000 * percentile([c[1] for c in comparisons], fraction),
+            1000 * percentile([c[2] for c in comparisons], fraction)))
+    logging.info("{} positions, {} slower, {} moved".format(len(comparisons),
+        sum(c[5] for c in comparisons), sum(c[6] for c in comparisons)))
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[1])
+    parser.add_argument('command', choices = ('save', 'check'))
+    parser.add_argument('corpus', nargs = '*',
+        help = "the record files to take positions from (default for check: "
+            "the baseline's)")
+    parser.add_argument('--name', default = defaultName(),
+        help = "the baseline to save or check against (default: {})".format(
+            defaultName()))
+    parser.add_argument('--outcome', choices = recording.OUTCOMES,
+        help = "only take positions from games that ended this way")
+    parser.add_argument('--keep', type = int, default = KEEP,
+        help = "keep this many of the slowest positions, or 0 for all of "
+            "them (default: {})".format(KEEP))
+    parser.add_argument('--repeats', type = int, default = REPEATS,
+        help = "walk every game this many times")
+    parser.add_argument('--watchdog', type = float, default = WATCHDOG,
+        metavar = 'SECONDS', help = "how long guess() gets (default: "
+            "{})".format(WATCHDOG))
+    parser.add_argument('--threshold', type = float,
+        default = regression.THRESHOLD,
+        help = "the slowdown to fail on, as a fraction")
+    parser.add_argument('--alpha', type = float, default = regression.ALPHA,
+        help = "the significance level for a slowdown")
+    args = parser.parse_args()
+
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
+    if args.command == 'save':
+        if not args.corpus:
+            parser.error("save needs at least one record file")
+        report = run(args.corpus, args.outcome, args.repeats, args.watchdog,
+            args.keep)
+        logging.info("Saved {} positions to {}".format(len(report['positions']),
+            save(report, args.name)))
+        return 0
+
+    passed = check(args.name, args.threshold, args.alpha, args.corpus)
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+rules.py
+
+The rules of minesweeper, with nothing about how the board is shown.
+
+board.Board plays by these in a window, and simulate.HeadlessBoard plays by
+them with no window at all, so the solver sees the same game either way. A
+board only has to make its tiles and lay its mines; it can show what
+changes by overriding _showTile() and _showEnd(), which do nothing here.
+"""
+import zobrist
+
+class Rules(object):
+    """
+    What happens when tiles are clicked, flagged and double-clicked.
+
+    A subclass sets rows, cols, mines, tileCount and tiles, calls _newGame(),
+    and provides layMines(clickRow, clickCol). tiles is a grid that can be
+    indexed as tiles[i][j] or tiles[pair], where pair = (i, j), and every
+    tile has covered, mine, flag, number and exploded fields.
+    -- firstClick: whether the mines are still to be laid
+    -- victory: None while the game is on, then True or False
+    -- zobristHash: a hash of what the player can see (see zobrist.py), kept
+        up to date on every change
+    -- safeLeft: how many tiles without a mine are still covered, so that
+        checking for victory doesn't mean scanning the board
+    """
+    def _newGame(self):
+        """
+        Sets up the state of a game that hasn't started, for a board whose
+        tiles are all covered.
+        """
+        # some implementations of minesweeper decide the mine positions
+        # when the board is first generated. But the original Microsoft
+        # implementation has it so that the first tile will always have no
+        # mines in neighboring tiles. So a flag for the first tile to click.
+        self.firstClick = True
+        self.victory = None
+        self.zobristHash = 0
+        self.safeLeft = self.tileCount - self.mines
+        return
+
+    def layMines(self, clickRow, clickCol):
+        """
+        Lays the mines anywhere but the first tile clicked and its neighbors,
+        and numbers the tiles around them.
+        """
+        raise NotImplementedError
+
+    def primaryClick(self, i, j):
+        """
+        Uncovers a tile, and everything around it if it's a zero.
+        """
+        # if all the tiles are covered, set the positions for all the mines
+        if self.firstClick:
+            self.layMines(i, j)
+            self.firstClick = False
+        # if the tile has a flag, or if the tile is already uncovered,
+        # the primary click does nothing.
+        elif self.tiles[i][j].flag or not self.tiles[i][j].covered:
+            return
+        if self._checkGameOver(i, j):
+            return
+        # if there are no mines nearby, automatically uncover all the
+        # nearby tiles.
+        zeroNeighbors = [(i, j)]
+        self._uncover(i, j)
+        while zeroNeighbors:
+            current = zeroNeighbors.pop()
+            if self.tiles[current].number > 0:
+                continue
+            for n in self.getNeighbors(*current):
+                if self.tiles[n].covered:
+                    self._uncover(*n)
+                    zeroNeighbors.append(n)
+        self._checkVictory()
+        return
+
+    def secondaryClick(self, i, j):
+        """
+        Toggles the flag on a covered tile.
+        """
+        if not self.tiles[i][j].covered:
+            # shouldn't be possible to get into a state where tile.flag is
+            # True, but just in case
+            self.tiles[i][j].flag = False
+        else:
+            oldState = self.visibleState(i, j)
+            self.tiles[i][j].flag = not self.tiles[i][j].flag
+            self._rehash(i, j, oldState)
+        self._showTile(i, j)
+        self._checkVictory()
+        return
+
+    def doubleClick(self, i, j):
+        """
+        Clicks every neighbor of a number that has as many flags around it as
+        its number. On a covered tile it's the same as a single click.
+        """
+        if self.tiles[i][j].covered:
+            self.primaryClick(i, j)
+            return
+        if self.tiles[i][j].number > 0:
+            neighbors = self.getNeighbors(i, j)
+            flags = sum(self.tiles[n].flag for n in neighbors)
+            if flags == self.tiles[i][j].number:
+                # go ahead and click on flagged and uncovered tiles. It's fine.
+                for n in neighbors:
+                    self.primaryClick(*n)
+        return
+
+    def visibleState(self, i, j):
+        """
+        Returns what the player can see of tiles[i, j], as one of the states
+        in zobrist.py.
+        """
+        tile = self.tiles[i][j]
+        return zobrist.visibleState(tile.covered, tile.flag, tile.mine, tile.number)
+
+    def getNeighbors(self, i, j):
+        """
+        returns all the tiles adjacent to tiles[i, j]
+        """
+        neighbors = set()
+        for row in range(max(i - 1, 0), min(i + 2, self.rows)):
+            for col in range(max(j - 1, 0), min(j + 2, self.cols)):
+                if row != i or col != j:
+                    neighbors.add((row, col))
+        return neighbors
+
+    def _showTile(self, i, j):
+        """
+        Called whenever tiles[i, j] changes.
+        """
+        return
+
+    def _showEnd(self):
+        """
+        Called once the game is won or lost.
+        """
+        return
+
+    def _uncover(self, i, j):
+        """
+        Uncovers a single tile that has no mine.
+        """
+        self.tiles[i][j].covered = False
+        self._rehash(i, j, zobrist.COVERED)
+        self.safeLeft -= 1
+        self._showTile(i, j)
+        return
+
+    def _checkGameOver(self, row, col):
+        """
+        Ends the game if there's a mine on the tile: shows every mine, and
+        marks every flag that isn't on one.
+        """
+        if not self.tiles[row][col].mine:
+            return False
+        self.tiles[row][col].exploded = True
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if self.tiles[i][j].mine:
+                    oldState = self.visibleState(i, j)
+                    self.tiles[i][j].covered = False
+                    self._rehash(i, j, oldState)
+                    self._showTile(i, j)
+                elif self.tiles[i][j].flag:
+                    self.tiles[i][j].exploded = True
+                    self._showTile(i, j)
+        self.victory = False
+        self._showEnd()
+        return True
+
+    def _checkVictory(self):
+        """
+        Wins the game once every tile without a mine is uncovered, and flags
+        all the mines.
+        """
+        if self.safeLeft > 0:
+            return False
+        self.victory = True
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if self.tiles[i][j].mine and not self.tiles[i][j].flag:
+                    oldState = self.visibleState(i, j)
+                    self.tiles[i][j].flag = True
+                    self._rehash(i, j, oldState)
+                    self._showTile(i, j)
+        self._showEnd()
+        return True
+
+    def _rehash(self, i, j, oldState):
+        """
+        Updates the Zobrist hash after tiles[i, j] has changed from oldState.
+        """
+        self.zobristHash ^= zobrist.key(i, j, oldState)
+        self.zobristHash ^= zobrist.key(i, j, self.visibleState(i, j))
+        return
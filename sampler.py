@@ -0,0 +1,323 @@
+"""
+sampler.py
+
+A Markov chain sampler for frontiers too big to count exactly.
+
+The old stochastic guessers drew completely random sets of mines and threw
+away the ones that didn't match the numbers, which on a real board is nearly
+all of them. This sampler starts from an arrangement that does match, and
+only ever moves to other arrangements that match: at every step it picks a
+small block of cells (the cells around one or two numbers), works out every
+way of refilling that block that is still consistent with the rest of the
+board, and picks one of them at random (block Gibbs sampling).
+
+Each arrangement is weighted by how many ways the leftover mines could be
+placed elsewhere, so the chain visits arrangements as often as they would
+come up in a real game.
+"""
+import math
+import random
+import time
+
+import frontier
+import probability
+
+# never resample more than this many cells in one step.
+BLOCK_SIZE = 12
+
+# refill blocks of up to this many cells from a ConstraintMatrix, once they
+# have been refilled MATRIX_AFTER times the slow way. A matrix costs about as
+# much to build as one or two refills and makes the rest a hundred times
+# cheaper, but in a short run most blocks only come up a few times, so it's
+# only built for the ones that keep coming up. Bigger blocks take longer to
+# build than a run under the watchdog has.
+MATRIX_CELLS = 10
+MATRIX_AFTER = 16
+
+# record the state once every this many steps.
+THINNING = 4
+
+# samples are grouped into batches for the confidence intervals.
+BATCH_SIZE = 50
+MIN_BATCHES = 10
+
+# throw away this many steps before recording anything, so that the chain has
+# a chance to forget where it started.
+BURN_IN = 100
+
+# stop early once every cell's 95% confidence interval is narrower than
+# plus or minus this much.
+TOLERANCE = 0.02
+
+# stop regardless after this many samples, or this many tries that found
+# nothing to record.
+MAX_SAMPLES = 100000
+
+# z-value for a 95% confidence interval.
+Z_95 = 1.96
+
+class GibbsSampler(object):
+    """
+    Samples arrangements of mines in a component, where an arrangement with
+    m mines has probability proportional to weights[m].
+
+    After count() has been called:
+    -- samples: the number of arrangements recorded
+    -- intervals: a list with the half-width of the 95% confidence interval
+        on each cell's probability (None for cells that were never sampled)
+    -- converged: whether the sampler stopped because the intervals were
+        narrow enough
+    """
+    tolerance = TOLERANCE
+
+    def __init__(self, component, weights):
+        """
+        Takes a frontier.Component and a list where weights[m] is the
+        relative weight of any arrangement with m mines.
+        """
+        self.component = component
+        self.weights = weights
+        self.samples = 0
+        self.intervals = [None] * len(component)
+        self.converged = False
+
+        # the blocks to resample. One block for every constraint, and one for
+        # every pair of overlapping constraints that isn't too big. Those
+        # alone can leave the chain stuck in one corner of the possibilities,
+        # so there is also a block for every run of BLOCK_SIZE cells in the
+        # component's order (which keeps cells near each other together).
+        constraints = component.constraints
+        blocks = set()
+        for (c, (indices, _)) in enumerate(constraints):
+            blocks.add(indices)
+            for n in indices:
+                for other in component.cellConstraints[n]:
+                    if other <= c:
+                        continue
+                    union = tuple(sorted(set(indices) | set(constraints[other][0])))
+                    if len(union) <= BLOCK_SIZE:
+                        blocks.add(union)
+        for start in range(max(len(component) - BLOCK_SIZE, 0) + 1):
+            blocks.add(tuple(range(start, min(start + BLOCK_SIZE, len(component)))))
+        self.blocks = sorted(blocks)
+        # block -> (ConstraintMatrix, constraints it touches), for the blocks
+        # that have come up MATRIX_AFTER times, and block -> how many times
+        # the others have.
+        self.matrices = {}
+        self.refills = {}
+        return
+
+    def count(self, deadline = None, maxSamples = MAX_SAMPLES):
+        """
+        Runs the chain until the deadline, until maxSamples arrangements have
+        been recorded (or it's tried maxSamples times without finding one it
+        could), or until the confidence intervals are tight enough.
+
+        Returns a ComponentTable whose counts are proportional to the number
+        of arrangements with each number of mines, like the exact counter's.
+        """
+        component = self.component
+        table = probability.ComponentTable(component)
+
+        # find a place to start.
+        start = probability.RandomSampler(component).count(maxSamples = 1)
+        if not start.counts:
+            return table
+        mines = next(iter(start.counts))
+        self.assignment = list(start.cellCounts[mines])
+        self.mines = mines
+        self.placed = [sum(self.assignment[n] for n in indices)
+            for (indices, _) in component.constraints]
+
+        for _ in range(BURN_IN):
+            if deadline is not None and time.time() > deadline:
+                break
+            self._step()
+
+        # the number of recorded samples with each mine count, and the number
+        # of those with a mine on each cell.
+        visits = {}
+        hits = {}
+        # per-cell hit counts for every finished batch
+        batches = []
+        batch = [0] * len(component)
+
+        # how many times the chain has been somewhere it can't record.
+        rejected = 0
+        while self.samples < maxSamples and rejected < maxSamples:
+            # always try for a few samples, however late it is, so that there
+            # is something to go on. The tries that found nowhere to record
+            # count too, or a chain that's stuck would never stop.
+            if deadline is not None and time.time() > deadline:
+                if self.samples + rejected >= probability.MIN_SAMPLES:
+                    break
+            for _ in range(THINNING):
+                self._step()
+
+            mines = self.mines
+            # the starting arrangement might not be possible once the rest of
+            # the board is taken into account. Don't record it.
+            if self.weights[mines] == 0:
+                rejected += 1
+                continue
+            if mines not in visits:
+                visits[mines] = 0
+                hits[mines] = [0] * len(component)
+            visits[mines] += 1
+            cellHits = hits[mines]
+            for (n, value) in enumerate(self.assignment):
+                if value:
+                    cellHits[n] += 1
+                    batch[n] += 1
+            self.samples += 1
+
+            if self.samples % BATCH_SIZE == 0:
+                batches.append(batch)
+                batch = [0] * len(component)
+                if len(batches) >= MIN_BATCHES:
+                    if self._intervals(batches) < self.tolerance:
+                        self.converged = True
+                        break
+
+        if len(batches) >= 2:
+            self._intervals(batches)
+
+        # the chain visits m-mine arrangements in proportion to
+        # (number of arrangements) * weights[m], so divide the weight back out.
+        for (mines, visitCount) in visits.items():
+            weight = self.weights[mines]
+            table.counts[mines] = visitCount / weight
+            table.cellCounts[mines] = [h / weight for h in hits[mines]]
+        table.samples = self.samples
+        return table
+
+    def _intervals(self, batches):
+        """
+        Estimates the 95% confidence interval of every cell's probability
+        from the spread of the batch means, which allows for the samples in a
+        chain not being independent. Returns the widest half-width.
+        """
+        count = len(batches)
+        widest = 0.0
+        for n in range(len(self.component)):
+            means = [batch[n] / BATCH_SIZE for batch in batches]
+            mean = sum(means) / count
+            variance = sum((m - mean) ** 2 for m in means) / (count - 1)
+            self.intervals[n] = Z_95 * math.sqrt(variance / count)
+            widest = max(widest, self.intervals[n])
+        return widest
+
+    def _step(self):
+        """
+        Picks a block at random and refills it from its conditional
+        distribution given everything outside it.
+        """
+        block = random.choice(self.blocks)
+        component = self.component
+
+        # take the block's current mines out of the running totals.
+        oldMines = 0
+        for n in block:
+            if self.assignment[n]:
+                oldMines += 1
+                for c in component.cellConstraints[n]:
+                    self.placed[c] -= 1
+
+        if block in self.matrices or self._wantsMatrix(block):
+            self.options = self._matching(block)
+        else:
+            # count how many block cells each touched constraint has left.
+            self.open = {}
+            for n in block:
+                for c in component.cellConstraints[n]:
+                    self.open[c] = self.open.get(c, 0) + 1
+            self.options = []
+            self._refill(block, 0, 0, 0)
+
+        # pick one of the refills, weighted by its mine count.
+        rest = self.mines - oldMines
+        choices = [(fill, self.weights[rest + mines])
+            for (fill, mines) in self.options]
+        total = sum(weight for (_, weight) in choices)
+        if total == 0:
+            # we're somewhere impossible (which can only happen at the
+            # start). Wander at random until we find our way out.
+            (fill, _) = random.choice(choices)
+        else:
+            pick = random.random() * total
+            for (option, weight) in choices:
+                if weight == 0:
+                    continue
+                fill = option
+                pick -= weight
+                if pick <= 0:
+                    break
+
+        # put the new mines back in. Bit p of the fill is block[p].
+        newMines = 0
+        for (p, n) in enumerate(block):
+            value = (fill >> p) & 1
+            self.assignment[n] = value
+            if value:
+                newMines += 1
+                for c in component.cellConstraints[n]:
+                    self.placed[c] += 1
+        self.mines = rest + newMines
+        return
+
+    def _wantsMatrix(self, block):
+        """
+        Counts a refill of the block, and says whether it's time to build
+        the block a ConstraintMatrix.
+        """
+        if len(block) > MATRIX_CELLS:
+            return False
+        refills = self.refills.get(block, 0) + 1
+        self.refills[block] = refills
+        return refills > MATRIX_AFTER
+
+    def _matching(self, block):
+        """
+        Looks up every way of filling the block that satisfies the
+        constraints, given the mines already placed outside it, in the
+        block's ConstraintMatrix. The same as _refill(), as (fill, mines)
+        pairs.
+        """
+        if block not in self.matrices:
+            touched = sorted({c for n in block
+                for c in self.component.cellConstraints[n]})
+            matrix = frontier.ConstraintMatrix(block,
+                [self.component.constraints[c][0] for c in touched])
+            self.matrices[block] = (matrix, touched)
+        (matrix, touched) = self.matrices[block]
+        # each constraint needs exactly the mines the outside doesn't supply.
+        constraints = self.component.constraints
+        return matrix.matching([constraints[c][1] - self.placed[c]
+            for c in touched])
+
+    def _refill(self, block, position, fill, mines):
+        """
+        Enumerates every way of filling the block that satisfies the
+        constraints, given the mines already placed outside it. Each way is
+        an int with bit p set if block[p] is a mine.
+        """
+        if position == len(block):
+            self.options.append((fill, mines))
+            return
+        constraints = self.component.constraints
+        touched = self.component.cellConstraints[block[position]]
+        for value in (0, 1):
+            feasible = True
+            for c in touched:
+                self.placed[c] += value
+                self.open[c] -= 1
+                needed = constraints[c][1]
+                if self.placed[c] > needed or self.placed[c] + self.open[c] < needed:
+                    feasible = False
+            if feasible:
+                self._refill(block, position + 1, fill | (value << position),
+                    mines + value)
+            for c in touched:
+                self.placed[c] -= value
+                self.open[c] += 1
+        return
@@ -0,0 +1,614 @@
+"""
+simulate.py
+
+Plays lots of games with a solver, with no window, to see how well it does.
+
+board.Board needs tkinter (and a display) for every tile, so games here are
+played on a HeadlessBoard, which plays by the same rules (rules.Rules) with
+plain objects.
+The games are shared out over a pool of processes. Every game gets its own
+seed, which fixes where the mines go and what the solver's random choices
+are, so the same seeds give every solver the same boards. (The solver still
+works to a wall-clock deadline, so a slow machine can play a seed
+differently.) Results are added to a Tally as they come in, so a long run
+can be stopped at any point and still report what it has.
+
+Run it from the command line, e.g.
+    python simulate.py --games 1000 --solver advanced --level expert
+Pass --metrics-port or --metrics-file to watch a long run as it goes (see
+metrics.py), and --record to keep every game to replay later (see
+recording.py).
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import random
+import time
+
+import cache
+import events
+import instrument
+import metrics
+import profiling
+import recording
+import rules
+import solver
+
+# the same levels as in board.py, which can't be imported without a display.
+LEVELS = {
+    'beginner': (9, 9, 10),
+    'intermediate': (16, 16, 40),
+    'expert': (16, 40, 99),
+}
+
+# the solvers that can be picked from the command line.
+SOLVERS = ('basic', 'advanced')
+
+# give up on a game after this many moves per tile. Every real move uncovers
+# or flags something, so only a broken solver gets anywhere near it.
+MOVE_LIMIT = 4
+
+# how many games to hand a worker at a time.
+CHUNK_SIZE = 4
+
+# report progress once every this many games.
+REPORT_INTERVAL = 100
+
+# z-value for a 95% confidence interval.
+Z_95 = 1.96
+
+# what a game can end as.
+WIN = 'win'
+LOSS = 'loss'
+UNFINISHED = 'unfinished'
+ERROR = 'error'
+
+# the parts of a game that are timed.
+PHASES = ('guess', 'move', 'observe')
+
+# keep this share of the solvers' events by default. There are a few hundred
+# a game, and keeping all of them costs something like 10% of the games per
+# second on one core.
+EVENT_RATE = 0.1
+
+# what can be profiled: every call to guess(), or whole games.
+PROFILE_SCOPES = ('guess', 'game')
+
+# how often to rewrite the --metrics-file, in seconds.
+METRICS_INTERVAL = 5.0
+
+class HeadlessBoard(rules.Rules):
+    """
+    A minesweeper board with the same rules (see rules.py) and the same
+    interface to the solver as board.Board, but no GUI.
+    Mines are laid with a generator seeded from seed, so a seed and a first
+    click always give the same board.
+    """
+    def __init__(self, rows, cols, mines, seed = None):
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.tileCount = rows * cols
+        self.random = random.Random(seed)
+        self.tiles = HeadlessGrid(rows, cols)
+        self._newGame()
+        return
+
+    def layMines(self, clickRow, clickCol):
+        """
+        Lays the mines anywhere but the first tile clicked and its neighbors.
+        """
+        keepClear = self.getNeighbors(clickRow, clickCol)
+        keepClear.add((clickRow, clickCol))
+        spots = [(i, j) for i in range(self.rows) for j in range(self.cols)
+            if (i, j) not in keepClear]
+        for (i, j) in self.random.sample(spots, self.mines):
+            self.tiles[i][j].mine = True
+            for n in self.getNeighbors(i, j):
+                self.tiles[n].number += 1
+        return
+
+    def restart(self):
+        """
+        Covers everything up again, ready for a new game.
+        """
+        self.tiles = HeadlessGrid(self.rows, self.cols)
+        self._newGame()
+        return
+
+class HeadlessGrid(object):
+    """
+    The tiles of a HeadlessBoard. Like board.TileGrid, it can be indexed as
+    grid[i][j] or grid[pair], where pair = (i, j).
+    """
+    def __init__(self, rows, cols):
+        self.tiles = [[HeadlessTile() for j in range(cols)] for i in range(rows)]
+        return
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            (i, j) = key
+            return self.tiles[i][j]
+        return self.tiles[key]
+
+class HeadlessTile(object):
+    """
+    The data fields of a board.Tile, without the button.
+    """
+    __slots__ = ('covered', 'mine', 'flag', 'number', 'exploded')
+
+    def __init__(self):
+        self.covered = True
+        self.mine = False
+        self.flag = False
+        self.number = 0
+        self.exploded = False
+        return
+
+class GameResult(object):
+    """
+    How a single game went.
+
+    -- seed: the seed the game was played with
+    -- outcome: WIN, LOSS, UNFINISHED (the move limit ran out) or ERROR (the
+        solver asked for an invalid move)
+    -- moves: how many moves the solver made
+    -- seconds: how long the game took
+    -- phases: a dictionary of phase -> seconds spent on it, for each of
+        PHASES: coming up with moves, making them, and the solver taking in
+        what they did
+    -- incomplete: how many times the solver had to go on an analysis it
+        didn't finish before its deadline
+    -- stats: the solver's own instrumentation, phase by phase, as
+        instrument.SolverStats.asDict()
+    -- stacks: if the game was profiled, the collapsed stacks of the calls
+        that were slow enough to keep (see profiling.py)
+    -- events: if events were being kept, a list of the game's events (see
+        events.py)
+    -- guessTimes: the seconds each call to guess() took
+    -- queueDepths: how many moves each call to guess() queued
+    -- cacheHits, cacheMisses: the component cache's hits and misses during
+        the game (see cache.py)
+    -- record: if the game was recorded, its recording.GameRecord
+    """
+    def __init__(self, seed):
+        self.seed = seed
+        self.outcome = UNFINISHED
+        self.moves = 0
+        self.seconds = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.incomplete = 0
+        self.stats = None
+        self.stacks = None
+        self.events = None
+        self.guessTimes = []
+        self.queueDepths = []
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.record = None
+        return
+
+def playGame(solverName, level, seed, profile = None, threshold = 0.0,
+        record = False):
+    """
+    Plays one game at level (a (rows, cols, mines) tuple) with the named
+    solver, and returns a GameResult.
+    profile can be one of PROFILE_SCOPES, to profile every call to guess()
+    or the whole game, keeping the ones that took at least threshold
+    seconds. If record is True, the game's moves are kept in result.record.
+    """
+    solverType = {'basic': solver.BasicSolver,
+        'advanced': solver.AdvancedSolver}[solverName]
+    result = GameResult(seed)
+    random.seed(seed)
+    game = HeadlessBoard(*level, seed = seed)
+    player = solverType(game)
+    if record:
+        result.record = recording.GameRecord(*level, seed = seed,
+            solver = solverName)
+    componentCache = cache.defaultCache()
+    (hits, misses) = (componentCache.hits, componentCache.misses)
+
+    if profile is None:
+        _playMoves(game, player, result)
+    else:
+        profiler = profiling.SamplingProfiler(threshold)
+        if profile == 'guess':
+            player.profiler = profiler
+            _playMoves(game, player, result)
+        else:
+            profiler.profile('game', _playMoves, game, player, result)
+        result.stacks = profiler.stacks
+    result.stats = player.stats.asDict()
+    result.cacheHits = componentCache.hits - hits
+    result.cacheMisses = componentCache.misses - misses
+
+    if game.victory is True:
+        result.outcome = WIN
+    elif game.victory is False:
+        result.outcome = LOSS
+    if record:
+        result.record.finish(game, result.outcome)
+    return result
+
+def _playMoves(game, player, result):
+    """
+    Plays a game to the end (or the move limit), timing it in result.
+    """
+    phases = result.phases
+    record = result.record
+    moveLimit = MOVE_LIMIT * game.tileCount
+
+    start = time.perf_counter()
+    while game.victory is None and result.moves < moveLimit:
+        guessed = len(player.queue) == 0
+        if guessed:
+            before = time.perf_counter()
+            try:
+                player.profiledGuess(time.time() + player.watchdog)
+                player.validateQueue()
+            except solver.SolverError as e:
+                logging.warning("Seed {}: {}".format(result.seed, e))
+                result.outcome = ERROR
+                break
+            elapsed = time.perf_counter() - before
+            phases['guess'] += elapsed
+            result.guessTimes.append(elapsed)
+            result.queueDepths.append(len(player.queue))
+            if player.completeness < 1.0:
+                result.incomplete += 1
+
+        before = time.perf_counter()
+        move = player.queue.popleft()
+        if record is not None:
+            record.addMove(move.getAction(), *move.getTile(), guessed = guessed)
+        makeMove(game, player, move)
+        result.moves += 1
+        after = time.perf_counter()
+        phases['move'] += after - before
+
+        player.observe(move)
+        phases['observe'] += time.perf_counter() - after
+    result.seconds = time.perf_counter() - start
+    return
+
+def makeMove(game, player, move):
+    """
+    Makes a move from the player's queue on the board.
+    """
+    if move.getAction() == 'click':
+        game.primaryClick(*move.getTile())
+    elif move.getAction() == 'flag':
+        if not player.isFlag(*move.getTile()):
+            game.secondaryClick(*move.getTile())
+    elif move.getAction() == 'double':
+        game.doubleClick(*move.getTile())
+    return
+
+def _playGame(args):
+    """
+    playGame() for Pool.imap_unordered, which only passes one argument.
+    Sends back the game's events along with its result.
+    """
+    result = playGame(*args)
+    if _eventBuffer is not None:
+        result.events = _eventBuffer.drain()
+    return result
+
+# the sink for a worker's events, if they're being kept.
+_eventBuffer = None
+
+def _initWorker(eventRate = None, cachePath = None):
+    """
+    Quiets the solver's logging in a worker process: it logs every random
+    guess, which would swamp the report. If eventRate is given, keeps that
+    share of the solver's events, to be sent back with each game. If
+    cachePath is given, the worker keeps its component counts in that
+    cache file (see cache.SQLiteCache), where every other worker, and every
+    later run, can find them.
+    """
+    global _eventBuffer
+    logging.getLogger().setLevel(logging.WARNING)
+    if eventRate is not None:
+        _eventBuffer = events.attach(events.BufferSink(), eventRate)
+    if cachePath is not None:
+        cache.setDefaultCache(cache.SQLiteCache(cachePath))
+    return
+
+class Tally(object):
+    """
+    Adds up GameResults one at a time, as they come in. If it's given a
+    metrics.Registry, it keeps live metrics of the run there as well (see
+    LiveMetrics).
+    """
+    def __init__(self, registry = None):
+        self.games = 0
+        self.outcomes = dict.fromkeys((WIN, LOSS, UNFINISHED, ERROR), 0)
+        self.moves = 0
+        self.incomplete = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        # the solvers' instrumentation, added up over every game.
+        self.stats = {}
+        # the profiled stacks, added up over every game.
+        self.stacks = {}
+        self.started = time.perf_counter()
+        self.metrics = None
+        if registry is not None:
+            self.metrics = LiveMetrics(registry)
+        return
+
+    def add(self, result):
+        self.games += 1
+        self.outcomes[result.outcome] += 1
+        self.moves += result.moves
+        self.incomplete += result.incomplete
+        for (phase, seconds) in result.phases.items():
+            self.phases[phase] += seconds
+        instrument.merge(self.stats, result.stats)
+        if result.stacks:
+            profiling.merge(self.stacks, result.stacks)
+        if self.metrics is not None:
+            self.metrics.add(self, result)
+        return
+
+    def gamesPerSecond(self):
+        """
+        How many games have been finished per second of wall-clock time,
+        across every process.
+        """
+        elapsed = time.perf_counter() - self.started
+        if elapsed == 0:
+            return 0.0
+        return self.games / elapsed
+
+    def winRate(self):
+        """
+        Returns the fraction of games won, with the low and high ends of its
+        95% confidence interval (a Wilson score interval, which behaves
+        itself for a handful of games or a win rate near 0 or 1).
+        """
+        n = self.games
+        if n == 0:
+            return (0.0, 0.0, 1.0)
+        p = self.outcomes[WIN] / n
+        z2 = Z_95 ** 2
+        middle = (p + z2 / (2 * n)) / (1 + z2 / n)
+        spread = Z_95 * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+        return (p, max(middle - spread, 0.0), min(middle + spread, 1.0))
+
+    def report(self):
+        """
+        Returns a summary of everything so far, as a list of lines.
+        """
+        (rate, low, high) = self.winRate()
+        lines = [
+            "Games:\t{}".format(self.games),
+            "Won:\t{}".format(self.outcomes[WIN]),
+            "Lost:\t{}".format(self.outcomes[LOSS]),
+            "Win pct:\t{:.1%} (95% CI {:.1%} to {:.1%})".format(rate, low, high),
+            "Games/s:\t{:.2f}".format(self.gamesPerSecond()),
+        ]
+        if self.outcomes[UNFINISHED] or self.outcomes[ERROR]:
+            lines.append("Unfinished:\t{}\tErrors:\t{}".format(
+                self.outcomes[UNFINISHED], self.outcomes[ERROR]))
+        if self.games:
+            lines.append("Moves/game:\t{:.1f}".format(self.moves / self.games))
+            lines.append("Unfinished analyses/game:\t{:.2f}".format(
+                self.incomplete / self.games))
+            for phase in PHASES:
+                lines.append("{} ms/game:\t{:.2f}".format(phase.capitalize(),
+                    1000 * self.phases[phase] / self.games))
+        return lines
+
+class LiveMetrics(object):
+    """
+    The metrics of a run, in a metrics.Registry, updated as each game comes
+    in: games by outcome, the win rate and games per second, how long each
+    guess took and how many moves it queued, the component cache's and the
+    pattern table's hits and misses, and how many games are still to come.
+    """
+    def __init__(self, registry):
+        self.games = registry.counter('minesweeper_games_total',
+            "Games finished, by outcome.")
+        self.moves = registry.counter('minesweeper_moves_total',
+            "Moves made.")
+        self.winRate = registry.gauge('minesweeper_win_rate',
+            "The fraction of games won so far.")
+        self.gamesPerSecond = registry.gauge('minesweeper_games_per_second',
+            "Games finished per second since the run started.")
+        self.pending = registry.gauge('minesweeper_games_pending',
+            "Games handed to the pool that haven't finished yet.")
+        self.guessTime = registry.histogram('minesweeper_guess_seconds',
+            "How long each call to the solver's guess() took.",
+            metrics.LATENCY_BUCKETS)
+        self.queueDepth = registry.histogram('minesweeper_queue_depth',
+            "How many moves each call to the solver's guess() queued.",
+            metrics.DEPTH_BUCKETS)
+        self.cacheLookups = registry.counter('minesweeper_cache_lookups_total',
+            "Lookups in the component cache, by result.")
+        self.patternLookups = registry.counter(
+            'minesweeper_pattern_lookups_total',
+            "Lookups in the pattern table, by result.")
+        self.cacheHitRate = registry.gauge('minesweeper_cache_hit_rate',
+            "The fraction of lookups that hit, by cache.")
+        self.lookups = {'component': [0, 0], 'pattern': [0, 0]}
+        return
+
+    def add(self, tally, result):
+        self.games.inc(outcome = result.outcome)
+        self.moves.inc(result.moves)
+        self.winRate.set(tally.winRate()[0])
+        self.gamesPerSecond.set(tally.gamesPerSecond())
+        self.pending.inc(-1)
+        for seconds in result.guessTimes:
+            self.guessTime.observe(seconds)
+        for depth in result.queueDepths:
+            self.queueDepth.observe(depth)
+
+        counters = result.stats['counters'] if result.stats else {}
+        self._lookups('component', self.cacheLookups, result.cacheHits,
+            result.cacheMisses)
+        self._lookups('pattern', self.patternLookups,
+            counters.get('windowsLookedUp', 0),
+            counters.get('windowsWorkedOut', 0))
+        return
+
+    def submitted(self, games):
+        """
+        Counts games handed to the pool, so the ones still to come are known.
+        """
+        self.pending.inc(games)
+        return
+
+    def _lookups(self, name, counter, hits, misses):
+        counter.inc(hits, result = 'hit')
+        counter.inc(misses, result = 'miss')
+        lookups = self.lookups[name]
+        lookups[0] += hits
+        lookups[1] += misses
+        if lookups[0] + lookups[1]:
+            self.cacheHitRate.set(lookups[0] / (lookups[0] + lookups[1]),
+                cache = name)
+        return
+
+def simulate(games, solverName = 'advanced', level = LEVELS['expert'],
+        seed = 0, processes = None, tally = None, progress = None,
+        profile = None, threshold = 0.0, eventPath = None,
+        eventRate = EVENT_RATE, recordPath = None, cachePath = None):
+    """
+    Plays games with seeds seed, seed + 1, ... across a pool of processes
+    (one per CPU unless processes is given) and returns the Tally. Pass in a
+    Tally to keep hold of the results if the run is interrupted. If progress
+    is given, it's called with the Tally after every game. profile and
+    threshold are passed on to playGame(). If eventPath is given, the
+    solvers' events (see events.py) are written there as JSON lines, keeping
+    eventRate of them. If recordPath is given, every game is appended to
+    that record file (see recording.py). If cachePath is given, the workers
+    share their component counts through that cache file.
+    """
+    if tally is None:
+        tally = Tally()
+    if tally.metrics is not None:
+        tally.metrics.submitted(games)
+    jobs = ((solverName, level, seed + n, profile, threshold,
+        recordPath is not None) for n in range(games))
+    # the workers send their events back with each game, and they're all
+    # written to the one file here.
+    sink = None
+    if eventPath is not None:
+        sink = events.JSONLinesSink(eventPath)
+    else:
+        eventRate = None
+    writer = None
+    if recordPath is not None:
+        writer = recording.RecordWriter(recordPath)
+    try:
+        with multiprocessing.Pool(processes, _initWorker,
+                (eventRate, cachePath)) as pool:
+            for result in pool.imap_unordered(_playGame, jobs, CHUNK_SIZE):
+                tally.add(result)
+                if sink is not None:
+                    for entry in result.events:
+                        sink.write(entry)
+                if writer is not None:
+                    writer.write(result.record)
+                if progress is not None:
+                    progress(tally)
+    finally:
+        if sink is not None:
+            sink.close()
+        if writer is not None:
+            writer.close()
+    return tally
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split('\n\n')[1])
+    parser.add_argument('--games', type = int, default = 100,
+        help = "how many games to play")
+    parser.add_argument('--solver', choices = SOLVERS, default = 'advanced')
+    parser.add_argument('--level', choices = LEVELS, default = 'expert')
+    parser.add_argument('--seed', type = int, default = 0,
+        help = "the seed of the first game; the rest follow on from it")
+    parser.add_argument('--processes', type = int, default = None,
+        help = "how many processes to play in (default: one per CPU)")
+    parser.add_argument('--profile', metavar = 'PATH',
+        help = "profile the solver and save the stacks to this file, for a "
+            "flame graph")
+    parser.add_argument('--profile-scope', choices = PROFILE_SCOPES,
+        default = 'guess', help = "what to profile (default: guess)")
+    parser.add_argument('--profile-threshold', type = float, default = 0.0,
+        metavar = 'MS', help = "only keep calls that took at least this many "
+            "milliseconds")
+    parser.add_argument('--events', metavar = 'PATH',
+        help = "write the solver's events to this JSON lines file")
+    parser.add_argument('--event-rate', type = float, default = EVENT_RATE,
+        help = "the share of events to keep (default: {})".format(EVENT_RATE))
+    parser.add_argument('--stats',
+        help = "save the solver's instrumentation, over every game, to this "
+            "JSON file")
+    parser.add_argument('--record', metavar = 'PATH',
+        help = "append every game to this record file, to be replayed with "
+            "recording.py")
+    parser.add_argument('--cache', metavar = 'PATH',
+        help = "keep the component counts in this SQLite file, shared by "
+            "every worker and kept for the next run")
+    parser.add_argument('--metrics-port', type = int, metavar = 'PORT',
+        help = "serve live metrics, in the Prometheus text format, on this "
+            "port on localhost")
+    parser.add_argument('--metrics-file', metavar = 'PATH',
+        help = "rewrite this file with live metrics, in the Prometheus text "
+            "format, every few seconds")
+    parser.add_argument('--metrics-interval', type = float,
+        default = METRICS_INTERVAL, metavar = 'SECONDS',
+        help = "how often to rewrite the metrics file (default: {})".format(
+            METRICS_INTERVAL))
+    args = parser.parse_args()
+
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
+    registry = None
+    outputs = []
+    if args.metrics_port is not None or args.metrics_file:
+        registry = metrics.Registry()
+    if args.metrics_port is not None:
+        outputs.append(metrics.MetricsServer(registry, args.metrics_port))
+        logging.info("Serving metrics on http://127.0.0.1:{}/metrics".format(
+            outputs[-1].port))
+    if args.metrics_file:
+        outputs.append(metrics.MetricsFile(registry, args.metrics_file,
+            args.metrics_interval))
+
+    def progress(tally):
+        if tally.games % REPORT_INTERVAL == 0:
+            logging.info("{} games, {:.1%} won".format(tally.games,
+                tally.winRate()[0]))
+        return
+
+    tally = Tally(registry)
+    try:
+        simulate(args.games, args.solver, LEVELS[args.level], args.seed,
+            args.processes, tally, progress,
+            args.profile_scope if args.profile else None,
+            args.profile_threshold / 1000, args.events, args.event_rate,
+            args.record, args.cache)
+    except KeyboardInterrupt:
+        logging.info("Interrupted")
+    finally:
+        for output in outputs:
+            output.close()
+    for line in tally.report():
+        logging.info(line)
+    for line in instrument.summarize(tally.stats):
+        logging.info(line)
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            for line in profiling.collapsedLines(tally.stacks):
+                f.write(line + '\n')
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(dict(tally.stats, games = tally.games), f, indent = 1)
+    return
+
+if __name__ == "__main__":
+    main()
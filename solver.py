@@ -7,18 +7,24 @@ This edition re-writes and re-factors some of the code.
 Author: Evan Greene
 Date: 2022-02-28
 """
-import board
+import events
+import frontier
+import instrument
+import patterns
+import probability
+import propagation
 import random
+import recording
 import threading
+import zobrist
+from array import array
 from collections import deque
 import time
-from itertools import combinations
 
 import logging
-# if __name__ == "__main__":
-    # if we're importing this in another module, don't configure the logging.
-    # that way it won't actually do any logging.
-logging.basicConfig(format = "%(message)s", level = logging.INFO)
+# the logging is only configured when this is run as a script (see main()),
+# so that importing it doesn't.
+logger = logging.getLogger(__name__)
 
 # timer strategies
 INSTANT = 0
@@ -28,6 +34,19 @@ USER_INPUT = 3
 
 # don't make guesses as fast as the computer can, use a timer.
 MOVE_TIME = 0.5
+# the longest a single call to guess() should take to come up with a move.
+WATCHDOG_TIME = 0.2
+
+# a tile's good combinations depend on the numbers up to two tiles away, and
+# on the suspicious tiles next to those numbers. So a change to any tile
+# within this many tiles can change them.
+REGION_RADIUS = 3
+
+# what the solver last saw a tile as.
+TILE_UNSEEN = 0
+TILE_COVERED = 1
+TILE_FLAG = 2
+TILE_UNCOVERED = 3
 
 class Solver(object):
     """
@@ -40,10 +59,20 @@ class Solver(object):
 
     repeat = True
     timing = SLOW_MOVE
+    watchdog = WATCHDOG_TIME
+    # set to a profiling.SamplingProfiler to profile every call to guess().
+    profiler = None
+    # set to a recording.RecordWriter to record every game.
+    recorder = None
 
     def __init__(self, game):
         self.board = game
         self.queue = SolverQueue([])
+        # how much of the analysis behind the last guess was finished before
+        # the deadline. 1.0 means the guess was as good as the solver can do.
+        self.completeness = 1.0
+        # where the solver's time goes, phase by phase (see instrument.py).
+        self.stats = instrument.SolverStats(self)
         # create a separate thread to call the solve() function.
         self.solverThread = threading.Thread(target = self.solve, name = 'solver')
         self.solverThread.daemon = True
@@ -77,15 +106,20 @@ class Solver(object):
         """
         while True:
             self.victory = None
+            record = None
+            if self.recorder is not None:
+                record = recording.GameRecord(self.board.rows, self.board.cols,
+                    self.board.mines, solver = recording.solverName(self))
             while self.victory is None:
 
                 # start the timer.
                 startTime = time.time()
                 stopTime = startTime + MOVE_TIME
 
-                if len(self.queue) == 0:
+                guessed = len(self.queue) == 0
+                if guessed:
                     try:
-                        self.guess()
+                        self.profiledGuess(startTime + self.watchdog)
                         self.validateQueue()
                     except SolverError as e:
                         # try to fail cleanly.
@@ -96,6 +130,9 @@ class Solver(object):
                         waitUntil(stopTime)
 
                 nextGuess = self.queue.popleft()
+                if record is not None:
+                    record.addMove(nextGuess.getAction(), *nextGuess.getTile(),
+                        guessed = guessed)
                 if nextGuess.getAction() == 'click':
                     self.board.primaryClick(*nextGuess.getTile())
                 elif nextGuess.getAction() == 'flag':
@@ -103,6 +140,7 @@ class Solver(object):
                         self.board.secondaryClick(*nextGuess.getTile())
                 elif nextGuess.getAction() == 'double':
                     self.board.doubleClick(*nextGuess.getTile())
+                self.observe(nextGuess)
 
                 self.victory = self.board.victory
 
@@ -113,6 +151,9 @@ class Solver(object):
                     while self.board.hold:
                         time.sleep(0.01)
             # end while self.victory is None
+            if record is not None:
+                record.finish(self.board)
+                self.recorder.write(record)
 
             # once the game is complete (victory or failure), check the
             # loopForever variable
@@ -136,13 +177,13 @@ class Solver(object):
         return
     # end def solve
 
-    def guess(self):
+    def guess(self, deadline = None):
         """
         This is a template function. It guesses at random from among all the
         tiles that are covered.
 
-        Takes no input and returns None; only the self.queue variable will
-        be modified.
+        Takes the time (as given by time.time()) by which a move is needed and
+        returns None; only the self.queue variable will be modified.
 
         Implementations of actual solvers will overwrite
         """
@@ -155,6 +196,24 @@ class Solver(object):
                 self.queue.add(guessRow, guessCol, 'click')
                 return
 
+    def profiledGuess(self, deadline = None):
+        """
+        Calls guess(), under self.profiler if there is one.
+        """
+        if self.profiler is None:
+            self.guess(deadline)
+        else:
+            self.profiler.profile('guess', self.guess, deadline)
+        return
+
+    def observe(self, move):
+        """
+        Called after every move is made, with the QueueItem for it. This is a
+        template function; solvers that keep track of the board as it changes
+        can overwrite it.
+        """
+        return
+
     def user_guess(self):
         """
         gets a guess from the user
@@ -218,7 +277,6 @@ class Solver(object):
         """
         Utility function to pick a tile from the board at random
         """
-        random.seed()
         guessPos = random.randint(0, self.board.tileCount - 1)
         guessRow = guessPos // self.board.cols
         guessCol = guessPos % self.board.cols
@@ -270,28 +328,56 @@ class BasicSolver(Solver):
         """
         super().__init__(game)
 
-        logging.info("Initialized solver")
+        logger.info("Initialized solver")
         self.grid = SolverGrid(game)
+        self.propagator = propagation.Propagator(self)
         return
 
-    def guess(self):
+    def observe(self, move):
+        """
+        Tells the propagator about the move, and queues up any moves that
+        follow from it, so that guess() only has to look at the whole board
+        once the easy moves run out. Also keeps the grid's hash of the
+        position up to date with whatever the move changed.
+        """
+        if events.sample():
+            events.emit('move', tile = move.getTile(), action = move.getAction(),
+                rule = move.source)
+        # once the game is over there's nothing left to work out.
+        if self.board.victory is not None:
+            return
+        with self.stats.phase('propagate'):
+            if move.getAction() == 'flag':
+                if self.isFlag(*move.getTile()):
+                    self.grid.setVisible(*move.getTile(), zobrist.FLAG)
+                self.propagator.flag(*move.getTile())
+            else:
+                for (i, j) in self.propagator.reveal(*move.getTile()):
+                    self.grid.setVisible(i, j, zobrist.NUMBER + self.getNumber(i, j))
+            self.propagator.propagate()
+        return
+
+    def guess(self, deadline = None):
         """
         Applies two basic rules then guesses if that's unsuccessful
         """
         if self.board.firstClick:
-            self.queue.add(*self.pickRandom(), 'click')
+            with self.stats.phase('firstClick'):
+                self.queue.add(*self.pickRandom(), 'click')
             return
 
         # gather the basic info for each tile needed to make a decision.
-        self.gatherTileInfo()
+        with self.stats.phase('gatherTileInfo'):
+            self.gatherTileInfo()
 
-        self.guessWithBasicRules()
+        with self.stats.phase('guessWithBasicRules'):
+            self.guessWithBasicRules()
 
         if len(self.queue):
             return
 
-        self.guessAtRandom()
-        logging.info("Guessed {} at random".format(self.queue[0].getTile()))
+        with self.stats.phase('guessAtRandom'):
+            self.guessAtRandom()
         return
 
     def guessWithBasicRules(self):
@@ -301,35 +387,85 @@ class BasicSolver(Solver):
         covered tiles around it, flag all of them as bombs.
         2. If the number on an uncovered tile is equal to the number of flags
         nearby, click on all the remaining uncovered tiles, if any.
+        Every move the rules give is queued at once, so the whole board only
+        has to be looked at once per batch of moves. The flags from rule 1
+        count towards rule 2, since they'll be placed before any chords.
         """
+        grid = self.grid
+        flags = set()
         for i in range(self.board.rows):
             for j in range(self.board.cols):
-                tile = self.grid[i, j]
+                k = grid.index(i, j)
                 # if a tile has been marked as clear, it's because there is
                 # nothing interesting to find here.
-                if tile.clear:
+                if grid.clear[k]:
                     continue
                 if self.isCovered(i, j):
                     continue
-                # if the number of neighbor flags is equal to the number of the tile,
-                # we can double-click the tile
-                if self.getNumber(i, j) == tile.nearbyFlags:
-                    # don't bother if there are no neighbors to flag
-                    if tile.nearbyCovered > tile.nearbyFlags:
-                        self.queue.add(i, j, 'double')
-                        return
                 # if the nearby covered tiles is equal to the number of the tile
                 # flag all the tiles that aren't already flagged.
-                elif self.getNumber(i, j) == tile.nearbyCovered:
-                    for neighbor in tile.neighbors:
+                if self.getNumber(i, j) == grid.nearbyCovered[k]:
+                    for neighbor in grid.neighbors(i, j):
                         if self.isCovered(*neighbor):
                             if not self.isFlag(*neighbor):
-                                self.queue.add(*neighbor, 'flag')
+                                flags.add(neighbor)
                 # if there are too few uncovered tiles to meet the number of mines,
                 # that's an error.
-                elif self.getNumber(i, j) < tile.nearbyFlags:
+                elif self.getNumber(i, j) < grid.nearbyFlags[k]:
                     message = "Error near tile {}: too many flags.".format((i, j))
                     raise SolverError(message)
+
+        # second time around, find every tile we can double-click, counting
+        # the flags we're about to place.
+        chords = {}
+        for i in range(self.board.rows):
+            for j in range(self.board.cols):
+                k = grid.index(i, j)
+                if grid.clear[k]:
+                    continue
+                if self.isCovered(i, j):
+                    continue
+                pending = 0
+                opens = set()
+                for neighbor in grid.neighbors(i, j):
+                    if neighbor in flags:
+                        pending += 1
+                    elif self.isCovered(*neighbor) and not self.isFlag(*neighbor):
+                        opens.add(neighbor)
+                # don't bother if there are no neighbors to click
+                if opens and self.getNumber(i, j) == grid.nearbyFlags[k] + pending:
+                    chords[(i, j)] = opens
+
+        self.queueMoves(flags = flags, chords = chords)
+        return
+
+    def queueMoves(self, flags = (), clicks = (), chords = None):
+        """
+        Queues a batch of moves that are all known to be safe.
+        -- flags: tiles to flag
+        -- clicks: tiles to click
+        -- chords: a dictionary of tiles to double-click -> the set of covered
+            tiles each double-click would open
+        The flags go first, because the double-clicks might count on them.
+        Neighboring numbers often open the same tiles, so the double-clicks
+        that open the most go first, and any double-click or click that would
+        only open tiles that are already being opened is left out.
+        """
+        for mine in sorted(flags):
+            self.queue.add(*mine, 'flag')
+
+        opened = set()
+        if chords:
+            order = sorted(chords, key = lambda tile: (-len(chords[tile]), tile))
+            for tile in order:
+                if chords[tile] <= opened:
+                    continue
+                opened |= chords[tile]
+                self.queue.add(*tile, 'double')
+
+        for clearTile in sorted(clicks):
+            if clearTile not in opened:
+                self.queue.add(*clearTile, 'click')
         return
 
     def guessAtRandom(self):
@@ -341,8 +477,7 @@ class BasicSolver(Solver):
         guessableTiles = []
         for i in range(self.board.rows):
             for j in range(self.board.cols):
-                tile = self.grid[i, j]
-                if tile.clear:
+                if self.grid.clear[self.grid.index(i, j)]:
                     continue
                 # do not guess any tiles that are already uncovered
                 if not self.isCovered(i, j):
@@ -353,7 +488,7 @@ class BasicSolver(Solver):
 
                 # if the covered tile has at least one uncovered tile
                 # then it becomes guessable.
-                for neighbor in tile.neighbors:
+                for neighbor in self.grid.neighbors(i, j):
                     if not self.isCovered(*neighbor):
                         guessableTiles.append((i, j))
                         break
@@ -372,6 +507,9 @@ class BasicSolver(Solver):
 
         randomTile = random.choice(guessableTiles)
         self.queue.add(*randomTile, 'click')
+        logger.info("Guessed %s at random", randomTile)
+        if events.sample():
+            events.emit('risk', tile = randomTile, probability = None)
         return
 
     def gatherTileInfo(self):
@@ -379,39 +517,38 @@ class BasicSolver(Solver):
         Finds the following data for a given tile.
         -- Number of nearby flagged tiles
         -- Number of nearby covered tiles
-        -- A list of the tile's neighbors
         -- Whether the tile should be marked clear
             (no covered, unflagged neighbor tiles)
         """
-        for i in range(self.grid.rows):
-            for j in range(self.grid.cols):
-                tile = self.grid[i, j]
+        grid = self.grid
+        for i in range(grid.rows):
+            for j in range(grid.cols):
+                k = grid.index(i, j)
 
-                if tile.clear:
+                if grid.clear[k]:
                     continue
 
-                if tile.neighbors is None:
-                    tile.neighbors = self.getNeighbors(i, j)
-
                 if self.isCovered(i, j):
                     continue
 
                 # count the nearby flagged tiles
                 # count the nearby covered tiles.
-                tile.nearbyCovered = 0
-                tile.nearbyFlags = 0
-                for ni, nj in tile.neighbors:
+                nearbyCovered = 0
+                nearbyFlags = 0
+                for ni, nj in grid.neighbors(i, j):
                     if self.isCovered(ni, nj):
-                        tile.nearbyCovered += 1
+                        nearbyCovered += 1
                         if self.isFlag(ni, nj):
-                            tile.nearbyFlags += 1
+                            nearbyFlags += 1
+                grid.nearbyCovered[k] = nearbyCovered
+                grid.nearbyFlags[k] = nearbyFlags
                 # check if the tile should be clear.
-                if tile.nearbyCovered == tile.nearbyFlags:
-                    if tile.nearbyCovered == self.getNumber(i, j):
-                        tile.clearTile()
+                if nearbyCovered == nearbyFlags:
+                    if nearbyCovered == self.getNumber(i, j):
+                        grid.clear[k] = True
                     else:
                         message = "Tile {} was has {} flags nearby. ".format(
-                            (i, j), tile.nearbyFlags)
+                            (i, j), nearbyFlags)
                         raise SolverError(message)
 
         return
@@ -420,8 +557,9 @@ class BasicSolver(Solver):
         """
         Deletes all the stored information about the state of the board.
         """
-        self.grid = SolverGrid(self.board)
+        self.grid.reset()
         self.queue = SolverQueue([])
+        self.propagator.reset()
 
 class AdvancedSolver(BasicSolver):
     """
@@ -430,7 +568,15 @@ class AdvancedSolver(BasicSolver):
     which tiles near a given uncovered tiles can be bombs.
     """
 
-    def guess(self):
+    def __init__(self, game):
+        """
+        Extend the constructor to load the table of common local patterns.
+        """
+        super().__init__(game)
+        self.patterns = patterns.defaultTable()
+        return
+
+    def guess(self, deadline = None):
         """
         Applies two rules
         -- If the number on a tile is equal to the number of covered tiles
@@ -454,84 +600,178 @@ class AdvancedSolver(BasicSolver):
         -- Once every combination has been analyzed, flag all the tiles that
             have 100% suspicion, and clear all the tiles that have 0% suspicion
         -- If that fails, clear the tile with the lowest suspicion.
+        The counting stops at the deadline (or after WATCHDOG_TIME if no
+        deadline is given), in which case the suspicions are estimated by
+        sampling and self.completeness records how much was counted exactly.
         """
+        start = time.time()
+        if deadline is None:
+            deadline = start + self.watchdog
+        self.completeness = 1.0
+
         if self.board.firstClick:
-            self.queue.add(*self.pickRandom(), 'click')
+            with self.stats.phase('firstClick'):
+                self.queue.add(*self.pickRandom(), 'click')
             return
 
         # gather the basic info for each tile needed to make a decision.
         # use a simple formula to make a guess
-        self.gatherNeighborInfo()
-        self.guessWithBasicRules()
+        with self.stats.phase('gatherNeighborInfo'):
+            self.gatherNeighborInfo()
+        with self.stats.phase('guessWithBasicRules'):
+            self.guessWithBasicRules()
 
         if len(self.queue):
             return
 
-        # use a more complicated formula to make a guess
-        self.gatherSecondNeighborInfo()
-        self.advancedGuess()
+        # nothing changes on the board until a move is queued, so the
+        # frontier is gathered once for every method that needs it.
+        with self.stats.phase('gatherFrontier'):
+            border = self.gatherFrontier()
 
-        # finally, use the very computationally-intense method to make a guess
-        # IDEA: put this in another thread and use a watchdog to kill it after
-        # it runs for too long.
-        self.calculateSuspicions()
-        self.guessFromSuspicions()
+        # compare the numbers that share suspicious tiles.
+        with self.stats.phase('guessWithSubsets'):
+            self.guessWithSubsets(border)
 
         if len(self.queue):
             return
 
-        leastSuspiciousTile = None
-        lowestSuspicion = 0
-        for i in range(self.grid.rows):
-            for j in range(self.grid.rows):
-                tile = self.grid[i][j]
-                if tile.suspicion == 0:
-                    self.queue.add(i, j, 'click')
-                elif tile.suspicion == self.comboCounter:
-                    self.queue.add(i, j, 'flag')
-                else:
-                    leastSuspicousTile = (i, j)
-                    lowestSuspicion = tile.suspicion
+        # then look at all the numbers together as a system of equations.
+        with self.stats.phase('guessWithAlgebra'):
+            self.guessWithAlgebra(border)
+
+        if len(self.queue):
+            return
 
-        if len(self.queue) == 0:
-            self.queue.add(*leastSuspicousTile, 'click')
+        # use a more complicated formula to make a guess
+        with self.stats.phase('gatherSecondNeighborInfo'):
+            self.gatherSecondNeighborInfo()
+        with self.stats.phase('advancedGuess'):
+            self.advancedGuess()
+
+        if len(self.queue):
+            return
+
+        # finally, use the very computationally-intense method to make a guess
+        # it only runs until the deadline, so the guess may be based on an
+        # estimate. The scans so far weren't bounded, and turning the counts
+        # into a guess takes about as long again, so that time comes off
+        # what the counting gets.
+        spent = time.time() - start
+        with self.stats.phase('calculateSuspicions'):
+            self.calculateSuspicions(deadline - spent, border)
+        with self.stats.phase('guessFromSuspicions'):
+            self.guessFromSuspicions()
+
+        if len(self.queue):
             return
 
-        self.guessAtRandom()
-        logging.info("Guessed {} at random".format(self.queue[0].getTile()))
+        with self.stats.phase('guessAtRandom'):
+            self.guessAtRandom()
         return
 
     def advancedGuess(self):
+        """
+        Flags every tile that is a mine in all of a tile's good combinations,
+        and clicks every tile that is a mine in none of them.
+        """
+        mines = set()
+        clicks = set()
         for i in range(self.board.rows):
             for j in range(self.board.cols):
-                tile = self.grid[i, j]
-
-                # look for tiles in every good combination and in no
-                # good combination.
-                definitelyMines = tile.suspiciousNeighbors
-                definitelyClear = tile.suspiciousNeighbors
-
-                for combo in tile.goodCombos:
-                    # Any tile not in the current combo is not definitely a mine
-                    definitelyMines.intersection_update(combo)
-                    # definitelyMines &= combo
-                    # remove any tile in the current combo from inNoCombo
-                    definitelyClear.difference_update(combo)
-                    # definitelyClear -= combo
-                    # this might speed things up a bit.
-                    if len(inEveryCombo) == 0 and len(inNoCombo) == 0:
-                        break
+                k = self.grid.index(i, j)
+
+                if self.grid.clear[k]:
+                    continue
+                if self.isCovered(i, j):
+                    continue
+
+                # the tiles in every good combination and in no good
+                # combination, as local masks.
+                definitelyMines = self.grid.forcedMines[k]
+                definitelyClear = self.grid.forcedClear[k]
 
-                # checking that the sets are empty is actually unnecessary
-                # if they are empty the for loop won't do anything.
-                for mine in definitelyMines:
-                    self.queue.add(*mine, 'flag')
+                # checking that the masks are empty is actually unnecessary
+                # if they are empty there's nothing to add.
+                mines.update(frontier.localCells(i, j, definitelyMines))
+                clicks.update(frontier.localCells(i, j, definitelyClear))
+
+        self.queueMoves(flags = mines, clicks = clicks)
+        return
 
-                for clearTile in definitelyClear:
-                    self.queue.add(*clearTile, 'click')
+    def guessWithSubsets(self, border = None):
+        """
+        Flags and clicks the tiles that follow from comparing two numbers
+        whose suspicious tiles overlap, like the 1-1 and 1-2 patterns.
+        Uses border as the frontier if it's given, or gathers it.
+        """
+        if border is None:
+            border = self.gatherFrontier()
+        (mines, safe) = border.compareConstraints()
+        self.queueMoves(flags = mines, clicks = safe)
+        return
+
+    def guessWithAlgebra(self, border = None):
+        """
+        Flags and clicks the tiles whose values are forced once the numbers
+        are written as linear equations and row-reduced. Catches chains of
+        deductions that run across many numbers.
+        Uses border as the frontier if it's given, or gathers it.
+        """
+        if border is None:
+            border = self.gatherFrontier()
+        (mines, safe) = border.reduceConstraints()
+        self.queueMoves(flags = mines, clicks = safe)
+        return
 
     def guessFromSuspicions(self):
-        self.guessAtRandom()
+        """
+        Flags every tile that is certainly a mine and clicks every tile that
+        is certainly safe. If there aren't any, clicks the least suspicious
+        tile, which might be a tile away from the frontier.
+        Estimated suspicions are never treated as certain.
+        """
+        suspicions = self.suspicions
+        if self.completeness == 1.0:
+            # go by the exact counts rather than the suspicions, which are
+            # floats, and on a big board can round to 0 or 1 without being
+            # certain.
+            clicks = [tile for tile in suspicions if tile in self.certainSafe]
+            mines = [tile for tile in suspicions if tile in self.certainMines]
+            self.queueMoves(flags = mines, clicks = clicks)
+            if len(self.queue):
+                return
+
+        if len(suspicions) == 0:
+            return
+
+        leastSuspiciousTile = min(suspicions, key = suspicions.get)
+        lowestSuspicion = suspicions[leastSuspiciousTile]
+        # a tile off the frontier might be a safer bet.
+        if self.interiorSuspicion is not None:
+            if self.interiorSuspicion < lowestSuspicion:
+                interiorTiles = []
+                for i in range(self.board.rows):
+                    for j in range(self.board.cols):
+                        if not self.isCovered(i, j) or self.isFlag(i, j):
+                            continue
+                        if (i, j) not in suspicions:
+                            interiorTiles.append((i, j))
+                leastSuspiciousTile = random.choice(interiorTiles)
+                lowestSuspicion = self.interiorSuspicion
+        self.queue.add(*leastSuspiciousTile, 'click')
+        interval = self.intervals.get(leastSuspiciousTile)
+        if interval is not None:
+            logger.info("Guessed %s with suspicion %.1f%% +/- %.1f%%",
+                leastSuspiciousTile, 100 * lowestSuspicion, 100 * interval)
+        else:
+            logger.info("Guessed %s with suspicion %.1f%% (%.0f%% exact)",
+                leastSuspiciousTile, 100 * lowestSuspicion,
+                100 * self.completeness)
+        if events.sample():
+            events.emit('risk', tile = leastSuspiciousTile,
+                probability = lowestSuspicion, interval = interval,
+                completeness = self.completeness)
         return
 
     def gatherNeighborInfo(self):
@@ -539,160 +779,303 @@ class AdvancedSolver(BasicSolver):
         Finds the following data for every tile.
         -- Number of nearby flagged tiles
         -- Number of nearby covered tiles
-        -- A list of the tile's neighbors
-        -- A list of *suspicious* neighbors* (covered but not flagged)
+        -- The *suspicious* neighbors (covered but not flagged)
         -- Whether the tile should be marked clear (no suspicious neighbors)
         Also counts the number of flags on the board.
         """
+        grid = self.grid
         # start a counter for the flags on the board.
-        self.grid.flagCounter = 0
+        grid.flagCounter = 0
         for i in range(self.board.rows):
             for j in range(self.board.cols):
-                tile = self.grid[i][j]
-                if tile.clear:
+                k = grid.index(i, j)
+                if grid.clear[k]:
                     continue
 
-                if tile.neighbors is None:
-                    tile.neighbors = self.getNeighbors(i, j)
+                # let the tiles around this one know if it has changed since
+                # we last looked, so they can throw away what they've cached.
+                if not self.isCovered(i, j):
+                    state = TILE_UNCOVERED
+                elif self.isFlag(i, j):
+                    state = TILE_FLAG
+                else:
+                    state = TILE_COVERED
+                if grid.state[k] != state:
+                    # the first time a tile is seen, nothing around it has
+                    # been worked out yet, so there's nothing to throw away.
+                    if grid.state[k] != TILE_UNSEEN:
+                        grid.touch(i, j)
+                    grid.state[k] = state
 
                 if self.isCovered(i, j):
                     if self.isFlag(i, j):
-                        self.grid.flagCounter += 1
+                        grid.flagCounter += 1
                     continue
 
-
-                # the suspicious neighbors are a list of tiles that are
-                # both covered and not flagged. Will come in handly later.
-                tile.suspiciousNeighbors = set()
-                tile.nearbyCovered = 0
-                tile.nearbyFlags = 0
-                for neighbor in tile.neighbors:
+                # the suspicious neighbors are the tiles that are both
+                # covered and not flagged, kept as a local mask
+                # (see frontier.NEIGHBOR_OFFSETS). Will come in handly later.
+                suspiciousMask = 0
+                nearbyCovered = 0
+                nearbyFlags = 0
+                for neighbor in grid.neighbors(i, j):
                     if self.isCovered(*neighbor):
-                        tile.nearbyCovered += 1
+                        nearbyCovered += 1
                         if self.isFlag(*neighbor):
-                            tile.nearbyFlags += 1
+                            nearbyFlags += 1
                         else:
-                            tile.suspiciousNeighbors.add(neighbor)
-                if len(tile.suspiciousNeighbors) == 0:
-                    tile.clearTile()
+                            suspiciousMask |= frontier.NEIGHBOR_BITS[
+                                (neighbor[0] - i, neighbor[1] - j)]
+                grid.suspiciousMask[k] = suspiciousMask
+                grid.nearbyCovered[k] = nearbyCovered
+                grid.nearbyFlags[k] = nearbyFlags
+                if suspiciousMask == 0:
+                    grid.clear[k] = True
 
         return
 
     def gatherSecondNeighborInfo(self):
         """
         Calculates the following information for every tile
-        -- A list of the viable combinations of suspicious tiles.
+        -- The suspicious tiles that are a mine in every viable combination,
+            and the ones that are a mine in none, as a pair of local masks
+            (see frontier.NEIGHBOR_OFFSETS).
+        A combination is viable if it doesn't put too many or too few mines
+        near any of the numbers within two tiles. Common windows are looked
+        up in the pattern table (see patterns.py) instead of worked out.
+        The masks are only worked out again if something near the tile
+        has changed since the last time.
         """
-        # generate the list of suspicious neighbors
+        grid = self.grid
+        patternTable = self.patterns
+        (hits, misses, combos) = (patternTable.hits, patternTable.misses,
+            patternTable.combos)
         for i in range(self.board.rows):
             for j in range(self.board.cols):
-                tile = self.grid[i][j]
+                k = grid.index(i, j)
 
-                if tile.clear:
+                if grid.clear[k]:
                     continue
 
                 if self.isCovered(i, j):
                     continue
 
-                # create an iterator of all the combinations of mines.
-                missingMines = tile.nearbyCovered - tile.nearbyFlags
-                comboIterator = itertools.combinations(tile.suspiciousNeighbors, missingMines)
-
-                # create a list of good combinations.
-                tile.goodCombos = []
-
-                # create a list of all the second neighbors (neighbors of neighbors)
-                secondNeighbors = tile.neighbors
-                for neighbor in tile.neighbors:
-                    secondNeighbors.update(self.grid[neighbor].neighbors)
+                # nothing nearby has changed, so neither have the combos.
+                if grid.comboVersion[k] == grid.regionVersion[k]:
+                    continue
 
-                # iterate through all the combinations.
-                for combo in comboIterator:
-                    badCombo = False
-                    for neighbor in secondNeighbors:
+                # every combination decides all of the suspicious tiles near
+                # the tile in focus. For every other number within two tiles,
+                # work out how many of those it will accept as mines.
+                suspiciousMask = grid.suspiciousMask[k]
+                limits = []
+                for row in range(i - 2, i + 3):
+                    if row < 0 or row >= self.board.rows:
+                        continue
+                    for col in range(j - 2, j + 3):
+                        if col < 0 or col >= self.board.cols:
+                            continue
+                        if row == i and col == j:
+                            continue
                         # no real useful information from covered tiles.
-                        if self.isCovered(*neighbor):
+                        if self.isCovered(row, col):
+                            continue
+                        n = grid.index(row, col)
+                        # or from tiles with no suspicious neighbors.
+                        if grid.clear[n]:
+                            continue
+                        # the suspicious tiles the two have in common, in the
+                        # local mask of the tile in focus.
+                        neighborMask = grid.suspiciousMask[n]
+                        shared = frontier.MASK_SHIFTS[(row - i, col - j)][
+                            neighborMask] & suspiciousMask
+                        if shared == 0:
                             continue
-                        neighborTile = self.grid[neighbor]
                         # find the number of missing mines near this tile
                         # should not be zero.
-                        missingMines = neighborTile.nearbyCovered - neighborTile.nearbyFlags
-                        # the combo is a set of mines near the tile in focus.
-                        # check how many mines this combo puts near this neighbor
-                        minesNearNeighbor = neighborTile.suspiciousNeighbors.intersection(combo)
-                        # check how many mines are "missing" near the neighbor
-                        # if there are too many mines, this isn't a good combo.
-                        if len(minesNearNeighbor) > missingMines:
-                            break
-                        # check if this combo puts too *few* mines near a neighbor
-                        remainingSuspiciousNeighbors = neighborTile.suspiciousNeighbors - combo
-                        if len(remainingSuspiciousNeighbors) < missingMines - len(minesNearNeighbor):
-                            break
-                    else:
-                        tile.goodCombos.append(combo)
+                        missingMines = self.getNumber(row, col) - grid.nearbyFlags[n]
+                        # the combo can't put more than the missing mines near
+                        # the neighbor, and the neighbor's other suspicious
+                        # tiles have to be able to make up the rest.
+                        others = frontier.popcount(neighborMask) - frontier.popcount(shared)
+                        limits.append((shared, missingMines - others, missingMines))
+
+                # the common windows are in the pattern table, the rest are
+                # worked out from every way of placing the missing mines.
+                missingMines = self.getNumber(i, j) - grid.nearbyFlags[k]
+                (grid.forcedMines[k], grid.forcedClear[k]) = self.patterns.solve(
+                    suspiciousMask, missingMines, limits)
+                grid.comboVersion[k] = grid.regionVersion[k]
+        self.stats.count('windowsLookedUp', patternTable.hits - hits)
+        self.stats.count('windowsWorkedOut', patternTable.misses - misses)
+        self.stats.count('combosChecked', patternTable.combos - combos)
+        return
+
+    def calculateSuspicions(self, deadline = None, border = None):
+        """
+        Calculates the probability that each suspicious tile is a mine,
+        counting arrangements exactly until the deadline and sampling after.
+        Uses border as the frontier if it's given, or gathers it.
+        -- self.suspicions: a dictionary of (row, col) -> probability
+        -- self.interiorSuspicion: the probability for any covered tile that
+            isn't next to a number (None if there are no such tiles)
+        -- self.completeness: how much of the frontier was counted exactly
+        -- self.intervals: a dictionary of (row, col) -> half-width of the 95%
+            confidence interval, for the suspicions that had to be sampled
+        -- self.certainMines, self.certainSafe: the tiles that are a mine (or
+            safe) in every arrangement, when everything was counted exactly
+        """
+        if border is None:
+            border = self.gatherFrontier()
+        engine = probability.ProbabilityEngine(border)
+        engine.solve(deadline)
+        self.stats.count('frontierTiles', len(border))
+        self.stats.peak('frontierTiles', len(border))
+        self.stats.count('searchNodes', engine.nodes)
+        self.stats.count('samples', engine.samples)
+
+        self.suspicions = engine.probabilities
+        self.interiorSuspicion = engine.interiorProbability
+        self.completeness = engine.completeness
+        self.intervals = engine.intervals
+        self.certainMines = engine.certainMines
+        self.certainSafe = engine.certainSafe
+        for ((i, j), suspicion) in self.suspicions.items():
+            self.grid.suspicion[self.grid.index(i, j)] = suspicion
+        return
 
-    def calculateSuspicions(self):
+    def gatherFrontier(self):
         """
-        Calculates a suspicion value associated with each tile
+        Collects what the numbers on the board say about the covered tiles
+        into a frontier.Frontier. Relies on gatherNeighborInfo() having
+        been called first.
         """
-        pass
+        grid = self.grid
+        constraints = []
+        suspiciousTiles = set()
+        for i in range(self.board.rows):
+            for j in range(self.board.cols):
+                k = grid.index(i, j)
+                if grid.clear[k]:
+                    continue
+                if self.isCovered(i, j):
+                    continue
+                suspiciousNeighbors = frontier.localCells(i, j,
+                    grid.suspiciousMask[k])
+                constraints.append((suspiciousNeighbors,
+                    self.getNumber(i, j) - grid.nearbyFlags[k]))
+                suspiciousTiles.update(suspiciousNeighbors)
+
+        # every other covered, unflagged tile is in the interior.
+        covered = 0
+        for i in range(self.board.rows):
+            for j in range(self.board.cols):
+                if self.isCovered(i, j) and not self.isFlag(i, j):
+                    covered += 1
+        interior = covered - len(suspiciousTiles)
+        minesLeft = self.board.mines - self.grid.flagCounter
+        return frontier.Frontier(constraints, interior, minesLeft)
 
 class SolverGrid(object):
     """
-    A class to store and access the SolverTile object associated with all the
-    tiles on the board.
+    Everything the solver keeps track of about the tiles on the board.
+
+    Rather than an object per tile, every field is a typed array with one
+    entry per tile, row by row, so a big board costs a predictable amount of
+    memory and a new game can reuse the same arrays. grid.index(i, j) gives a
+    tile's position in the arrays.
+    -- clear: whether there's nothing more to learn from the tile
+    -- state: what the solver last saw the tile as (TILE_COVERED, etc.)
+    -- nearbyCovered, nearbyFlags: the covered and flagged tiles around it
+    -- suspiciousMask: its covered, unflagged neighbors as a local mask
+        (see frontier.NEIGHBOR_OFFSETS)
+    -- regionVersion: bumped whenever a tile nearby changes, but not when
+        it's first seen. Anything cached about the tile is good as long as
+        the version it was worked out at matches.
+    -- comboVersion: the regionVersion forcedMines and forcedClear were
+        worked out at (-1 if they never were)
+    -- forcedMines, forcedClear: local masks of the neighbors that are
+        certainly mines and certainly safe
+    -- suspicion: the probability that the tile is a mine
+    -- visible: what the solver has seen of the tile (see zobrist.py)
+    -- seen: whether the propagator has seen the tile uncovered
+    Plus flagCounter, the number of flags on the board, and zobristHash, a
+    hash of everything in visible which matches the board's.
     """
+    # the name, array typecode and starting value of every field.
+    FIELDS = (
+        ('clear', 'b', False),
+        ('state', 'b', TILE_UNSEEN),
+        ('nearbyCovered', 'b', 0),
+        ('nearbyFlags', 'b', 0),
+        ('suspiciousMask', 'B', 0),
+        ('regionVersion', 'q', 0),
+        ('comboVersion', 'q', -1),
+        ('forcedMines', 'B', 0),
+        ('forcedClear', 'B', 0),
+        ('suspicion', 'd', 0.0),
+        ('visible', 'b', zobrist.COVERED),
+        ('seen', 'b', False),
+    )
+
     def __init__(self, board):
         """
         Takes the board as input and initializes all of the data objects
         """
         self.rows = board.rows
         self.cols = board.cols
+        self.size = self.rows * self.cols
+        for (name, typecode, start) in self.FIELDS:
+            setattr(self, name, array(typecode, [start]) * self.size)
+        self.flagCounter = 0
+        self.zobristHash = 0
+        return
 
-        self.tiles = []
-        for i in range(self.rows):
-            row = []
-            for j in range(self.cols):
-                newTile = SolverTile()
-                row.append(newTile)
-            self.tiles.append(row)
+    def reset(self):
+        """
+        Forgets everything about the board, without making new arrays.
+        """
+        for (name, typecode, start) in self.FIELDS:
+            getattr(self, name)[:] = array(typecode, [start]) * self.size
+        self.flagCounter = 0
+        self.zobristHash = 0
         return
 
-    def __getitem__(self, i, j = None):
+    def index(self, i, j):
         """
-        Will allow grid[i, j], grid[i][j] and grid[(i, j)]
+        Returns the position of tile (i, j) in the arrays.
         """
-        try:
-            return self.tiles[i][j]
-        except TypeError: # list indices must be integers or slice
-            if j is None:
-                try:
-                    i, j = i
-                    return self.tiles[i][j]
-                except TypeError: # Cannot unpack non-iterable int
-                    return self.tiles[i]
-
-class SolverTile(object):
-    """
-    A class to hold info that we gather about a particular tile as we gather it
-    """
-    def __init__(self):
+        return i * self.cols + j
+
+    def neighbors(self, i, j):
         """
-        Always have the clear field, but everything else will be initialized
-        and destroyed as needed
+        Returns a list of the tiles next to tile (i, j).
         """
-        self.clear = False
-        self.neighbors = None
+        return [(i + dRow, j + dCol) for (dRow, dCol) in frontier.NEIGHBOR_OFFSETS
+            if 0 <= i + dRow < self.rows and 0 <= j + dCol < self.cols]
+
+    def setVisible(self, i, j, state):
+        """
+        Records that tile (i, j) now looks like state, and updates the hash.
+        """
+        k = self.index(i, j)
+        self.zobristHash ^= zobrist.key(i, j, self.visible[k])
+        self.zobristHash ^= zobrist.key(i, j, state)
+        self.visible[k] = state
+        return
 
-    def clearTile(self):
+    def touch(self, i, j):
         """
-        Set the clear flag to false and destroy all other variables
+        Records that tile (i, j) has changed, by bumping the region version of
+        every tile within REGION_RADIUS of it.
         """
-        # This is kinda hacky but let's see how it goes.
-        contents = list(self.__dict__)
-        for key in contents:
-                self.__delattr__(key)
-        self.clear = True
+        clear = self.clear
+        regionVersion = self.regionVersion
+        for row in range(max(i - REGION_RADIUS, 0), min(i + REGION_RADIUS + 1, self.rows)):
+            for col in range(max(j - REGION_RADIUS, 0), min(j + REGION_RADIUS + 1, self.cols)):
+                k = row * self.cols + col
+                if not clear[k]:
+                    regionVersion[k] += 1
         return
 
 class SolverQueue(deque):
@@ -721,6 +1104,9 @@ class QueueItem(object):
         self.row = row
         self.col = column
         self.action = action
+        # the phase of the solver that came up with the move (see
+        # instrument.py).
+        self.source = None
         return
 
     def __eq__(self, other):
@@ -769,14 +1155,19 @@ def test():
     """
     Kind of a playground to test smaller bits of code
     """
+    import board
     b = board.Board(board.BEGINNER)
     s = BasicSolver(b)
     coords = (2, 3)
-    print(s.grid[coords])
-    print(s.grid[(2, 3)])
-    print(s.grid[2, 3])
+    k = s.grid.index(*coords)
+    print(s.grid.clear[k], s.grid.nearbyCovered[k], s.grid.nearbyFlags[k])
+    print(s.grid.neighbors(*coords))
 
 def main():
+    # board needs a display, so it's only imported when there's a window to
+    # play in. simulate.py plays without one.
+    import board
+    logging.basicConfig(format = "%(message)s", level = logging.INFO)
     # test()
     b = board.Board(board.BEGINNER)
     s = AdvancedSolver(b)
@@ -750,38 +750,6 @@ class solverTile(object):
         self.combos = None
 
 
-class Looper(object):
-    def __init__(self, solverType):
-        self.games = 0
-        self.wins = 0
-        self.losses = 0
-        b = computerBoard(*board.EXPERT)
-        while (1):
-            try:
-                s = solverType(b)
-                win = s.start()
-                time.sleep(10)
-                self.games += 1
-                if win is None:
-                    pass
-                elif win is True:
-                    logging.info("VICTORY!")
-                    self.wins += 1
-                elif win is False:
-                    logging.info("DEFEAT!")
-                    self.losses += 1
-            except KeyboardInterrupt:
-                self.printLogs()
-                break
-    def printLogs(self):
-        logging.info("Won: \t{}".format(self.wins))
-        logging.info("Lost:\t{}".format(self.losses))
-        logging.info("Games:\t{}".format(self.games))
-        logging.info("Win pct:\t{:.f%}".format(self.wins / self.games))
-
-    def __del__(self):
-        self.printLogs()
-
 class stochasticCombinationGenerator(object):
     """
     A class to generate random Combinations of a list
@@ -835,9 +803,9 @@ class possibilityGenerator(object):
 
 def main():
     logging.basicConfig(format = "%(message)s", level = logging.INFO)
-    # b = computerBoard(*board.EXPERT)
-    # s = AdvancedSolver(b)
-    # s.start()
-    loops = Looper(AdvancedSolver)
+    # to play lots of games in a row, use simulate.py.
+    b = computerBoard(*board.EXPERT)
+    s = AdvancedSolver(b)
+    s.start()
 if __name__ == "__main__":
     main()
@@ -0,0 +1,10 @@
+"""
+conftest.py
+
+The modules under test live at the top of the repository, next to test.py,
+rather than in a package, so put it on the path.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
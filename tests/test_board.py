@@ -0,0 +1,118 @@
+"""
+test_board.py
+
+Checks the rules both boards play by (rules.py) on small hand-built
+layouts, and that board.Board and simulate.HeadlessBoard agree tile for tile
+on recorded games. board.Board needs tkinter, PIL and a display, so that
+check is skipped where there aren't any.
+"""
+import logging
+
+import pytest
+
+import recording
+import simulate
+import zobrist
+
+try:
+    import board
+except Exception:
+    # no tkinter, PIL or display.
+    board = None
+
+def laidOut(rows, cols, mines):
+    """
+    A HeadlessBoard with mines on the given tiles, and no click yet.
+    """
+    game = simulate.HeadlessBoard(rows, cols, len(mines))
+    recording.layOut(game, [i * cols + j for (i, j) in mines])
+    return game
+
+def states(game):
+    """
+    What the player can see of every tile, and whether it's exploded.
+    """
+    return [[(game.visibleState(i, j), game.tiles[i][j].exploded)
+        for j in range(game.cols)] for i in range(game.rows)]
+
+def checkHash(game):
+    visible = [[state for (state, _) in row] for row in states(game)]
+    assert game.zobristHash == zobrist.fullHash(visible)
+    return
+
+def testZerosOpenUpAndWin():
+    # a single mine in the corner: one click on the far side opens up the
+    # whole board, and wins it.
+    game = laidOut(3, 4, [(0, 3)])
+    game.primaryClick(2, 0)
+    assert game.victory is True
+    assert game.safeLeft == 0
+    assert [[game.tiles[i][j].covered for j in range(4)]
+        for i in range(3)] == [[False, False, False, True]] + [[False] * 4] * 2
+    assert game.tiles[0][3].flag
+    assert game.tiles[1][2].number == 1 and game.tiles[2][2].number == 0
+    checkHash(game)
+    return
+
+def testDoubleClick():
+    # mines at both ends of a row; a 1 next to a flagged mine double-clicks
+    # open its other neighbors.
+    game = laidOut(1, 5, [(0, 0), (0, 4)])
+    game.primaryClick(0, 1)
+    assert game.tiles[0][1].number == 1 and game.victory is None
+    # without the flag, a double-click does nothing.
+    game.doubleClick(0, 1)
+    assert game.tiles[0][2].covered
+    game.secondaryClick(0, 0)
+    assert game.visibleState(0, 0) == zobrist.FLAG
+    game.doubleClick(0, 1)
+    # (0, 2) is a zero, which opens up (0, 3) too.
+    assert not game.tiles[0][2].covered and not game.tiles[0][3].covered
+    assert game.victory is True
+    checkHash(game)
+    return
+
+def testLoss():
+    # a wrong flag is marked once a mine goes off, and every mine is shown.
+    game = laidOut(2, 3, [(0, 0), (1, 2)])
+    game.primaryClick(0, 1)
+    game.secondaryClick(1, 1)
+    game.primaryClick(1, 2)
+    assert game.victory is False
+    assert game.tiles[1][2].exploded and game.tiles[1][1].exploded
+    assert not game.tiles[0][0].exploded
+    assert game.visibleState(0, 0) == zobrist.MINE
+    assert game.visibleState(1, 2) == zobrist.MINE
+    # clicking a flag does nothing.
+    game.primaryClick(1, 1)
+    assert game.tiles[1][1].covered
+    checkHash(game)
+    return
+
+def recordedGames(count = 5):
+    """
+    Plays seeded beginner games with the advanced solver, and returns their
+    records.
+    """
+    logging.disable(logging.CRITICAL)
+    try:
+        return [simulate.playGame('advanced', simulate.LEVELS['beginner'], seed,
+            record = True).record for seed in range(count)]
+    finally:
+        logging.disable(logging.NOTSET)
+
+@pytest.mark.skipif(board is None, reason = "board.Board needs tkinter, PIL "
+    "and a display")
+def testBoardsAgree():
+    for record in recordedGames():
+        headless = recording.newBoard(record)
+        window = board.Board(record.rows, record.cols, record.mines)
+        recording.layOut(window, recording.layoutOf(record))
+        for (action, tile, guessed) in record.iterMoves():
+            recording.applyMove(headless, action, *tile)
+            recording.applyMove(window, action, *tile)
+            assert states(window) == states(headless)
+            assert window.zobristHash == headless.zobristHash
+            assert window.victory == headless.victory
+        window.window.destroy()
+    return
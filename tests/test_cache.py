@@ -0,0 +1,104 @@
+"""
+test_cache.py
+
+Checks the component caches: that the canonical signature finds the same
+shape wherever it is, and that an SQLiteCache shares what it stores with
+other processes.
+"""
+import multiprocessing
+
+import cache
+import frontier
+import probability
+
+def component(constraints):
+    """
+    The one component of a frontier made of constraints.
+    """
+    (only,) = frontier.Frontier(constraints, 0, 0).components()
+    return only
+
+# a 1-2-1 along an edge, at the top left of the board.
+ONE_TWO_ONE = [
+    ([(1, 0), (1, 1)], 1),
+    ([(1, 0), (1, 1), (1, 2)], 2),
+    ([(1, 1), (1, 2)], 1),
+]
+
+# a lopsided shape around a corner, which no symmetry maps to itself.
+CORNER = [
+    ([(1, 0), (1, 1)], 1),
+    ([(1, 0), (1, 1), (1, 2)], 1),
+    ([(1, 1), (1, 2), (0, 2)], 2),
+]
+
+def count(shape):
+    return probability.ExactCounter(shape).count()
+
+def moved(constraints, transform, shift):
+    """
+    The constraints with every cell transformed, then shifted by shift.
+    """
+    result = []
+    for (cells, mines) in constraints:
+        cells = [transform(*cell) for cell in cells]
+        result.append(([(i + shift[0], j + shift[1]) for (i, j) in cells],
+            mines))
+    return result
+
+def testIsomorphicComponentsShareAnEntry():
+    for constraints in (ONE_TWO_ONE, CORNER):
+        componentCache = cache.ComponentCache()
+        original = component(constraints)
+        componentCache.put(original, count(original))
+        for transform in frontier.TRANSFORMS:
+            shape = component(moved(constraints, transform, (7, 5)))
+            assert cache.signature(shape)[0] == cache.signature(original)[0]
+            table = probability.ComponentTable(shape)
+            assert componentCache.get(shape, table)
+            # the counts come back for this component's own cells.
+            expected = count(shape)
+            assert table.counts == expected.counts
+            assert table.cellCounts == expected.cellCounts
+        assert len(componentCache) == 1
+    return
+
+def testDifferentComponentsDontShare():
+    # the same cells with other numbers, and another shape.
+    otherNumbers = [(cells, 1) for (cells, _) in ONE_TWO_ONE]
+    for constraints in (otherNumbers, CORNER):
+        assert (cache.signature(component(constraints))[0]
+            != cache.signature(component(ONE_TWO_ONE))[0])
+    componentCache = cache.ComponentCache()
+    original = component(ONE_TWO_ONE)
+    componentCache.put(original, count(original))
+    for constraints in (otherNumbers, CORNER):
+        shape = component(constraints)
+        assert not componentCache.get(shape, probability.ComponentTable(shape))
+    assert (componentCache.hits, componentCache.misses) == (0, 2)
+    return
+
+def storeAndLook(path, constraints, queue):
+    """
+    Opens the cache file in this process and reports whether the component
+    was found in it, then stores it.
+    """
+    diskCache = cache.SQLiteCache(path)
+    shape = component(constraints)
+    found = diskCache.get(shape, probability.ComponentTable(shape))
+    diskCache.put(shape, count(shape))
+    queue.put((found, diskCache.diskHits))
+    diskCache.close()
+    return
+
+def testSQLiteCacheSharedBetweenProcesses(tmp_path):
+    path = str(tmp_path / 'components.db')
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    for expected in ((False, 0), (True, 1)):
+        process = context.Process(target = storeAndLook,
+            args = (path, ONE_TWO_ONE, queue))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+        assert queue.get(timeout = 5) == expected
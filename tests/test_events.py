@@ -0,0 +1,59 @@
+"""
+test_events.py
+
+Checks that events are only kept while a sink is attached, that the share
+kept follows the rate, and that sampling doesn't change what a seeded game
+draws from the random module.
+"""
+import json
+import random
+
+import events
+
+DRAWS = 20000
+
+def kept(rate):
+    """
+    How many of DRAWS events are kept at a rate.
+    """
+    sink = events.attach(events.BufferSink(), rate)
+    try:
+        return sum(events.sample() for _ in range(DRAWS))
+    finally:
+        events.detach(sink)
+
+def testNoSink():
+    assert not any(events.sample() for _ in range(100))
+    return
+
+def testRate():
+    events._random.seed(0)
+    assert kept(1.0) == DRAWS
+    # within about 5 standard deviations.
+    for rate in (0.5, 0.1, 0.01):
+        assert abs(kept(rate) - rate * DRAWS) < 5 * (rate * DRAWS) ** 0.5
+    assert kept(0.0) == 0
+    return
+
+def testSamplingLeavesRandomAlone():
+    random.seed(1)
+    expected = [random.random() for _ in range(5)]
+    random.seed(1)
+    kept(0.5)
+    assert [random.random() for _ in range(5)] == expected
+    return
+
+def testJSONLines(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    sink = events.record(path)
+    try:
+        if events.sample():
+            events.emit('move', tile = [1, 2], source = 'rules')
+    finally:
+        events.detach(sink)
+    with open(path) as f:
+        [entry] = [json.loads(line) for line in f]
+    assert (entry['event'], entry['tile'], entry['source']) == ('move',
+        [1, 2], 'rules')
+    assert 'time' in entry
+    return
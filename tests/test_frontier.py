@@ -0,0 +1,143 @@
+"""
+test_frontier.py
+
+Checks the frontier's deductions on small hand-built constraint sets whose
+forced cells are known, and on random frontiers against brute force: every
+cell a deduction finds has to be forced, whatever it misses. Also checks
+the ConstraintMatrix's lookups against counting every arrangement out.
+"""
+import itertools
+import random
+
+import pytest
+
+import frontier
+from test_probability import bruteForce, randomFrontier
+
+# how many random frontiers to check.
+TRIALS = 300
+
+def cells(*columns):
+    """
+    Cells along the top row, by column.
+    """
+    return [(0, j) for j in columns]
+
+# a 1-2-1 under a row of five covered cells: the 2's outer cells are mines.
+ONE_TWO_ONE = [(cells(0, 1, 2), 1), (cells(1, 2, 3), 2), (cells(2, 3, 4), 1)]
+
+# a 1 whose cells are all next to another 1: the other 1's extra cell is safe.
+ONE_ONE = [(cells(0, 1), 1), (cells(0, 1, 2), 1)]
+
+# two 1s sharing a cell, which could be the mine or not.
+UNDECIDED = [(cells(0, 1), 1), (cells(1, 2), 1)]
+
+def testCompareOneTwoOne():
+    front = frontier.Frontier(ONE_TWO_ONE, 10, 5)
+    assert front.compareConstraints() == (set(cells(1, 3)), set(cells(0, 4)))
+    return
+
+def testCompareOneOne():
+    front = frontier.Frontier(ONE_ONE, 10, 5)
+    assert front.compareConstraints() == (set(), set(cells(2)))
+    return
+
+def testCompareNothingForced():
+    front = frontier.Frontier(UNDECIDED, 10, 5)
+    assert front.compareConstraints() == (set(), set())
+    return
+
+def testCompareSound():
+    generator = random.Random(1)
+    for _ in range(TRIALS):
+        front = randomFrontier(generator)
+        (mines, safe) = front.compareConstraints()
+        (_, certainMines, certainSafe) = bruteForce(front)
+        assert mines <= certainMines
+        assert safe <= certainSafe
+    return
+
+def testReduceOneTwoOne():
+    front = frontier.Frontier(ONE_TWO_ONE, 10, 5)
+    assert front.reduceConstraints() == (set(cells(1, 3)), set(cells(0, 2, 4)))
+    return
+
+def testReduceWithMineCount():
+    # no pair of constraints decides anything, but with no interior the
+    # two mines left have to be the outer cells.
+    front = frontier.Frontier(UNDECIDED, 0, 2)
+    assert front.compareConstraints() == (set(), set())
+    assert front.reduceConstraints() == (set(cells(0, 2)), set(cells(1)))
+    return
+
+def testReduceNothingForced():
+    front = frontier.Frontier(UNDECIDED, 10, 5)
+    assert front.reduceConstraints() == (set(), set())
+    return
+
+def testReduceSound():
+    generator = random.Random(2)
+    for _ in range(TRIALS):
+        front = randomFrontier(generator)
+        (mines, safe) = front.reduceConstraints()
+        (_, certainMines, certainSafe) = bruteForce(front)
+        assert mines <= certainMines
+        assert safe <= certainSafe
+    return
+
+def testLinearRowEliminate():
+    # (a + b + c = 2) - (a + b = 1) leaves c = 1.
+    row = frontier.LinearRow({0: 1, 1: 1, 2: 1}, 2)
+    row.eliminate(frontier.LinearRow({0: 1, 1: 1}, 1), 0)
+    assert (row.coefficients, row.total, row.support) == ({2: 1}, 1, 0b100)
+    assert row.decide() == {2: 1}
+    return
+
+def testLinearRowNormalizes():
+    # (2a + 2b = 2) over a pivot 2a + 4c = 4 leaves 4b - 8c = -4, i.e.
+    # b - 2c = -1. That isn't either extreme, so nothing is decided until c
+    # is known.
+    row = frontier.LinearRow({0: 2, 1: 2}, 2)
+    row.eliminate(frontier.LinearRow({0: 2, 2: 4}, 4), 0)
+    assert (row.coefficients, row.total) == ({1: 1, 2: -2}, -1)
+    assert row.decide() == {}
+    row.substitute({2: 1})
+    assert (row.coefficients, row.total) == ({1: 1}, 1)
+    assert row.decide() == {1: 1}
+    return
+
+def testLinearRowDecidesNegatives():
+    # a - b = 1 only if a is a mine and b isn't, and a - b = -1 the other
+    # way around.
+    assert frontier.LinearRow({0: 1, 1: -1}, 1).decide() == {0: 1, 1: 0}
+    assert frontier.LinearRow({0: 1, 1: -1}, -1).decide() == {0: 0, 1: 1}
+    assert frontier.LinearRow({0: 1, 1: -1}, 0).decide() == {}
+    return
+
+def testConstraintMatrix():
+    row = cells(0, 1, 2, 3, 4)
+    matrix = frontier.ConstraintMatrix(row, [seen for (seen, _) in ONE_TWO_ONE])
+    for mines in itertools.product(range(4), repeat = 3):
+        expected = []
+        for arrangement in range(2 ** len(row)):
+            if all(sum((arrangement >> row.index(cell)) & 1 for cell in seen)
+                    == count for ((seen, _), count) in zip(ONE_TWO_ONE, mines)):
+                expected.append((arrangement, frontier.popcount(arrangement)))
+        assert sorted(matrix.matching(mines)) == expected
+    # the 1-2-1 only fits one way: mines on the 2's outer cells.
+    assert matrix.matching([1, 2, 1]) == [(0b01010, 2)]
+    assert matrix.matching([-1, 0, 0]) == []
+    return
+
+def testConstraintMatrixWithNumpy(monkeypatch):
+    pytest.importorskip('numpy')
+    generator = random.Random(3)
+    for _ in range(20):
+        front = randomFrontier(generator)
+        seen = [constraintCells for (constraintCells, _) in front.constraints]
+        withNumpy = frontier.ConstraintMatrix(front.cells, seen).arrangements
+        monkeypatch.setattr(frontier, 'numpy', None)
+        without = frontier.ConstraintMatrix(front.cells, seen).arrangements
+        monkeypatch.undo()
+        assert withNumpy == without
+    return
@@ -0,0 +1,70 @@
+"""
+test_instrument.py
+
+Checks that the phases add up their calls, time and moves, that every move
+is tagged with the phase that queued it, and that stats from many games add
+up with merge().
+"""
+import time
+
+import instrument
+import solver
+
+class Player(object):
+    """
+    Just enough of a solver for SolverStats: a queue.
+    """
+    def __init__(self):
+        self.queue = solver.SolverQueue()
+        self.stats = instrument.SolverStats(self)
+        return
+
+def testPhaseTotals():
+    player = Player()
+    for n in range(3):
+        with player.stats.phase('wait'):
+            time.sleep(0.01)
+    with player.stats.phase('rules'):
+        player.queue.add(0, 0, 'flag')
+        player.queue.add(0, 1)
+    with player.stats.phase('rules'):
+        player.queue.add(0, 2)
+    player.stats.count('combos', 5)
+    player.stats.count('combos')
+    player.stats.peak('frontier', 4)
+    player.stats.peak('frontier', 2)
+
+    stats = player.stats.asDict()
+    wait = stats['phases']['wait']
+    assert (wait['calls'], wait['moves']) == (3, 0)
+    # sleeping takes time, but hardly any CPU.
+    assert 0.03 <= wait['wall'] < 1.0
+    assert wait['cpu'] < wait['wall']
+    assert (stats['phases']['rules']['calls'],
+        stats['phases']['rules']['moves']) == (2, 3)
+    assert [item.source for item in player.queue] == ['rules'] * 3
+    assert list(stats['phases']) == ['wait', 'rules']
+    assert stats['counters'] == {'combos': 6}
+    assert stats['peaks'] == {'frontier': 4}
+    return
+
+def testMerge():
+    first = {'phases': {'rules': {'calls': 2, 'wall': 0.5, 'cpu': 0.25,
+        'moves': 3}}, 'counters': {'combos': 6}, 'peaks': {'frontier': 4}}
+    second = {'phases': {'rules': {'calls': 1, 'wall': 0.25, 'cpu': 0.25,
+        'moves': 0}, 'guess': {'calls': 1, 'wall': 1.0, 'cpu': 1.0, 'moves': 1}},
+        'counters': {'combos': 1, 'samples': 10}, 'peaks': {'frontier': 9}}
+    total = instrument.merge(instrument.merge({}, first), second)
+    assert total == {
+        'phases': {
+            'rules': {'calls': 3, 'wall': 0.75, 'cpu': 0.5, 'moves': 3},
+            'guess': {'calls': 1, 'wall': 1.0, 'cpu': 1.0, 'moves': 1},
+        },
+        'counters': {'combos': 7, 'samples': 10},
+        'peaks': {'frontier': 9},
+    }
+    # the slowest phase comes first in the summary.
+    lines = instrument.summarize(total)
+    assert lines[1].split()[:2] == ['guess', '1']
+    assert lines[2].split()[:2] == ['rules', '3']
+    return
@@ -0,0 +1,61 @@
+"""
+test_metrics.py
+
+Checks a registry's Prometheus text exposition, and that a MetricsFile and
+a MetricsServer both hand it out.
+"""
+import urllib.request
+
+import metrics
+
+def registry():
+    numbers = metrics.Registry()
+    games = numbers.counter('games_total', 'Games played')
+    games.inc(outcome = 'win')
+    games.inc(2, outcome = 'win')
+    games.inc(outcome = 'say "loss"')
+    numbers.gauge('frontier_tiles', 'Tiles on the frontier').set(12)
+    latency = numbers.histogram('guess_seconds', 'Time per guess',
+        buckets = (0.1, 1.0))
+    for value in (0.0625, 0.0625, 0.5, 3.0):
+        latency.observe(value)
+    return numbers
+
+EXPOSITION = '''# HELP games_total Games played
+# TYPE games_total counter
+games_total{outcome="win"} 3
+games_total{outcome="say \\"loss\\""} 1
+# HELP frontier_tiles Tiles on the frontier
+# TYPE frontier_tiles gauge
+frontier_tiles 12
+# HELP guess_seconds Time per guess
+# TYPE guess_seconds histogram
+guess_seconds_bucket{le="0.1"} 2
+guess_seconds_bucket{le="1.0"} 3
+guess_seconds_bucket{le="+Inf"} 4
+guess_seconds_sum 3.625
+guess_seconds_count 4
+'''
+
+def testRender():
+    assert registry().render() == EXPOSITION
+    return
+
+def testMetricsFile(tmp_path):
+    path = str(tmp_path / 'solver.prom')
+    writer = metrics.MetricsFile(registry(), path, interval = 60.0)
+    writer.close()
+    with open(path) as f:
+        assert f.read() == EXPOSITION
+    return
+
+def testMetricsServer():
+    server = metrics.MetricsServer(registry(), 0)
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(server.port)
+        with urllib.request.urlopen(url, timeout = 5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert response.read().decode('utf-8') == EXPOSITION
+    finally:
+        server.close()
+    return
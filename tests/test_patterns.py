@@ -0,0 +1,83 @@
+"""
+test_patterns.py
+
+Checks every window in the pattern table, in all 8 rotations and
+reflections, against brute force: every way of putting the missing mines on
+the suspicious tiles is counted out, without the precomputed combinations
+the solver uses. Some of the windows have to force a move.
+"""
+import itertools
+
+import frontier
+import patterns
+
+def bruteForce(mask, missing, limits):
+    """
+    Returns (mines, clear) for a window: the local masks of the suspicious
+    tiles that are a mine in every arrangement the nearby numbers accept,
+    and of those that are a mine in none. (0, 0) if there are none.
+    """
+    tiles = [1 << n for n in range(8) if (mask >> n) & 1]
+    good = []
+    for chosen in itertools.combinations(tiles, missing):
+        combo = sum(chosen)
+        if all(fewest <= bin(combo & shared).count('1') <= most
+                for (shared, fewest, most) in limits):
+            good.append(combo)
+    if not good:
+        return (0, 0)
+    mines = mask
+    clear = mask
+    for combo in good:
+        mines &= combo
+        clear &= ~combo
+    return (mines, clear)
+
+def fileKeys(path = patterns.PATTERN_FILE):
+    """
+    The window keys in the table file, as they're written.
+    """
+    keys = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            limits = []
+            for field in fields[4:]:
+                (shared, fewest, most) = field.split('/')
+                limits.append((int(shared, 16), int(fewest), int(most)))
+            keys.append(patterns.windowKey(int(fields[0], 16), int(fields[1]),
+                limits))
+    return keys
+
+def testTableMatchesBruteForce():
+    table = patterns.PatternTable().load()
+    keys = fileKeys()
+    assert keys
+    for key in keys:
+        for symmetry in patterns.SYMMETRIES:
+            moved = patterns.transformKey(key, symmetry)
+            assert moved in table.moves
+            assert table.moves[moved] == bruteForce(*moved)
+            assert patterns.solveWindow(*moved) == bruteForce(*moved)
+    return
+
+def testSomeWindowsForce():
+    # a table of windows that never decide anything would only ever save
+    # the solver from working out that they don't.
+    forcing = [key for key in fileKeys() if patterns.solveWindow(*key) != (0, 0)]
+    assert forcing
+    table = patterns.PatternTable().load()
+    for key in forcing:
+        (mines, clear) = table.moves[key]
+        assert mines | clear
+    return
+
+def testSymmetriesAreDistinct():
+    # the 8 symmetries move the corner and edge tiles of a lopsided mask
+    # to 8 different places.
+    mask = (frontier.NEIGHBOR_BITS[(-1, -1)] | frontier.NEIGHBOR_BITS[(-1, 0)]
+        | frontier.NEIGHBOR_BITS[(0, 1)])
+    assert len({symmetry[mask] for symmetry in patterns.SYMMETRIES}) == 8
+    return
@@ -0,0 +1,160 @@
+"""
+test_probability.py
+
+Checks the ProbabilityEngine against brute force: on small random frontiers,
+every arrangement of mines is enumerated and weighted by the ways to fill the
+interior, which gives the exact probabilities and the certain cells. The
+PathCounter, which only counts components of PATH_MIN_CELLS or more, is
+checked against the ExactCounter on components that big.
+"""
+import itertools
+import math
+import random
+import time
+
+import cache
+import frontier
+import probability
+
+# how many random frontiers to check.
+TRIALS = 300
+
+def randomFrontier(generator):
+    """
+    Returns a small random Frontier that has at least one arrangement: a
+    patch of cells with hidden mines, and numbers that each see some of the
+    cells and count the hidden mines among them.
+    """
+    rows = generator.randint(1, 3)
+    cols = generator.randint(2, 5)
+    cells = [(i, j) for i in range(rows) for j in range(cols)]
+    mines = {cell for cell in cells if generator.random() < 0.35}
+    constraints = []
+    for _ in range(generator.randint(1, 6)):
+        (i, j) = generator.choice(cells)
+        seen = [(r, c) for (r, c) in cells if abs(r - i) <= 1 and abs(c - j) <= 1
+            and generator.random() < 0.8]
+        if seen:
+            constraints.append((seen, sum(cell in mines for cell in seen)))
+    interior = generator.randint(0, 6)
+    # the mines on the frontier, plus some in the interior.
+    used = {cell for (seen, _) in constraints for cell in seen}
+    minesLeft = len(mines & used) + generator.randint(0, interior)
+    return frontier.Frontier(constraints, interior, minesLeft)
+
+def bruteForce(front):
+    """
+    Returns (probabilities, certain mines, certain safe cells) for a frontier,
+    by enumerating every arrangement.
+    """
+    cells = front.cells
+    weights = []
+    for values in itertools.product((0, 1), repeat = len(cells)):
+        assignment = dict(zip(cells, values))
+        if any(sum(assignment[cell] for cell in seen) != count
+                for (seen, count) in front.constraints):
+            continue
+        rest = front.minesLeft - sum(values)
+        if not 0 <= rest <= front.interior:
+            continue
+        weights.append((values, math.comb(front.interior, rest)))
+    total = sum(weight for (_, weight) in weights)
+    probabilities = {}
+    certainMines = set()
+    certainSafe = set()
+    for (n, cell) in enumerate(cells):
+        hits = sum(weight for (values, weight) in weights if values[n])
+        probabilities[cell] = hits / total
+        if all(values[n] for (values, _) in weights):
+            certainMines.add(cell)
+        if not any(values[n] for (values, _) in weights):
+            certainSafe.add(cell)
+    return (probabilities, certainMines, certainSafe)
+
+def testMatchesBruteForce():
+    generator = random.Random(0)
+    for _ in range(TRIALS):
+        front = randomFrontier(generator)
+        engine = probability.ProbabilityEngine(front, cache.ComponentCache())
+        engine.solve()
+        (expected, certainMines, certainSafe) = bruteForce(front)
+        assert engine.completeness == 1.0
+        assert set(engine.probabilities) == set(expected)
+        for (cell, p) in expected.items():
+            assert abs(engine.probabilities[cell] - p) < 1e-9
+        assert engine.certainMines == certainMines
+        assert engine.certainSafe == certainSafe
+
+def testPathCounterMatchesExactCounter():
+    generator = random.Random(1)
+    for _ in range(50):
+        front = randomFrontier(generator)
+        for component in front.components():
+            exact = probability.ExactCounter(component).count()
+            path = probability.PathCounter(component).count()
+            assert exact.counts == path.counts
+            assert exact.cellCounts == path.cellCounts
+
+def randomBand(generator):
+    """
+    Returns a random Frontier with one component of at least PATH_MIN_CELLS
+    cells: a band of cells two or three deep with hidden mines, and a number
+    over every column that sees its own column, the top cell of the next,
+    and some of the other cells on either side.
+    """
+    rows = generator.randint(2, 3)
+    cols = generator.randint(probability.PATH_MIN_CELLS // rows + 1, 11)
+    cells = [(i, j) for i in range(rows) for j in range(cols)]
+    mines = {cell for cell in cells if generator.random() < 0.3}
+    constraints = []
+    for col in range(cols):
+        seen = [(i, j) for (i, j) in cells if j == col or (i, j) == (0, col + 1)
+            or (abs(j - col) == 1 and generator.random() < 0.7)]
+        constraints.append((seen, sum(cell in mines for cell in seen)))
+    interior = generator.randint(0, 20)
+    minesLeft = len(mines) + generator.randint(0, interior)
+    return frontier.Frontier(constraints, interior, minesLeft)
+
+def testPathCounterMatchesExactCounterOnBigComponents():
+    generator = random.Random(3)
+    for _ in range(20):
+        (component,) = randomBand(generator).components()
+        assert len(component) >= probability.PATH_MIN_CELLS
+        exact = probability.ExactCounter(component).count()
+        path = probability.PathCounter(component).count()
+        assert exact.counts and exact.counts == path.counts
+        assert exact.cellCounts == path.cellCounts
+    return
+
+def bandFrontier(length):
+    """
+    A frontier two cells deep and length long, with a number every column
+    that sees the six cells around it and wants two mines among them: far
+    too many arrangements to count in no time at all.
+    """
+    constraints = []
+    for col in range(1, length - 1):
+        seen = [(row, c) for row in (0, 1) for c in (col - 1, col, col + 1)]
+        constraints.append((seen, 2))
+    return frontier.Frontier(constraints, 100, 40)
+
+def testIncompleteAfterDeadline():
+    front = bandFrontier(60)
+    engine = probability.ProbabilityEngine(front, cache.ComponentCache())
+    start = time.time()
+    engine.solve(time.time() - 1)
+    assert time.time() - start < 5
+    assert engine.completeness < 1.0
+    assert engine.samples > 0
+    assert engine.certainMines == set() and engine.certainSafe == set()
+
+def testNoCache():
+    front = randomFrontier(random.Random(2))
+    engine = probability.ProbabilityEngine(front, None)
+    assert engine.cache is None
+    engine.solve()
+    assert engine.probabilities == cachedEngine(front).probabilities
+    assert probability.ProbabilityEngine(front).cache is cache.defaultCache()
+
+def cachedEngine(front):
+    return probability.ProbabilityEngine(front, cache.ComponentCache()).solve()
@@ -0,0 +1,55 @@
+"""
+test_profiling.py
+
+Checks that the sampling profiler writes the stacks of a slow call in the
+collapsed stack format, and throws away the calls quicker than its
+threshold.
+"""
+import re
+import time
+
+import profiling
+
+# a collapsed stack line: frames separated by semicolons, a space, and the
+# number of samples.
+LINE = re.compile(r'^[^ ;]+(;[^ ;]+)* [0-9]+$')
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+def outer(seconds):
+    return spin(seconds)
+
+def testCollapsedStacks(tmp_path):
+    profiler = profiling.SamplingProfiler()
+    assert profiler.profile('slow', outer, 0.1) == 0.1
+    assert (profiler.calls, profiler.captured) == (1, 1)
+    path = tmp_path / 'stacks.txt'
+    profiler.write(str(path))
+    lines = path.read_text().splitlines()
+    assert lines and lines == sorted(lines)
+    for line in lines:
+        assert LINE.match(line)
+        assert line.startswith('slow;test_profiling.py:outer')
+    # most of the samples catch the call spinning.
+    counts = {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1])
+        for line in lines}
+    spinning = sum(count for (stack, count) in counts.items()
+        if stack.endswith('test_profiling.py:spin'))
+    assert spinning >= sum(counts.values()) / 2
+    return
+
+def testThreshold():
+    profiler = profiling.SamplingProfiler(threshold = 10.0)
+    profiler.profile('quick', outer, 0.01)
+    assert (profiler.calls, profiler.captured) == (1, 0)
+    assert profiler.stacks == {}
+    return
+
+def testCollapsedLines():
+    stacks = profiling.merge({'a;b': 2, 'a': 1}, {'a;b': 3, 'c': 1})
+    assert profiling.collapsedLines(stacks) == ['a 1', 'a;b 5', 'c 1']
+    return
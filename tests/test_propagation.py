@@ -0,0 +1,141 @@
+"""
+test_propagation.py
+
+Checks the propagator on small hand-built layouts: what a reveal finds and
+puts on the worklist, in what order, and the moves propagate() comes up
+with. Then plays seeded games and checks its deductions against the full
+scan of the basic rules: every move it queues is one the full scan finds
+too, and once it runs dry, the full scan finds nothing it missed.
+"""
+import logging
+import random
+
+import pytest
+
+import simulate
+import solver
+from test_board import laidOut
+
+@pytest.fixture(autouse = True)
+def quiet():
+    # the solvers log every random guess.
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+    return
+
+def moves(player):
+    return [(item.getAction(), item.getTile()) for item in player.queue]
+
+def testRevealFollowsZeros():
+    # a wall of mines down column 4 of a 3x6 board, with safe tiles behind
+    # it. Clicking the far side opens everything up to the wall, and every
+    # number along it has only mines left covered.
+    game = laidOut(3, 6, [(0, 4), (1, 4), (2, 4)])
+    player = solver.BasicSolver(game)
+    propagator = player.propagator
+    game.primaryClick(1, 0)
+    revealed = propagator.reveal(1, 0)
+    assert sorted(revealed) == [(i, j) for i in range(3) for j in range(4)]
+    # every tile goes on the worklist once, in the order it was found.
+    assert list(propagator.worklist) == revealed
+    assert propagator.waiting == set(revealed)
+    assert propagator.propagate() == 3
+    assert sorted(moves(player)) == [('flag', (i, 4)) for i in range(3)]
+    assert not propagator.worklist and not propagator.waiting
+    # nothing new to see the second time.
+    assert propagator.reveal(1, 0) == []
+    return
+
+def testRevealQueuesOldNumbers():
+    # mines at (0, 0) and (0, 3) of a row, with 1s between them. Opening
+    # (0, 2) puts the 1 at (0, 1) back on the worklist behind the new tile,
+    # since it just lost a covered neighbor, and the worklist is checked in
+    # that order.
+    game = laidOut(1, 6, [(0, 0), (0, 3)])
+    player = solver.BasicSolver(game)
+    propagator = player.propagator
+    game.primaryClick(0, 1)
+    assert propagator.reveal(0, 1) == [(0, 1)]
+    assert propagator.propagate() == 0
+    game.primaryClick(0, 2)
+    assert propagator.reveal(0, 2) == [(0, 2)]
+    assert list(propagator.worklist) == [(0, 2), (0, 1)]
+    assert propagator.propagate() == 2
+    assert moves(player) == [('flag', (0, 3)), ('flag', (0, 0))]
+    return
+
+def testFlagQueuesSeenNumbers():
+    game = laidOut(1, 4, [(0, 0), (0, 3)])
+    player = solver.BasicSolver(game)
+    propagator = player.propagator
+    game.primaryClick(0, 1)
+    propagator.reveal(0, 1)
+    assert propagator.propagate() == 0
+    game.secondaryClick(0, 0)
+    propagator.flag(0, 0)
+    assert list(propagator.worklist) == [(0, 1)]
+    # the 1 has its flag, so its other neighbor can be opened.
+    assert propagator.propagate() == 1
+    assert moves(player) == [('double', (0, 1))]
+    # a flag next to nothing seen puts nothing on the worklist.
+    propagator.flag(0, 3)
+    assert not propagator.worklist
+    return
+
+def fullScan(game):
+    """
+    Runs the full scan of the basic rules on a fresh solver. Returns the
+    tiles it would flag, and the tiles its double-clicks would open.
+    """
+    checker = solver.BasicSolver(game)
+    found = {}
+
+    def queueMoves(flags = (), clicks = (), chords = None):
+        found['flags'] = set(flags)
+        found['opens'] = set().union(*(chords or {}).values())
+        return
+
+    checker.queueMoves = queueMoves
+    checker.gatherTileInfo()
+    checker.guessWithBasicRules()
+    return (found['flags'], found['opens'])
+
+def opens(game, player, tile):
+    """
+    The covered, unflagged tiles a double-click on tile would open.
+    """
+    return {n for n in game.getNeighbors(*tile)
+        if player.isCovered(*n) and not player.isFlag(*n)}
+
+@pytest.mark.parametrize('seed', range(4))
+def testMatchesFullScan(seed):
+    level = simulate.LEVELS['intermediate']
+    random.seed(seed)
+    game = simulate.HeadlessBoard(*level, seed = seed)
+    player = solver.BasicSolver(game)
+    checked = 0
+    while game.victory is None:
+        if not player.queue:
+            # the worklist has run dry: the full scan mustn't find anything.
+            assert fullScan(game) == (set(), set())
+            if game.firstClick:
+                player.guess()
+            else:
+                player.guessAtRandom()
+        move = player.queue.popleft()
+        simulate.makeMove(game, player, move)
+        before = len(player.queue)
+        player.observe(move)
+        if game.victory is not None:
+            break
+        (flags, opened) = fullScan(game)
+        for item in list(player.queue)[before:]:
+            if item.getAction() == 'flag':
+                assert item.getTile() in flags
+            else:
+                assert item.getAction() == 'double'
+                assert opens(game, player, item.getTile()) <= opened
+            checked += 1
+    assert checked > 0
+    return
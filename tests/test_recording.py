@@ -0,0 +1,82 @@
+"""
+test_recording.py
+
+Checks that games written to a record file read back the same, from a seed
+or a laid-out board, that a game cut off half way through writing is
+ignored, and that replaying a record ends the way the game did.
+"""
+import logging
+
+import recording
+import simulate
+
+LEVEL = simulate.LEVELS['beginner']
+
+def playedGames():
+    """
+    Records seeded beginner games until there's at least one win and one
+    loss. Returns their records.
+    """
+    logging.disable(logging.CRITICAL)
+    try:
+        records = []
+        outcomes = set()
+        seed = 0
+        while not {'win', 'loss'} <= outcomes:
+            result = simulate.playGame('advanced', LEVEL, seed, record = True)
+            if result.record.outcome in ('win', 'loss'):
+                records.append(result.record)
+                outcomes.add(result.record.outcome)
+            seed += 1
+    finally:
+        logging.disable(logging.NOTSET)
+    return records
+
+def laidOut(record):
+    """
+    A copy of a seeded game's record, with the mines laid out instead.
+    """
+    copy = recording.GameRecord(record.rows, record.cols, record.mines,
+        solver = record.solver)
+    copy.layout = recording.layoutOf(record)
+    copy.outcome = record.outcome
+    copy.moves.extend(record.moves)
+    return copy
+
+def sameRecord(a, b):
+    return ((a.rows, a.cols, a.mines, a.seed, a.layout, a.solver, a.outcome,
+        list(a.iterMoves())) == (b.rows, b.cols, b.mines, b.seed, b.layout,
+        b.solver, b.outcome, list(b.iterMoves())))
+
+def testRoundTrip(tmp_path):
+    seeded = playedGames()
+    records = seeded + [laidOut(record) for record in seeded]
+    path = str(tmp_path / 'games.rec')
+    writer = recording.RecordWriter(path)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    # a run that died half way through writing its last game.
+    packed = seeded[0].pack()
+    with open(path, 'ab') as f:
+        f.write(packed[:len(packed) // 2])
+
+    readBack = list(recording.read(path))
+    assert len(readBack) == len(records)
+    for (record, copy) in zip(records, readBack):
+        assert sameRecord(record, copy)
+        assert (copy.seed is None) == (copy.layout is not None)
+        game = recording.replay(copy)
+        outcome = {True: 'win', False: 'loss'}.get(game.victory, 'unfinished')
+        assert outcome == record.outcome
+    return
+
+def testTruncatedHeader(tmp_path):
+    path = str(tmp_path / 'games.rec')
+    writer = recording.RecordWriter(path)
+    writer.write(playedGames()[0])
+    writer.close()
+    with open(path, 'ab') as f:
+        f.write(recording.GAME_TAG)
+    assert len(list(recording.read(path))) == 1
+    return
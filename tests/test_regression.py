@@ -0,0 +1,44 @@
+"""
+test_regression.py
+
+Checks that a slowdown past the threshold is flagged whatever noise the
+baseline was calibrated with, and that the noisy cases are the ones warned
+about.
+"""
+import regression
+
+def report(rates, noise = None):
+    """
+    A report with one case, timed at the given rates.
+    """
+    result = {'case': 'guess', 'levelName': 'expert', 'rates': rates,
+        'opsPerSec': sum(rates) / len(rates), 'number': 20}
+    report = {'results': [result]}
+    if noise is not None:
+        report['noise'] = {regression.noiseKey('guess', 'expert'): noise}
+    return report
+
+RATES = [100.0, 104.0, 98.0, 101.0, 97.0]
+
+def testHalvedIsFlagged():
+    for noise in (None, 0.05, 0.4, 0.9):
+        baseline = report(RATES, noise)
+        halved = report([r / 2 for r in RATES])
+        [(_, _, change, pValue, regressed)] = regression.compare(baseline, halved)
+        assert abs(change + 0.5) < 1e-9 and pValue < regression.ALPHA
+        assert regressed
+    return
+
+def testWithinThreshold():
+    baseline = report(RATES)
+    slower = report([r * 0.95 for r in RATES])
+    [(_, _, _, _, regressed)] = regression.compare(baseline, slower)
+    assert not regressed
+    return
+
+def testNoisyCases():
+    assert regression.noisyCases(report(RATES)) == []
+    assert regression.noisyCases(report(RATES, 0.05)) == []
+    assert regression.noisyCases(report(RATES, 0.3)) == ['guess/expert']
+    assert regression.noisyCases(report(RATES, 0.3), threshold = 0.5) == []
+    return
@@ -0,0 +1,39 @@
+"""
+test_replaybench.py
+
+Checks replaybench's percentiles, and that check() copes with a baseline
+none of whose positions are found again.
+"""
+import platform
+
+import pytest
+
+import replaybench
+
+def testPercentile():
+    values = [5, 1, 4, 2, 3]
+    assert replaybench.percentile(values, 0.5) == 3
+    assert replaybench.percentile(values, 0.9) == 5
+    assert replaybench.percentile(values, 0.0) == 1
+    assert replaybench.percentile([7], 0.99) == 7
+    return
+
+def testPercentileOfNothing():
+    with pytest.raises(ValueError):
+        replaybench.percentile([], 0.5)
+    return
+
+def testCheckWithNoComparisons(monkeypatch):
+    baseline = {
+        'version': replaybench.BASELINE_VERSION,
+        'settings': {'corpus': [], 'outcome': None, 'repeats': 1,
+            'watchdog': 1.0},
+        'machine': platform.machine(),
+        'positions': [{'position': '0:0:1', 'median': 0.01,
+            'latencies': [0.01]}],
+    }
+    monkeypatch.setattr(replaybench, 'load', lambda name: baseline)
+    monkeypatch.setattr(replaybench, 'run',
+        lambda *args, **kwargs: {'positions': []})
+    assert replaybench.check('empty') is True
+    return
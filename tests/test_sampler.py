@@ -0,0 +1,114 @@
+"""
+test_sampler.py
+
+Checks that the GibbsSampler keeps to its deadline, even when the chain is
+stuck where it can't record anything, that its ConstraintMatrix refills are
+the same as its enumerated ones, and that its estimates on small random
+frontiers are close to the exact probabilities.
+"""
+import random
+import time
+
+import frontier
+import probability
+import sampler
+import test_probability
+
+def band(length):
+    """
+    A component two cells deep and length long, with a number every column
+    that wants two mines among the six cells around it.
+    """
+    constraints = []
+    for col in range(1, length - 1):
+        seen = [(row, c) for row in (0, 1) for c in (col - 1, col, col + 1)]
+        constraints.append((seen, 2))
+    return frontier.mergeComponents(
+        frontier.Frontier(constraints, 0, 0).components())
+
+def testStuckChainKeepsDeadline():
+    component = band(30)
+    # no arrangement has any weight, so nothing can ever be recorded.
+    chain = sampler.GibbsSampler(component, [0.0] * (len(component) + 1))
+    start = time.time()
+    table = chain.count(time.time() + 0.01)
+    assert time.time() - start < 1.0
+    assert table.samples == 0
+
+def testStuckChainStopsWithoutDeadline():
+    component = band(10)
+    chain = sampler.GibbsSampler(component, [0.0] * (len(component) + 1))
+    table = chain.count(maxSamples = 200)
+    assert table.samples == 0
+
+def testTinyDeadline():
+    component = band(40)
+    chain = sampler.GibbsSampler(component, [1.0] * (len(component) + 1))
+    start = time.time()
+    table = chain.count(time.time() + 0.001)
+    assert time.time() - start < 1.0
+    assert table.samples >= probability.MIN_SAMPLES
+
+def testEstimatesCloseToExact():
+    generator = random.Random(5)
+    for _ in range(20):
+        front = test_probability.randomFrontier(generator)
+        component = frontier.mergeComponents(front.components())
+        weights = [1.0] * (len(component) + 1)
+        exact = probability.ExactCounter(component).count()
+        table = sampler.GibbsSampler(component, weights).count(time.time() + 0.2)
+        total = sum(exact.counts.values())
+        sampled = sum(table.counts.values())
+        for n in range(len(component)):
+            p = sum(counts[n] for counts in exact.cellCounts.values()) / total
+            q = sum(counts[n] for counts in table.cellCounts.values()) / sampled
+            assert abs(p - q) < 0.15
+
+def refills(chain, block):
+    """
+    Both ways of refilling a block, from the chain's current state: the
+    enumerated one and the ConstraintMatrix one.
+    """
+    component = chain.component
+    for n in block:
+        if chain.assignment[n]:
+            for c in component.cellConstraints[n]:
+                chain.placed[c] -= 1
+    chain.open = {}
+    for n in block:
+        for c in component.cellConstraints[n]:
+            chain.open[c] = chain.open.get(c, 0) + 1
+    chain.options = []
+    chain._refill(block, 0, 0, 0)
+    result = (sorted(chain.options), sorted(chain._matching(block)))
+    for n in block:
+        if chain.assignment[n]:
+            for c in component.cellConstraints[n]:
+                chain.placed[c] += 1
+    return result
+
+def testMatchingAgreesWithRefill():
+    generator = random.Random(7)
+    components = [band(12)]
+    for _ in range(10):
+        front = test_probability.randomFrontier(generator)
+        components.append(frontier.mergeComponents(front.components()))
+    for component in components:
+        chain = sampler.GibbsSampler(component, [1.0] * (len(component) + 1))
+        # any assignment will do, possible or not.
+        for _ in range(5):
+            chain.assignment = [generator.randint(0, 1) for _ in component.cells]
+            chain.placed = [sum(chain.assignment[n] for n in indices)
+                for (indices, _) in component.constraints]
+            for block in chain.blocks:
+                (enumerated, looked) = refills(chain, block)
+                assert enumerated == looked
+    return
+
+def testMatricesBuiltForBusyBlocks():
+    component = band(20)
+    chain = sampler.GibbsSampler(component, [1.0] * (len(component) + 1))
+    chain.count(maxSamples = 2000)
+    assert chain.matrices
+    assert all(len(block) <= sampler.MATRIX_CELLS for block in chain.matrices)
+    return
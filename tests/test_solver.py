@@ -0,0 +1,100 @@
+"""
+test_solver.py
+
+Checks what the advanced solver's scans cost and cache: the first scan of a
+big board mustn't bump the region version of every tile it sees, and a
+later change has to. A guess gathers the frontier once, and counting only
+gets what's left of the deadline.
+"""
+import logging
+import random
+import time
+
+import probability
+import simulate
+import solver
+
+def startedGame(rows, cols, mines, seed = 0):
+    """
+    An advanced solver on a board that's had its first click.
+    """
+    game = simulate.HeadlessBoard(rows, cols, mines, seed = seed)
+    game.primaryClick(rows // 2, cols // 2)
+    return solver.AdvancedSolver(game)
+
+def testFirstScanTouchesNothing(monkeypatch):
+    player = startedGame(100, 100, 1500)
+    grid = player.grid
+    touched = []
+    monkeypatch.setattr(grid, 'touch', lambda i, j: touched.append((i, j)))
+    player.gatherNeighborInfo()
+    assert touched == []
+    assert max(grid.regionVersion) == 0
+    assert solver.TILE_UNSEEN not in [grid.state[k] for k in range(grid.size)
+        if not grid.clear[k]]
+    # nothing has changed, so the second scan doesn't touch anything either.
+    player.gatherNeighborInfo()
+    assert touched == []
+    return
+
+def testChangeBumpsRegion():
+    player = startedGame(30, 30, 150)
+    grid = player.grid
+    player.gatherNeighborInfo()
+    player.gatherSecondNeighborInfo()
+    (i, j) = next((i, j) for i in range(30) for j in range(30)
+        if player.isCovered(i, j))
+    player.board.secondaryClick(i, j)
+    player.gatherNeighborInfo()
+    for row in range(30):
+        for col in range(30):
+            k = grid.index(row, col)
+            near = (abs(row - i) <= solver.REGION_RADIUS
+                and abs(col - j) <= solver.REGION_RADIUS)
+            if not grid.clear[k]:
+                assert grid.regionVersion[k] == (1 if near else 0)
+    return
+
+def testOneFrontierPerGuess(monkeypatch):
+    # play seeded expert games until the advanced solver has to count, and
+    # check it gathers the frontier once, and gives the counting only what's
+    # left of the deadline once the scans are done.
+    calls = []
+    solved = []
+    gather = solver.AdvancedSolver.gatherFrontier
+    solve = probability.ProbabilityEngine.solve
+
+    def gatherFrontier(player):
+        calls.append(None)
+        return gather(player)
+
+    def engineSolve(engine, deadline = None):
+        solved.append((deadline, time.time()))
+        return solve(engine, deadline)
+
+    monkeypatch.setattr(solver.AdvancedSolver, 'gatherFrontier', gatherFrontier)
+    monkeypatch.setattr(probability.ProbabilityEngine, 'solve', engineSolve)
+    logging.disable(logging.CRITICAL)
+    try:
+        for seed in range(20):
+            random.seed(seed)
+            game = simulate.HeadlessBoard(*simulate.LEVELS['expert'], seed = seed)
+            player = solver.AdvancedSolver(game)
+            while game.victory is None:
+                if not player.queue:
+                    del calls[:], solved[:]
+                    start = time.time()
+                    deadline = start + player.watchdog
+                    player.guess(deadline)
+                    assert len(calls) <= 1
+                    if solved:
+                        (engineDeadline, called) = solved[0]
+                        assert engineDeadline < deadline
+                        assert deadline - engineDeadline <= called - start
+                        return
+                move = player.queue.popleft()
+                simulate.makeMove(game, player, move)
+                player.observe(move)
+    finally:
+        logging.disable(logging.NOTSET)
+    assert False, "no game needed counting"
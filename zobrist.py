@@ -0,0 +1,58 @@
+"""
+zobrist.py
+
+Zobrist hashing of what a player can see on the board.
+
+Every (tile, visible state) pair gets its own random 64-bit key, and the hash
+of a position is the XOR of the keys of every tile. A covered tile's key is
+zero, so a fresh board hashes to 0. When a tile changes, XOR-ing out its old
+key and XOR-ing in its new one updates the hash in constant time, which is
+how the board and the solver keep theirs up to date.
+
+The keys aren't stored anywhere: each one is worked out from the tile and the
+state with a fixed mixing function, so every board, solver and process
+agrees on them, and a 1000x1000 board costs no memory.
+"""
+
+# the visible states of a tile. An uncovered number n is NUMBER + n.
+COVERED = 0
+FLAG = 1
+NUMBER = 2
+MINE = NUMBER + 9
+
+MASK_64 = (1 << 64) - 1
+
+def key(row, col, state):
+    """
+    Returns the 64-bit key for a tile in a state (splitmix64 of the three).
+    """
+    if state == COVERED:
+        return 0
+    z = ((row << 40) ^ (col << 8) ^ state) & MASK_64
+    z = (z + 0x9E3779B97F4A7C15) & MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return z ^ (z >> 31)
+
+def visibleState(covered, flag, mine, number):
+    """
+    Returns the state a player sees for a tile with the given attributes.
+    """
+    if covered:
+        if flag:
+            return FLAG
+        return COVERED
+    if mine:
+        return MINE
+    return NUMBER + number
+
+def fullHash(states):
+    """
+    Hashes a whole position from scratch, given a nested list of visible
+    states. Only meant for checking the incremental hashes.
+    """
+    result = 0
+    for (row, rowStates) in enumerate(states):
+        for (col, state) in enumerate(rowStates):
+            result ^= key(row, col, state)
+    return result